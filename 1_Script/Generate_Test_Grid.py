@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Generate_Test_Grid.py - 生成测试用 .agrid 数据库
+
+按 references/db-schema.md 的表结构生成合成数据：页面、分组（含多分页）、应用、
+bookmark（macOS 书签格式）与 image_cache 图标数据，规模可从 100 到 100k 个应用
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import struct
+import uuid
+from pathlib import Path
+
+# ==================== 常量配置 ====================
+
+# 单个容器最多容纳的子项数（与 scripts/core.py 保持一致）
+MAX_ITEMS_PER_CONTAINER = 35
+
+TYPE_GROUP = 2
+TYPE_CONTAINER = 3
+TYPE_APP = 4
+
+SCHEMA = """
+CREATE TABLE items (rowid INTEGER PRIMARY KEY ASC, uuid VARCHAR, flags INTEGER, type INTEGER,
+                    parent_id INTEGER NOT NULL, ordering INTEGER);
+CREATE TABLE apps (item_id INTEGER PRIMARY KEY, title VARCHAR, bundleid VARCHAR, storeid VARCHAR,
+                   category_id INTEGER, moddate REAL, bookmark BLOB, custom_path VARCHAR);
+CREATE TABLE groups (item_id INTEGER PRIMARY KEY, category_id INTEGER, title VARCHAR);
+CREATE TABLE categories (rowid INTEGER PRIMARY KEY ASC, uti VARCHAR NOT NULL);
+CREATE TABLE image_cache (item_id INTEGER, uuid VARCHAR, size_big INTEGER, size_mini INTEGER,
+                          image_data BLOB, image_data_mini BLOB);
+CREATE TABLE custom_icons (app_path VARCHAR PRIMARY KEY, icon_data BLOB, icon_data_mini BLOB);
+CREATE TABLE app_sources (rowid INTEGER PRIMARY KEY ASC, uuid VARCHAR, flags INTEGER, bookmark BLOB,
+                          last_fsevent_id INTEGER, fsevent_uuid VARCHAR);
+CREATE TABLE dbinfo (key VARCHAR, value VARCHAR);
+CREATE TABLE downloading_apps (item_id INTEGER PRIMARY KEY, title VARCHAR, bundleid VARCHAR,
+                               storeid VARCHAR, category_id INTEGER, install_path VARCHAR);
+CREATE INDEX items_uuid_index ON items(uuid);
+CREATE INDEX items_ordering_index ON items(parent_id, ordering);
+CREATE INDEX items_type ON items(type);
+CREATE INDEX image_cache_index ON image_cache(item_id);
+"""
+
+CATEGORIES = [
+    "public.app-category.developer-tools",
+    "public.app-category.productivity",
+    "public.app-category.utilities",
+    "public.app-category.graphics-design",
+    "public.app-category.video",
+    "public.app-category.music",
+    "public.app-category.social-networking",
+    "public.app-category.games",
+    "public.app-category.education",
+    "public.app-category.finance",
+]
+
+# 应用名称词库（中英混合，便于测试拼音/模糊搜索）
+NAME_WORDS = [
+    "Safari", "Notes", "Xcode", "Terminal", "Photo", "Music", "Code", "Studio", "Player", "Editor",
+    "微信", "钉钉", "网易云音乐", "腾讯会议", "百度网盘", "印象笔记", "飞书", "剪映", "迅雷", "爱奇艺",
+]
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+# ==================== 功能函数 ====================
+
+
+def new_uuid(rng):
+    """生成大写 UUID（与 AppGrid 格式一致），使用 rng 保证可复现"""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4)).upper()
+
+
+def make_bookmark(path, rng):
+    """按 macOS 书签二进制格式编码应用路径（路径、文件 ID、卷信息）"""
+    data = bytearray(4)  # 开头 4 字节为目录 (TOC) 偏移，最后回填
+
+    def record(type_, payload):
+        offset = len(data)
+        data.extend(struct.pack("<II", len(payload), type_) + payload)
+        data.extend(b"\0" * (-len(data) % 4))
+        return offset
+
+    def array(offsets):
+        return record(0x0601, b"".join(struct.pack("<I", o) for o in offsets))
+
+    components = [c for c in path.split("/") if c]
+    entries = [
+        (0x1004, array([record(0x0101, c.encode("utf-8")) for c in components])),
+        (0x1005, array([record(0x0304, struct.pack("<q", rng.randint(2, 10 ** 7))) for _ in components])),
+        (0x2002, record(0x0101, b"/")),
+        (0x2010, record(0x0101, b"Macintosh HD")),
+        (0x2011, record(0x0101, new_uuid(rng).encode())),
+    ]
+    toc = len(data)
+    data.extend(struct.pack("<IIIII", 12 + 12 * len(entries), 0xFFFFFFFE, 1, 0, len(entries)))
+    for key, offset in entries:
+        data.extend(struct.pack("<III", key, offset, 0))
+    struct.pack_into("<I", data, 0, toc)
+    header = b"book" + struct.pack("<III", 48 + len(data), 0x10040000, 48) + bytes(32)
+    return header + bytes(data)
+
+
+def chunks(seq, size):
+    """将列表按 size 切块"""
+    return [seq[i:i + size] for i in range(0, len(seq), size)]
+
+
+def generate(path, apps=1000, group_ratio=0.8, group_size=40, icon_size=8192,
+             duplicate_ratio=0.0, seed=42):
+    """生成测试数据库，返回各表行数统计"""
+    rng = random.Random(seed)
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO categories (uti) VALUES (?)", [(c,) for c in CATEGORIES])
+    conn.executemany("INSERT INTO dbinfo (key, value) VALUES (?, ?)",
+                     [("version", "3"), ("generator", "Generate_Test_Grid")])
+
+    items, app_rows, group_rows, icon_rows = [], [], [], []
+    next_id = [1]
+
+    def add_item(type_, parent_id, ordering):
+        rid = next_id[0]
+        next_id[0] += 1
+        items.append((rid, new_uuid(rng), 0, type_, parent_id, ordering))
+        return rid
+
+    def add_app(parent_id, ordering, n):
+        rid = add_item(TYPE_APP, parent_id, ordering)
+        if app_rows and rng.random() < duplicate_ratio:
+            # 重复应用：复用已有应用的 bundleid/custom_path
+            dup = rng.choice(app_rows)
+            title, bundleid, custom_path = dup[1], dup[2], dup[7]
+        else:
+            title = f"{rng.choice(NAME_WORDS)} {n}"
+            bundleid = f"com.vendor{n % 97}.app{n}"
+            custom_path = f"/Applications/{title}.app" if rng.random() < 0.3 else None
+        # 约 94% 为有效书签，1% 为损坏数据，其余为空
+        roll = rng.random()
+        if roll < 0.94:
+            bookmark = make_bookmark(custom_path or f"/Applications/{title}.app", rng)
+        elif roll < 0.95:
+            bookmark = b"book" + rng.randbytes(rng.randint(60, 400))
+        else:
+            bookmark = None
+        app_rows.append((rid, title, bundleid, str(rng.randint(10 ** 8, 10 ** 9)) if n % 3 == 0 else None,
+                         rng.randint(1, len(CATEGORIES)), 700000000.0 + n, bookmark, custom_path))
+        big = PNG_HEADER + rng.randbytes(max(0, rng.randint(icon_size // 2, icon_size) - len(PNG_HEADER)))
+        mini = PNG_HEADER + rng.randbytes(max(0, icon_size // 8 - len(PNG_HEADER)))
+        icon_rows.append((rid, new_uuid(rng), len(big), len(mini), big, mini))
+
+    # 网格根节点
+    grid = add_item(TYPE_CONTAINER, 0, 0)
+
+    # 先划分分组大小，再把分组与散落应用混排到各页面
+    grouped = int(apps * group_ratio)
+    group_sizes = []
+    while grouped > 0:
+        size = min(grouped, rng.randint(1, group_size * 2))
+        group_sizes.append(size)
+        grouped -= size
+    loose = apps - sum(group_sizes)
+    top_level = [("group", s) for s in group_sizes] + [("app", None)] * loose
+    rng.shuffle(top_level)
+
+    n = 0
+    for page_ord, page_entries in enumerate(chunks(top_level, MAX_ITEMS_PER_CONTAINER)):
+        page = add_item(TYPE_CONTAINER, grid, page_ord)
+        for ordering, (kind, size) in enumerate(page_entries):
+            if kind == "app":
+                n += 1
+                add_app(page, ordering, n)
+                continue
+            group = add_item(TYPE_GROUP, page, ordering)
+            group_rows.append((group, rng.randint(1, len(CATEGORIES)), f"分组 {len(group_rows) + 1}"))
+            for ci, page_apps in enumerate(chunks(list(range(size)), MAX_ITEMS_PER_CONTAINER)):
+                container = add_item(TYPE_CONTAINER, group, ci)
+                for ai in range(len(page_apps)):
+                    n += 1
+                    add_app(container, ai, n)
+
+    conn.executemany("INSERT INTO items (rowid, uuid, flags, type, parent_id, ordering) VALUES (?, ?, ?, ?, ?, ?)", items)
+    conn.executemany("INSERT INTO apps VALUES (?, ?, ?, ?, ?, ?, ?, ?)", app_rows)
+    conn.executemany("INSERT INTO groups (item_id, category_id, title) VALUES (?, ?, ?)", group_rows)
+    conn.executemany("INSERT INTO image_cache VALUES (?, ?, ?, ?, ?, ?)", icon_rows)
+    conn.commit()
+    conn.close()
+    return {"items": len(items), "apps": len(app_rows), "groups": len(group_rows)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成测试用 .agrid 数据库")
+    parser.add_argument("--output", required=True, help="输出 .agrid 路径")
+    parser.add_argument("--apps", type=int, default=1000, help="应用数量（100 ~ 100000）")
+    parser.add_argument("--group-ratio", type=float, default=0.8, help="位于分组内的应用比例")
+    parser.add_argument("--group-size", type=int, default=40, help="分组平均应用数（超过 35 即产生多分页）")
+    parser.add_argument("--icon-size", type=int, default=8192, help="大图标字节数上限")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0, help="重复应用比例")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+
+    counts = generate(args.output, args.apps, args.group_ratio, args.group_size,
+                      args.icon_size, args.duplicate_ratio, args.seed)
+    size_mb = os.path.getsize(args.output) / 1024 / 1024
+    print(f"✓ 已生成 {args.output}: {counts['apps']} 个应用, {counts['groups']} 个分组, "
+          f"{counts['items']} 条 items ({size_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Run_Benchmark.py - 脚本性能基准测试
+
+用 Generate_Test_Grid 生成不同规模的数据库，逐个运行 scripts/ 下的脚本，
+记录耗时、SQL 语句数与峰值内存。每个用例在独立子进程中运行（冷启动），
+每次运行前清除数据库旁路文件（搜索索引、统计/书签缓存、操作日志等），各次运行条件一致；
+修改类脚本每次都在数据库副本上执行。
+"""
+
+import argparse
+import json
+import os
+import runpy
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from Generate_Test_Grid import generate
+
+# ==================== 常量配置 ====================
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "src" / "mac-appgrid-skill" / "scripts"
+
+# 默认测试规模（应用数）
+DEFAULT_SIZES = [100, 1000, 10000]
+
+# 只读用例：(名称, 脚本, 参数)；参数中的 {page}/{group}/{app} 等由数据库实际 ID 替换
+READ_CASES = [
+    ("list_tree", "list_tree.py", []),
+    ("list_tree_json", "list_tree.py", ["--format", "json"]),
+    ("search", "search.py", ["--query", "app1"]),
+    ("export_csv", "export.py", []),
+    ("export_json", "export.py", ["--format", "json"]),
+    ("stats", "stats.py", []),
+    ("check_integrity", "check_integrity.py", []),
+    ("check_ungrouped", "check_ungrouped.py", []),
+    ("export_icons", "export_icons.py", ["--output", "{icons}", "--kind", "both"]),
+]
+
+# 修改类用例：每次在数据库副本上执行
+WRITE_CASES = [
+    ("move_app", "move_app.py", ["--app", "{app}", "--to", "{group}"]),
+    ("move_app_batch", "move_app.py", ["--apps", "{apps}", "--to", "{group}"]),
+    ("move_group", "move_group.py", ["--group", "{group}", "--to-page", "{page}", "--position", "0"]),
+    ("create_group", "create_group.py", ["--page", "{page}", "--name", "Bench", "--position", "0"]),
+    ("rename_group", "rename_group.py", ["--group", "{group}", "--name", "Bench"]),
+    ("delete_group", "delete_group.py", ["--group", "{group}"]),
+]
+
+# ==================== 功能函数 ====================
+
+
+def run_child(script, script_args):
+    """子进程入口：统计 SQL 语句数与 Python 峰值内存后运行脚本，结果以 JSON 写到 stderr"""
+    counter = {"queries": 0}
+    real_connect = sqlite3.connect
+
+    def counting_connect(*args, **kwargs):
+        conn = real_connect(*args, **kwargs)
+        conn.set_trace_callback(lambda _sql: counter.__setitem__("queries", counter["queries"] + 1))
+        return conn
+
+    sqlite3.connect = counting_connect
+    sys.argv = [script, *script_args]
+    tracemalloc.start()
+    start = time.perf_counter()
+    exit_code = 0
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit as e:
+            exit_code = e.code or 0
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            sys.stdout = stdout
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    print(json.dumps({"elapsed": elapsed, "queries": counter["queries"],
+                      "peak_kb": peak / 1024, "exit_code": exit_code}), file=sys.stderr)
+
+
+def pick_ids(db_path):
+    """从数据库中挑选用例所需的页面/分组/应用 ID"""
+    conn = sqlite3.connect(str(db_path))
+    grid = conn.execute("SELECT rowid FROM items WHERE type=3 AND parent_id=0").fetchone()[0]
+    pages = [r[0] for r in conn.execute(
+        "SELECT rowid FROM items WHERE type=3 AND parent_id=? ORDER BY ordering", (grid,))]
+    # 选择有空位的页面与分组，避免容量检查导致用例失败
+    page = conn.execute(
+        """SELECT p.rowid FROM items p WHERE p.type=3 AND p.parent_id=?
+           AND (SELECT COUNT(*) FROM items c WHERE c.parent_id=p.rowid) < 35 ORDER BY p.ordering""",
+        (grid,)).fetchone()
+    group = conn.execute("SELECT item_id FROM groups ORDER BY item_id").fetchone()[0]
+    loose = [r[0] for r in conn.execute(
+        "SELECT rowid FROM items WHERE type=4 AND parent_id=? ORDER BY ordering LIMIT 50", (pages[-1],))]
+    conn.close()
+    return {
+        "page": page[0] if page else pages[-1],
+        "group": group,
+        "app": loose[0],
+        "apps": loose,
+    }
+
+
+def expand_args(args, ids):
+    """替换参数中的 ID 占位符"""
+    result = []
+    for a in args:
+        if a == "{apps}":
+            result.extend(str(i) for i in ids["apps"])
+        else:
+            result.append(a.format(**ids))
+    return result
+
+
+def clear_sidecars(db_path):
+    """删除数据库旁路文件（<db>.search、<db>.stats 等），避免首次运行建立的缓存让后续运行不可比"""
+    for p in Path(db_path).parent.glob(f"{Path(db_path).name}.*"):
+        if p.is_file():
+            p.unlink()
+
+
+def run_case(db_path, script, args, ids, writable, workdir):
+    """在子进程中运行一次用例，返回指标字典"""
+    db = db_path
+    clear_sidecars(db_path)
+    if writable:
+        db = Path(workdir) / "work.agrid"
+        shutil.copyfile(db_path, db)
+        clear_sidecars(db)
+    cmd = [sys.executable, __file__, "--child", str(SCRIPTS_DIR / script), "--",
+           "--db", str(db), *expand_args(args, ids)]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    metrics = json.loads(proc.stderr.strip().splitlines()[-1])
+    metrics["wall"] = wall
+    return metrics
+
+
+def benchmark(sizes, repeat, cases, workdir):
+    """按规模生成数据库并运行全部用例，返回结果列表"""
+    results = []
+    for size in sizes:
+        db_path = Path(workdir) / f"bench_{size}.agrid"
+        generate(db_path, apps=size, icon_size=2048)
+        ids = pick_ids(db_path)
+        ids["icons"] = str(Path(workdir) / "icons")
+        print(f"\n规模 {size} 个应用 ({db_path.stat().st_size / 1024 / 1024:.1f} MB)")
+        for name, script, args in cases:
+            writable = (name, script, args) in WRITE_CASES
+            runs = [run_case(db_path, script, args, ids, writable, workdir) for _ in range(repeat)]
+            row = {
+                "size": size,
+                "case": name,
+                "wall_ms": statistics.median(r["wall"] for r in runs) * 1000,
+                "script_ms": statistics.median(r["elapsed"] for r in runs) * 1000,
+                # 每次运行前已清除旁路文件，各次的语句数相同
+                "queries": runs[0]["queries"],
+                "peak_kb": max(r["peak_kb"] for r in runs),
+                "exit_code": next((r["exit_code"] for r in runs if r["exit_code"]), 0),
+            }
+            results.append(row)
+            status = "" if row["exit_code"] == 0 else f"  (退出码 {row['exit_code']})"
+            print(f"  {name:<18} {row['wall_ms']:>9.1f} ms  脚本 {row['script_ms']:>9.1f} ms  "
+                  f"SQL {row['queries']:>7}  峰值 {row['peak_kb']:>10.1f} KB{status}")
+    return results
+
+
+def main():
+    if "--child" in sys.argv:
+        i = sys.argv.index("--child")
+        script = sys.argv[i + 1]
+        rest = sys.argv[sys.argv.index("--") + 1:]
+        run_child(script, rest)
+        return
+
+    parser = argparse.ArgumentParser(description="AppGrid 脚本性能基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="测试规模（应用数）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复次数（取中位数）")
+    parser.add_argument("--only", nargs="+", help="只运行指定用例")
+    parser.add_argument("--output", help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    cases = READ_CASES + WRITE_CASES
+    if args.only:
+        cases = [c for c in cases if c[0] in args.only]
+
+    with tempfile.TemporaryDirectory(prefix="agrid_bench_") as workdir:
+        results = benchmark(args.sizes, args.repeat, cases, workdir)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n✓ 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""统一入口：appgrid <子命令> [参数...]，只导入所选子命令对应的脚本模块
+
+子命令的参数与对应脚本完全相同（appgrid tree --db x 等价于 list_tree.py --db x）。
+本文件只依赖 sys/importlib，查看帮助或分发时不会加载 argparse、sqlite3 等模块。
+"""
+import importlib
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+# 子命令 → (模块, 说明)；按 SKILL.md 中的操作顺序排列
+COMMANDS = {
+    "tree": ("list_tree", "列出树形结构"),
+    "search": ("search", "搜索应用"),
+    "create-group": ("create_group", "创建分组"),
+    "delete-group": ("delete_group", "删除分组"),
+    "rename-group": ("rename_group", "重命名分组"),
+    "move-app": ("move_app", "移动应用"),
+    "move-group": ("move_group", "移动分组"),
+    "export": ("export", "导出应用列表"),
+    "stats": ("stats", "数据库统计概览"),
+    "check-ungrouped": ("check_ungrouped", "检查未归组应用"),
+    "check-integrity": ("check_integrity", "数据库一致性检查"),
+    "apply-layout": ("apply_layout", "应用声明式布局"),
+    "daemon": ("daemon", "常驻进程模式"),
+    "export-icons": ("export_icons", "导出图标"),
+    "resolve-bookmarks": ("resolve_bookmarks", "解析应用书签"),
+    "auto-group": ("auto_group", "按分类自动归组"),
+    "compact": ("compact", "整理分组分页"),
+    "undo": ("undo", "撤销"),
+    "redo": ("redo", "重做"),
+    "backup": ("backup", "增量备份"),
+    "restore": ("restore", "从备份恢复"),
+    "diff": ("diff", "比较两个数据库"),
+    "merge": ("merge", "三方合并"),
+    "dump": ("dump", "无损导出网格数据（NDJSON）"),
+    "load": ("load", "从转储还原网格数据"),
+    "dedupe": ("dedupe", "查找/清理重复应用"),
+}
+
+
+def usage() -> str:
+    width = max(len(name) for name in COMMANDS)
+    lines = ["用法: appgrid <子命令> [参数...]（appgrid <子命令> -h 查看子命令参数）", "", "子命令:"]
+    lines += [f"  {name:<{width}}  {desc}" for name, (_, desc) in COMMANDS.items()]
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    # 也接受脚本名写法（list_tree、move_app）
+    name = argv[0]
+    if name not in COMMANDS:
+        name = next((k for k, (module, _) in COMMANDS.items() if module == argv[0]), None)
+    if name is None:
+        print(f"错误: 未知子命令 '{argv[0]}'\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+
+    module = importlib.import_module(COMMANDS[name][0])
+    # 子命令的 argparse 从 sys.argv 读取参数，prog 显示为 "appgrid <子命令>"
+    sys.argv = [f"appgrid {name}", *argv[1:]]
+    module.main()
+
+
+if __name__ == "__main__":
+    main()
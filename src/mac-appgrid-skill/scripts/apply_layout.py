@@ -0,0 +1,217 @@
+"""将声明式布局（list_tree.py --format json 的输出格式）应用到 AppGrid 数据库"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import (
+    connect, WriteSession, insert_item, GridSnapshot, MAX_ITEMS_PER_CONTAINER, ordering_at,
+    TYPE_GROUP, TYPE_APP, TYPE_CONTAINER,
+)
+from journal import prepare_journal
+from profiling import add_profile_argument
+
+
+class LayoutPlan:
+    """对比目标布局与快照，生成最小的插入/移动/重命名/删除操作"""
+
+    def __init__(self, conn, snap: GridSnapshot):
+        self.conn = conn
+        self.snap = snap
+        self.grid = snap.get_grid()
+        if self.grid is None:
+            raise ValueError("数据库中没有网格节点")
+        # 当前状态：rowid → (parent_id, ordering)，新建项目插入后加入
+        self.state = {rid: (it["parent_id"], it["ordering"]) for rid, it in snap.items.items()}
+        self.types = {rid: it["type"] for rid, it in snap.items.items()}
+        self.desired: dict[int, list[int]] = {}
+        self.assigned: set[int] = set()
+        self.by_uuid = {it["uuid"]: rid for rid, it in snap.items.items() if it["uuid"]}
+        self.apps_by_bundle: dict[str, list[int]] = {}
+        for rid, app in snap.apps.items():
+            if app["bundleid"] and snap.items.get(rid, {}).get("type") == TYPE_APP:
+                self.apps_by_bundle.setdefault(app["bundleid"], []).append(rid)
+        self.groups_by_title: dict[str, list[int]] = {}
+        for rid, g in snap.groups.items():
+            if snap.items.get(rid, {}).get("type") == TYPE_GROUP:
+                self.groups_by_title.setdefault(g["title"] or "", []).append(rid)
+        self.created = 0
+        self.renamed = 0
+        self.deleted = 0
+        self.unmatched: list[str] = []
+
+    def _by_uuid(self, node, type_):
+        rid = self.by_uuid.get(node.get("uuid"))
+        if rid is not None and rid not in self.assigned and self.snap.items[rid]["type"] == type_:
+            return rid
+        return None
+
+    def _first_free(self, candidates):
+        for rid in candidates:
+            if rid not in self.assigned:
+                return rid
+        return None
+
+    def _create(self, type_, parent_id):
+        ordering = ordering_at(len(self.desired.setdefault(parent_id, [])))
+        rid = insert_item(self.conn, type_, parent_id, ordering)
+        self.state[rid] = (parent_id, ordering)
+        self.types[rid] = type_
+        self.created += 1
+        return rid
+
+    def _place(self, rid, parent_id):
+        self.assigned.add(rid)
+        self.desired.setdefault(parent_id, []).append(rid)
+
+    def add_page(self, node, index):
+        existing = [p["rowid"] for p in self.snap.get_pages()]
+        pid = self._by_uuid(node, TYPE_CONTAINER)
+        if pid is None and index < len(existing):
+            pid = self._first_free([existing[index]])
+        if pid is None:
+            pid = self._create(TYPE_CONTAINER, self.grid)
+        self._place(pid, self.grid)
+        for child in node.get("children", []):
+            if child.get("type") == TYPE_GROUP:
+                self.add_group(child, pid)
+            elif child.get("type") == TYPE_APP:
+                self.add_app(child, pid)
+
+    def add_group(self, node, page_id):
+        title = node.get("title") or ""
+        gid = self._by_uuid(node, TYPE_GROUP)
+        if gid is None:
+            gid = self._first_free(self.groups_by_title.get(title, []))
+        if gid is None:
+            gid = self._create(TYPE_GROUP, page_id)
+            self.conn.execute(
+                "INSERT INTO groups (item_id, category_id, title) VALUES (?, 0, ?)", (gid, title)
+            )
+        elif (self.snap.groups.get(gid, {}).get("title") or "") != title:
+            self.conn.execute("UPDATE groups SET title=? WHERE item_id=?", (title, gid))
+            self.renamed += 1
+        self._place(gid, page_id)
+
+        # 单分页分组在 list_tree 中直接展开为应用列表，多分页时为分页节点
+        children = node.get("children", [])
+        if any(c.get("type") == TYPE_CONTAINER for c in children):
+            page_nodes = [c for c in children if c.get("type") == TYPE_CONTAINER]
+        else:
+            page_nodes = [{"children": children}]
+        existing = self.snap.get_group_containers(gid) if gid in self.snap.items else []
+        for ci, pnode in enumerate(page_nodes):
+            cid = self._by_uuid(pnode, TYPE_CONTAINER)
+            if cid is None and ci < len(existing):
+                cid = self._first_free([existing[ci]])
+            if cid is None:
+                cid = self._create(TYPE_CONTAINER, gid)
+            self._place(cid, gid)
+            self.desired.setdefault(cid, [])
+            for app in pnode.get("children", []):
+                if app.get("type") == TYPE_APP:
+                    self.add_app(app, cid)
+
+    def add_app(self, node, parent_id):
+        aid = self._by_uuid(node, TYPE_APP)
+        if aid is None and node.get("bundleid"):
+            aid = self._first_free(self.apps_by_bundle.get(node["bundleid"], []))
+        if aid is None:
+            self.unmatched.append(node.get("title") or node.get("bundleid") or str(node.get("id")))
+            return
+        self._place(aid, parent_id)
+
+    def finalize(self) -> int:
+        """计算每个受影响容器的最终子项顺序，执行删除与更新，返回更新行数"""
+        moved_from = {self.state[rid][0] for rid in self.assigned}
+        parents = set(self.desired) | moved_from
+        final: dict[int, list[int]] = {}
+        for parent_id in parents:
+            # 布局中指定的子项在前，未被布局引用的原有子项保持原顺序跟在后面
+            leftovers = [
+                rid for rid in self.snap.children.get(parent_id, [])
+                if rid not in self.assigned
+            ]
+            final[parent_id] = self.desired.get(parent_id, []) + leftovers
+
+        # 未被引用且最终为空的分组分页 / 分组将被删除
+        doomed = set()
+        for rid, item in self.snap.items.items():
+            if rid in self.assigned or item["type"] != TYPE_GROUP:
+                continue
+            pages = [c for c in final.get(rid, self.snap.children.get(rid, []))
+                     if self.snap.items.get(c, {}).get("type") == TYPE_CONTAINER]
+            if all(not final.get(c, self.snap.children.get(c, [])) for c in pages):
+                doomed.add(rid)
+                doomed.update(pages)
+        for rid, item in self.snap.items.items():
+            parent = self.snap.items.get(item["parent_id"], {})
+            if (rid not in self.assigned and item["type"] == TYPE_CONTAINER
+                    and parent.get("type") == TYPE_GROUP
+                    and not final.get(rid, self.snap.children.get(rid, []))):
+                doomed.add(rid)
+        for parent_id in list(final):
+            final[parent_id] = [rid for rid in final[parent_id] if rid not in doomed]
+        for rid in doomed:
+            parent_id = self.snap.items[rid]["parent_id"]
+            if parent_id not in final and parent_id not in doomed:
+                final[parent_id] = [c for c in self.snap.children.get(parent_id, []) if c not in doomed]
+
+        for parent_id, kids in final.items():
+            if (parent_id != self.grid and self.types.get(parent_id) == TYPE_CONTAINER
+                    and len(kids) > MAX_ITEMS_PER_CONTAINER):
+                raise ValueError(
+                    f"容器 {parent_id} 将有 {len(kids)} 个子项，超出上限 {MAX_ITEMS_PER_CONTAINER}"
+                )
+
+        updates = [
+            (parent_id, ordering_at(i), rid)
+            for parent_id, kids in final.items()
+            for i, rid in enumerate(kids)
+            if self.state[rid] != (parent_id, ordering_at(i))
+        ]
+        self.conn.executemany("UPDATE items SET parent_id=?, ordering=? WHERE rowid=?", updates)
+
+        doomed_ids = [(rid,) for rid in doomed]
+        self.conn.executemany("DELETE FROM groups WHERE item_id=?", doomed_ids)
+        self.conn.executemany("DELETE FROM items WHERE rowid=?", doomed_ids)
+        self.deleted = len(doomed)
+        return len(updates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用声明式 AppGrid 布局")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--layout", required=True, help="布局 JSON 文件（list_tree.py --format json 的输出格式）")
+    parser.add_argument("--dry-run", action="store_true", help="只计算变更，不写入数据库")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    layout = json.loads(Path(args.layout).expanduser().read_text(encoding="utf-8"))
+
+    conn = connect(args.db, "write")
+
+    def apply(conn):
+        # 快照在写事务内读取，计划期间不会被其他写入改变
+        plan = LayoutPlan(conn, GridSnapshot(conn))
+        for i, page in enumerate(layout):
+            plan.add_page(page, i)
+        return plan, plan.finalize()
+
+    try:
+        on_begin = None if args.dry_run else prepare_journal(conn, "apply_layout", vars(args))
+        plan, updated = WriteSession(conn).run(apply, on_begin=on_begin, commit=not args.dry_run)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    conn.close()
+
+    prefix = "（预演，未写入）" if args.dry_run else "✓ 布局已应用："
+    print(f"{prefix}新建 {plan.created}，移动/重排 {updated}，重命名 {plan.renamed}，删除 {plan.deleted}")
+    if plan.unmatched:
+        print(f"  ⚠️  {len(plan.unmatched)} 个应用在数据库中未找到，已跳过: {', '.join(plan.unmatched)}")
+
+
+if __name__ == "__main__":
+    main()
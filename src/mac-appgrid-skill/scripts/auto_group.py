@@ -0,0 +1,190 @@
+"""按应用分类（categories.uti）把未归组应用自动整理进分组"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect, WriteSession, GridSnapshot, MoveBatch, MAX_ITEMS_PER_CONTAINER, TYPE_CONTAINER, TYPE_GROUP
+from check_ungrouped import find_ungrouped
+from journal import prepare_journal
+from profiling import add_profile_argument
+
+# App Store 分类 UTI（去掉 public.app-category. 前缀）→ 分组名称
+CATEGORY_NAMES = {
+    "business": "商务",
+    "developer-tools": "开发工具",
+    "education": "教育",
+    "entertainment": "娱乐",
+    "finance": "财务",
+    "games": "游戏",
+    "graphics-design": "图形和设计",
+    "healthcare-fitness": "健康健美",
+    "lifestyle": "生活",
+    "medical": "医疗",
+    "music": "音乐",
+    "news": "新闻",
+    "photography": "摄影",
+    "productivity": "效率",
+    "reference": "参考资料",
+    "social-networking": "社交",
+    "sports": "体育",
+    "travel": "旅游",
+    "utilities": "工具",
+    "video": "视频",
+    "weather": "天气",
+}
+
+UTI_PREFIX = "public.app-category."
+
+
+def category_name(uti: str | None) -> str | None:
+    """分类 UTI 转为分组名称；各类游戏子分类统一为"游戏"，未知分类取 UTI 末段"""
+    if not uti:
+        return None
+    key = uti[len(UTI_PREFIX):] if uti.startswith(UTI_PREFIX) else uti.rsplit(".", 1)[-1]
+    if key.endswith("-games"):
+        key = "games"
+    return CATEGORY_NAMES.get(key, key.replace("-", " ").title())
+
+
+def pack_bins(sizes: dict, capacity: int) -> list[list]:
+    """First-Fit Decreasing：把 {键: 数量} 装入容量为 capacity 的箱子，同一键不拆分（超过容量的单独成箱）"""
+    bins: list[tuple[int, list]] = []
+    for key, size in sorted(sizes.items(), key=lambda kv: (-kv[1], str(kv[0]))):
+        for i, (used, keys) in enumerate(bins):
+            if used + size <= capacity:
+                bins[i] = (used + size, keys + [key])
+                break
+        else:
+            bins.append((size, [key]))
+    return [keys for _, keys in bins]
+
+
+def plan_groups(snap, conn, min_size: int = 3, other_name: str = "其他", reuse: bool = True) -> list[dict]:
+    """规划分组：[{title, category_id, group_id(复用时), apps}]，apps 按名称排序"""
+    ungrouped = find_ungrouped(snap)["ungrouped"]
+    names = {r["rowid"]: category_name(r["uti"]) for r in conn.execute("SELECT rowid, uti FROM categories")}
+
+    # 按分组名称归类（多个游戏子分类合并为同一个"游戏"分组），记录首个分类 ID
+    by_name: dict = {}
+    for a in ungrouped:
+        cid = snap.apps[a["rowid"]]["category_id"]
+        name = names.get(cid)
+        entry = by_name.setdefault(name, {"category_id": cid if name else 0, "apps": []})
+        entry["apps"].append(a)
+
+    existing = {}
+    if reuse:
+        for gid, g in snap.groups.items():
+            if snap.items.get(gid, {}).get("type") != TYPE_GROUP:
+                continue
+            if g["category_id"] in names:
+                existing.setdefault(names[g["category_id"]], gid)
+            existing.setdefault(g["title"], gid)
+
+    plans, small = [], {}
+    for name, entry in by_name.items():
+        if name is None or len(entry["apps"]) < min_size:
+            small[name] = len(entry["apps"])
+            continue
+        plans.append({"title": name, "category_id": entry["category_id"], "apps": entry["apps"],
+                      "group_id": existing.get(name)})
+
+    # 零散分类合并进"其他"分组：同一分类不拆开，装箱后每个分组尽量只占一页
+    for i, keys in enumerate(pack_bins(small, MAX_ITEMS_PER_CONTAINER)):
+        title = other_name if i == 0 else f"{other_name} {i + 1}"
+        plans.append({
+            "title": title, "category_id": 0,
+            "apps": [a for k in keys for a in by_name[k]["apps"]],
+            "group_id": existing.get(title),
+        })
+
+    for p in plans:
+        p["apps"].sort(key=lambda a: (a["title"] or "").lower())
+    plans.sort(key=lambda p: (p["category_id"] == 0, p["title"]))
+    return plans
+
+
+def auto_group(conn, min_size: int = 3, other_name: str = "其他", reuse: bool = True) -> dict:
+    """在同一事务中执行自动归组（不提交），返回 {groups: [...], moved, created, new_pages}"""
+    snap = GridSnapshot(conn)
+    grid = snap.get_grid()
+    if grid is None:
+        raise ValueError("数据库中没有网格节点")
+    plans = plan_groups(snap, conn, min_size, other_name, reuse)
+
+    batch = MoveBatch(conn)
+    pages = [p for p in batch.get_children(grid) if snap.items[p]["type"] == TYPE_CONTAINER]
+    # 页面的预计占用：先扣除即将移入分组的应用，新分组按 first-fit 放到有空位的页面
+    leaving = {}
+    for p in plans:
+        for a in p["apps"]:
+            leaving[a["parent_id"]] = leaving.get(a["parent_id"], 0) + 1
+    projected = {pid: len(batch.get_children(pid)) - leaving.get(pid, 0) for pid in pages}
+
+    created = new_pages = moved = 0
+    result = []
+    for p in plans:
+        group_id = p["group_id"]
+        if group_id is None:
+            page = next((pid for pid in pages if projected[pid] < MAX_ITEMS_PER_CONTAINER), None)
+            if page is None:
+                page = batch.add_container(grid)
+                pages.append(page)
+                projected[page] = 0
+                new_pages += 1
+            projected[page] += 1
+            group_id, _ = batch.add_group(page, p["title"], p["category_id"])
+            created += 1
+        for a in p["apps"]:
+            batch.move(a["rowid"], group_id)
+        moved += len(p["apps"])
+        containers = [c for c in batch.get_children(group_id) if batch.get_item(c)["type"] == TYPE_CONTAINER]
+        # 按分类复用的已有分组可能另有名称，报告分组的实际标题
+        title = p["title"] if p["group_id"] is None else snap.groups[group_id]["title"]
+        result.append({"group_id": group_id, "title": title, "apps": len(p["apps"]),
+                       "pages": len(containers), "created": p["group_id"] is None})
+
+    batch.flush()
+    return {"groups": result, "moved": moved, "created": created, "new_pages": new_pages}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按分类自动整理未归组的 AppGrid 应用")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--min-size", type=int, default=3, help="应用数少于此值的分类合并到\"其他\"分组")
+    parser.add_argument("--other-name", default="其他", help="合并分组及无分类应用所在分组的名称")
+    parser.add_argument("--no-reuse", action="store_true", help="不复用同分类/同名的已有分组")
+    parser.add_argument("--dry-run", action="store_true", help="只显示计划，不写入数据库")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "write")
+    try:
+        on_begin = None if args.dry_run else prepare_journal(conn, "auto_group", vars(args))
+        result = WriteSession(conn).run(auto_group, args.min_size, args.other_name, not args.no_reuse,
+                                        on_begin=on_begin, commit=not args.dry_run)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    conn.close()
+
+    if args.format == "json":
+        print(json.dumps({**result, "dry_run": args.dry_run}, ensure_ascii=False, indent=2))
+        return
+    prefix = "（预演，未写入）" if args.dry_run else "✓ "
+    if not result["moved"]:
+        print("没有需要归组的应用")
+        return
+    print(f"{prefix}已归组 {result['moved']} 个应用：新建 {result['created']} 个分组，"
+          f"新增 {result['new_pages']} 个页面")
+    for g in result["groups"]:
+        mark = "新建" if g["created"] else "复用"
+        pages = f" ({g['pages']}页)" if g["pages"] > 1 else ""
+        print(f"  📁 [{g['group_id']}] {g['title']}: +{g['apps']} 个应用{pages} [{mark}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""增量备份：用 SQLite backup API 取得一致的在线快照，按页内容寻址保存
+
+备份库为数据库旁的 <db>.backups（SQLite）：每个数据页按 SHA-1 只保存一份（zlib 压缩），
+快照只记录页哈希清单，因此后续备份只写入发生变化的页。AppGrid 正在写入时 backup API
+会自动重新开始，得到的始终是某一时刻的完整数据库。
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from contextlib import closing
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import sidecar_path
+from profiling import add_profile_argument
+
+# backup API 每步复制的页数；步间短暂休眠，让 AppGrid 的写入有机会进行
+STEP_PAGES = 256
+STEP_SLEEP = 0.005
+
+DIGEST_SIZE = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (hash BLOB PRIMARY KEY, data BLOB NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, label TEXT,
+    page_size INTEGER NOT NULL, page_count INTEGER NOT NULL, new_pages INTEGER NOT NULL,
+    manifest BLOB NOT NULL
+);
+"""
+
+
+def open_store(db_path: str, create: bool = True) -> sqlite3.Connection | None:
+    """打开 <db>.backups 备份库；create=False 且不存在时返回 None"""
+    path = sidecar_path(db_path, "backups")
+    if not create and not path.exists():
+        return None
+    store = sqlite3.connect(str(path))
+    store.executescript(SCHEMA)
+    return store
+
+
+def _copy_online(db_path: str, dest: str, progress=None):
+    """用 backup API 分步把数据库复制到 dest"""
+    src = sqlite3.connect(f"file:{Path(db_path).expanduser().resolve()}?mode=ro", uri=True)
+    dst = sqlite3.connect(dest)
+    try:
+        src.backup(dst, pages=STEP_PAGES, progress=progress, sleep=STEP_SLEEP)
+    finally:
+        dst.close()
+        src.close()
+
+
+def _iter_pages(path: str):
+    """按页读取数据库文件，返回 (页大小, 页迭代器)"""
+    with open(path, "rb") as f:
+        header = f.read(100)
+    page_size = int.from_bytes(header[16:18], "big")
+    page_size = 65536 if page_size == 1 else page_size
+
+    def pages():
+        with open(path, "rb") as f:
+            while page := f.read(page_size):
+                yield page
+    return page_size, pages()
+
+
+def create_backup(db_path: str, label: str | None = None) -> dict:
+    """创建快照，返回 {id, created, page_count, new_pages, unchanged}；与上一个快照相同时不新建"""
+    # 出错时关闭备份库连接，未提交的页面写入随之回滚，不会留下挂起的写事务
+    with closing(open_store(db_path)) as store:
+        fd, tmp = tempfile.mkstemp(prefix=".snapshot.", dir=sidecar_path(db_path, "backups").parent)
+        os.close(fd)
+        try:
+            _copy_online(db_path, tmp)
+            page_size, pages = _iter_pages(tmp)
+            manifest = bytearray()
+            new_pages = 0
+            for page in pages:
+                digest = hashlib.sha1(page).digest()
+                manifest += digest
+                if store.execute("SELECT 1 FROM pages WHERE hash=?", (digest,)).fetchone() is None:
+                    store.execute("INSERT INTO pages (hash, data) VALUES (?, ?)", (digest, zlib.compress(page, 1)))
+                    new_pages += 1
+        finally:
+            os.unlink(tmp)
+
+        page_count = len(manifest) // DIGEST_SIZE
+        last = store.execute("SELECT id, created, manifest FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+        if last and last[2] == bytes(manifest):
+            return {"id": last[0], "created": last[1], "page_count": page_count, "new_pages": 0, "unchanged": True}
+
+        created = time.time()
+        snapshot_id = store.execute(
+            "INSERT INTO snapshots (created, label, page_size, page_count, new_pages, manifest) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (created, label, page_size, page_count, new_pages, bytes(manifest)),
+        ).lastrowid
+        store.commit()
+    return {"id": snapshot_id, "created": created, "page_count": page_count, "new_pages": new_pages,
+            "unchanged": False}
+
+
+def list_backups(db_path: str) -> list[dict]:
+    """所有快照（旧到新）"""
+    store = open_store(db_path, create=False)
+    if store is None:
+        return []
+    rows = store.execute(
+        "SELECT id, created, label, page_size, page_count, new_pages FROM snapshots ORDER BY id"
+    ).fetchall()
+    store.close()
+    return [{"id": r[0], "created": r[1], "label": r[2], "bytes": r[3] * r[4], "page_count": r[4],
+             "new_pages": r[5]} for r in rows]
+
+
+def restore_backup(db_path: str, snapshot_id: int | None = None, output: str | None = None) -> dict:
+    """重建快照（默认最新）：给出 output 时写到新文件，否则通过 backup API 覆盖原数据库"""
+    store = open_store(db_path, create=False)
+    if store is None:
+        raise ValueError("没有备份")
+    if snapshot_id is None:
+        row = store.execute("SELECT id, page_size, manifest FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+    else:
+        row = store.execute("SELECT id, page_size, manifest FROM snapshots WHERE id=?", (snapshot_id,)).fetchone()
+    if row is None:
+        store.close()
+        raise ValueError(f"快照 {snapshot_id} 不存在" if snapshot_id is not None else "没有备份")
+    snapshot_id, page_size, manifest = row
+
+    target = Path(output or db_path).expanduser().resolve()
+    fd, tmp = tempfile.mkstemp(prefix=".restore.", dir=target.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for i in range(0, len(manifest), DIGEST_SIZE):
+                digest = manifest[i:i + DIGEST_SIZE]
+                data = store.execute("SELECT data FROM pages WHERE hash=?", (digest,)).fetchone()
+                if data is None:
+                    raise ValueError(f"快照 {snapshot_id} 缺少第 {i // DIGEST_SIZE + 1} 页，备份库已损坏")
+                page = zlib.decompress(data[0])
+                if len(page) != page_size:
+                    raise ValueError(f"快照 {snapshot_id} 第 {i // DIGEST_SIZE + 1} 页长度不符")
+                f.write(page)
+        check = sqlite3.connect(tmp)
+        try:
+            result = check.execute("PRAGMA quick_check").fetchone()[0]
+            if result != "ok":
+                raise ValueError(f"重建的数据库校验失败: {result}")
+            if output:
+                check.close()
+                os.replace(tmp, target)
+            else:
+                # 覆盖原库也走 backup API：作为一次写事务完成，其他连接不会读到半写的文件
+                dst = sqlite3.connect(str(target))
+                try:
+                    check.backup(dst, pages=STEP_PAGES, sleep=STEP_SLEEP)
+                finally:
+                    dst.close()
+        finally:
+            check.close()
+    finally:
+        store.close()
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return {"id": snapshot_id, "path": str(target), "page_count": len(manifest) // DIGEST_SIZE}
+
+
+def prune_backups(db_path: str, keep: int | None = None, keep_days: float | None = None) -> dict:
+    """保留最近 keep 个以及 keep_days 天内的快照，删除其余快照和不再被引用的页"""
+    store = open_store(db_path, create=False) if keep is not None or keep_days is not None else None
+    if store is None:
+        return {"deleted": [], "freed_pages": 0}
+    rows = store.execute("SELECT id, created FROM snapshots ORDER BY id DESC").fetchall()
+    cutoff = time.time() - keep_days * 86400 if keep_days is not None else None
+    doomed = [sid for i, (sid, created) in enumerate(rows)
+              if not (keep is not None and i < keep) and not (cutoff is not None and created >= cutoff)]
+    if not doomed:
+        store.close()
+        return {"deleted": [], "freed_pages": 0}
+
+    store.executemany("DELETE FROM snapshots WHERE id=?", [(sid,) for sid in doomed])
+    # 标记-清除：收集剩余快照引用的页，删除其余页
+    store.execute("CREATE TEMP TABLE live (hash BLOB PRIMARY KEY) WITHOUT ROWID")
+    for (manifest,) in store.execute("SELECT manifest FROM snapshots").fetchall():
+        store.executemany("INSERT OR IGNORE INTO live VALUES (?)",
+                          ((manifest[i:i + DIGEST_SIZE],) for i in range(0, len(manifest), DIGEST_SIZE)))
+    freed = store.execute("DELETE FROM pages WHERE hash NOT IN (SELECT hash FROM live)").rowcount
+    store.commit()
+    if freed:
+        store.execute("VACUUM")
+    store.close()
+    return {"deleted": sorted(doomed), "freed_pages": freed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量备份 AppGrid 数据库")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--label", help="快照说明")
+    parser.add_argument("--list", action="store_true", help="只列出已有快照")
+    parser.add_argument("--keep", type=int, help="保留策略：保留最近 N 个快照")
+    parser.add_argument("--keep-days", type=float, help="保留策略：保留最近 N 天内的快照")
+    parser.add_argument("--prune-only", action="store_true", help="只按保留策略清理，不创建新快照")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if not Path(args.db).expanduser().exists():
+        print(f"错误: 数据库文件不存在: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.list:
+        snapshots = list_backups(args.db)
+        if args.format == "json":
+            print(json.dumps(snapshots, ensure_ascii=False, indent=2))
+            return
+        if not snapshots:
+            print("没有备份")
+            return
+        for s in snapshots:
+            when = datetime.datetime.fromtimestamp(s["created"]).strftime("%Y-%m-%d %H:%M:%S")
+            label = f"  {s['label']}" if s["label"] else ""
+            print(f"#{s['id']:<5} {when}  {s['bytes'] / 1024 / 1024:.1f} MB  新增 {s['new_pages']}/{s['page_count']} 页{label}")
+        return
+
+    result = {}
+    try:
+        if not args.prune_only:
+            result["backup"] = create_backup(args.db, args.label)
+        if args.keep is not None or args.keep_days is not None:
+            result["prune"] = prune_backups(args.db, args.keep, args.keep_days)
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.format == "json":
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    b = result.get("backup")
+    if b and b["unchanged"]:
+        print(f"✓ 数据库与快照 #{b['id']} 相同，未新建快照")
+    elif b:
+        print(f"✓ 已创建快照 #{b['id']}：共 {b['page_count']} 页，新写入 {b['new_pages']} 页")
+    p = result.get("prune")
+    if p and p["deleted"]:
+        print(f"✓ 已清理 {len(p['deleted'])} 个旧快照，释放 {p['freed_pages']} 页")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,43 @@
 """检查数据库一致性"""
 import argparse
+import json
+import math
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
-from core import connect, TYPE_GROUP, TYPE_CONTAINER, TYPE_APP
+from core import (
+    connect, MAX_ITEMS_PER_CONTAINER,
+    TYPE_GROUP, TYPE_CONTAINER, TYPE_APP,
+)
+from resolve_bookmarks import resolve_bookmarks
+from profiling import add_profile_argument
 
+# 逐条列出详情的上限（书签解析失败可能成批出现）
+DETAIL_LIMIT = 10
+
+# 每个父节点的子项聚合，供分组/分页/排序/容量检查共用
+CHILD_STATS = """child_stats AS (
+    SELECT parent_id, COUNT(*) AS n, COUNT(DISTINCT ordering) AS distinct_ord,
+           MIN(ordering) AS min_ord, MAX(ordering) AS max_ord
+    FROM items GROUP BY parent_id
+)"""
 
-def main():
-    parser = argparse.ArgumentParser(description="检查 AppGrid 数据库一致性")
-    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
-    args = parser.parse_args()
 
-    conn = connect(args.db)
+def check(conn, db_path: str | None = None) -> list[dict]:
+    """执行全部检查，返回问题列表：{code, message, ids, details}；给出 db_path 时书签解析使用旁路缓存"""
     issues = []
 
+    def add(code, message, ids=(), details=()):
+        issues.append({"code": code, "message": message, "ids": list(ids), "details": list(details)})
+
     # 1. type=4 但无 apps 记录
-    orphan_items = conn.execute(
+    orphan_items = [r[0] for r in conn.execute(
         """SELECT i.rowid FROM items i LEFT JOIN apps a ON i.rowid = a.item_id
            WHERE i.type=? AND a.item_id IS NULL""", (TYPE_APP,)
-    ).fetchall()
+    )]
     if orphan_items:
-        issues.append(f"type=4 但无 apps 记录: {len(orphan_items)} 条")
+        add("APP_ITEM_WITHOUT_RECORD", f"type=4 但无 apps 记录: {len(orphan_items)} 条", orphan_items)
 
     # 2. apps 记录但无 items
     orphan_apps = conn.execute(
@@ -29,88 +45,149 @@ def main():
            WHERE i.rowid IS NULL"""
     ).fetchall()
     if orphan_apps:
-        issues.append(f"apps 记录但无 items: {len(orphan_apps)} 条")
-        for r in orphan_apps:
-            issues.append(f"  [{r['item_id']}] {r['title']}")
+        add("APP_RECORD_WITHOUT_ITEM", f"apps 记录但无 items: {len(orphan_apps)} 条",
+            [r["item_id"] for r in orphan_apps],
+            [f"[{r['item_id']}] {r['title']}" for r in orphan_apps])
 
-    # 3. 分组无容器
+    # 3/4. 分组无容器、空分组：一次聚合得到每个分组的分页数与子项总数
     groups = conn.execute(
-        "SELECT i.rowid, g.title FROM items i JOIN groups g ON i.rowid=g.item_id WHERE i.type=?",
-        (TYPE_GROUP,),
+        f"""WITH {CHILD_STATS}
+            SELECT gi.rowid, g.title, COUNT(c.rowid) AS pages, COALESCE(SUM(cs.n), 0) AS children
+            FROM items gi
+            JOIN groups g ON gi.rowid = g.item_id
+            LEFT JOIN items c ON c.parent_id = gi.rowid AND +c.type = ?  -- "+" 让规划器走 (parent_id, ordering) 索引
+            LEFT JOIN child_stats cs ON cs.parent_id = c.rowid
+            WHERE gi.type = ?
+            GROUP BY gi.rowid ORDER BY gi.rowid""",
+        (TYPE_CONTAINER, TYPE_GROUP),
     ).fetchall()
     for g in groups:
-        container = conn.execute(
-            "SELECT rowid FROM items WHERE type=? AND parent_id=?", (TYPE_CONTAINER, g["rowid"])
-        ).fetchone()
-        if not container:
-            issues.append(f"分组 [{g['rowid']}] {g['title']} 缺少内部容器")
-
-    # 4. 空分组（所有容器内均无应用）
-    empty_groups = []
-    for g in groups:
-        containers = conn.execute(
-            "SELECT rowid FROM items WHERE type=? AND parent_id=?", (TYPE_CONTAINER, g["rowid"])
-        ).fetchall()
-        if containers:
-            total_count = sum(
-                conn.execute("SELECT COUNT(*) FROM items WHERE parent_id=?", (c["rowid"],)).fetchone()[0]
-                for c in containers
-            )
-            if total_count == 0:
-                empty_groups.append(f"  📁 [{g['rowid']}] {g['title']}")
+        if g["pages"] == 0:
+            add("GROUP_WITHOUT_CONTAINER", f"分组 [{g['rowid']}] {g['title']} 缺少内部容器", [g["rowid"]])
+    empty_groups = [g for g in groups if g["pages"] > 0 and g["children"] == 0]
     if empty_groups:
-        issues.append(f"空分组: {len(empty_groups)} 个")
-        issues.extend(empty_groups)
+        add("GROUP_EMPTY", f"空分组: {len(empty_groups)} 个",
+            [g["rowid"] for g in empty_groups],
+            [f"📁 [{g['rowid']}] {g['title']}" for g in empty_groups])
 
-    # 5. 空分页（分组内某个容器为空，但分组本身不为空）
-    empty_group_pages = []
-    for g in groups:
-        containers = conn.execute(
-            "SELECT rowid FROM items WHERE type=? AND parent_id=? ORDER BY ordering",
-            (TYPE_CONTAINER, g["rowid"])
-        ).fetchall()
-        if len(containers) > 1:
-            for ci, c in enumerate(containers):
-                count = conn.execute(
-                    "SELECT COUNT(*) FROM items WHERE parent_id=?", (c["rowid"],)
-                ).fetchone()[0]
-                if count == 0:
-                    empty_group_pages.append(f"  📁 [{g['rowid']}] {g['title']} 分页{ci+1} (容器{c['rowid']})")
+    # 5. 空分页（多分页分组中某个分页为空）
+    empty_group_pages = conn.execute(
+        f"""WITH {CHILD_STATS},
+            pages AS (
+                SELECT c.rowid, c.parent_id AS group_id, g.title,
+                       ROW_NUMBER() OVER (PARTITION BY c.parent_id ORDER BY c.ordering) AS page_no,
+                       COUNT(*) OVER (PARTITION BY c.parent_id) AS page_count,
+                       COALESCE(cs.n, 0) AS n
+                FROM items c
+                JOIN items gi ON c.parent_id = gi.rowid AND gi.type = ?
+                JOIN groups g ON g.item_id = gi.rowid
+                LEFT JOIN child_stats cs ON cs.parent_id = c.rowid
+                WHERE c.type = ?
+            )
+            SELECT * FROM pages WHERE page_count > 1 AND n = 0 ORDER BY group_id, page_no""",
+        (TYPE_GROUP, TYPE_CONTAINER),
+    ).fetchall()
     if empty_group_pages:
-        issues.append(f"空分页: {len(empty_group_pages)} 个")
-        issues.extend(empty_group_pages)
+        add("GROUP_PAGE_EMPTY", f"空分页: {len(empty_group_pages)} 个",
+            [r["rowid"] for r in empty_group_pages],
+            [f"📁 [{r['group_id']}] {r['title']} 分页{r['page_no']} (容器{r['rowid']})" for r in empty_group_pages])
 
     # 6. 孤立页面（无子项的顶层页面）
-    pages = conn.execute(
-        """SELECT i.rowid FROM items i WHERE i.type=? AND i.parent_id IN
-           (SELECT rowid FROM items WHERE type=? AND parent_id=0)""",
+    empty_pages = [r[0] for r in conn.execute(
+        """SELECT p.rowid FROM items p
+           WHERE p.type=? AND p.parent_id IN (SELECT rowid FROM items WHERE type=? AND parent_id=0)
+             AND NOT EXISTS (SELECT 1 FROM items c WHERE c.parent_id = p.rowid)""",
         (TYPE_CONTAINER, TYPE_CONTAINER),
-    ).fetchall()
-    empty_pages = []
-    for p in pages:
-        count = conn.execute("SELECT COUNT(*) FROM items WHERE parent_id=?", (p["rowid"],)).fetchone()[0]
-        if count == 0:
-            empty_pages.append(p["rowid"])
+    )]
     if empty_pages:
-        issues.append(f"空页面: {len(empty_pages)} 个 (IDs: {empty_pages})")
+        add("PAGE_EMPTY", f"空页面: {len(empty_pages)} 个 (IDs: {empty_pages})", empty_pages)
 
     # 7. bookmark 缺失统计
-    no_bookmark = conn.execute(
-        "SELECT COUNT(*) FROM apps WHERE bookmark IS NULL OR LENGTH(bookmark) = 0"
-    ).fetchone()[0]
-    total = conn.execute("SELECT COUNT(*) FROM apps").fetchone()[0]
-    if no_bookmark > 0:
-        issues.append(f"bookmark 为空: {no_bookmark}/{total} 个应用")
+    row = conn.execute(
+        """SELECT COUNT(*) AS total,
+                  SUM(CASE WHEN bookmark IS NULL OR LENGTH(bookmark) = 0 THEN 1 ELSE 0 END) AS missing
+           FROM apps"""
+    ).fetchone()
+    if row["missing"]:
+        add("BOOKMARK_MISSING", f"bookmark 为空: {row['missing']}/{row['total']} 个应用")
+
+    # 7b. bookmark 无法解析
+    unreadable = {i: e["error"] for i, e in resolve_bookmarks(conn, db_path).items() if "error" in e}
+    if unreadable:
+        details = [f"[{i}] {err}" for i, err in list(unreadable.items())[:DETAIL_LIMIT]]
+        if len(unreadable) > DETAIL_LIMIT:
+            details.append(f"... 另有 {len(unreadable) - DETAIL_LIMIT} 个（完整列表见 ids 或 resolve_bookmarks.py --errors）")
+        add("BOOKMARK_UNREADABLE", f"bookmark 无法解析: {len(unreadable)} 个应用", list(unreadable), details)
+
+    # 8/9. 排序重复与断号；10. 容器超出容量
+    # 编号方式按数据判断而不看本进程的 APPGRID_ORDERING_GAP：序号不是 0..n-1 的父节点中，
+    # 所有序号有大于 1 的公约数（间隔模式按步长编号、取中间值插入）的视为间隔模式，允许断号，其余报告断号
+    stats = conn.execute(
+        f"""WITH {CHILD_STATS}
+            SELECT cs.*, p.type AS parent_type, p.parent_id AS grandparent
+            FROM child_stats cs JOIN items p ON p.rowid = cs.parent_id
+            ORDER BY cs.parent_id"""
+    ).fetchall()
+    duplicated = [r for r in stats if r["distinct_ord"] < r["n"]]
+    if duplicated:
+        add("ORDERING_DUPLICATE", f"ordering 重复: {len(duplicated)} 个父节点",
+            [r["parent_id"] for r in duplicated],
+            [f"[{r['parent_id']}] {r['n']} 个子项仅 {r['distinct_ord']} 个不同序号" for r in duplicated])
+    candidates = {
+        r["parent_id"]: r for r in stats
+        if r["distinct_ord"] == r["n"] and (r["min_ord"] != 0 or r["max_ord"] != r["n"] - 1)
+    }
+    steps = dict.fromkeys(candidates, 0)
+    ids = list(candidates)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        for parent_id, ordering in conn.execute(
+            f"SELECT parent_id, ordering FROM items WHERE parent_id IN ({','.join('?' * len(chunk))})", chunk
+        ):
+            steps[parent_id] = math.gcd(steps[parent_id], ordering or 0)
+    gapped = [r for pid, r in candidates.items() if steps[pid] <= 1]
+    if gapped:
+        add("ORDERING_GAP", f"ordering 不连续: {len(gapped)} 个父节点",
+            [r["parent_id"] for r in gapped],
+            [f"[{r['parent_id']}] {r['n']} 个子项序号范围 {r['min_ord']}..{r['max_ord']}" for r in gapped])
+    over = [
+        r for r in stats
+        if r["parent_type"] == TYPE_CONTAINER and r["grandparent"] != 0 and r["n"] > MAX_ITEMS_PER_CONTAINER
+    ]
+    if over:
+        add("CONTAINER_OVER_CAPACITY", f"容器超出上限 {MAX_ITEMS_PER_CONTAINER}: {len(over)} 个",
+            [r["parent_id"] for r in over],
+            [f"[{r['parent_id']}] {r['n']} 个子项" for r in over])
+
+    return issues
+
 
+def main():
+    parser = argparse.ArgumentParser(description="检查 AppGrid 数据库一致性")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "read")
+    issues = check(conn, args.db)
     conn.close()
 
-    if issues:
-        print(f"发现 {len(issues)} 个问题:")
-        for issue in issues:
-            print(f"  ⚠️  {issue}")
+    if args.format == "json":
+        print(json.dumps({"ok": not issues, "issues": issues}, ensure_ascii=False, indent=2))
+        return
+
+    lines = []
+    for issue in issues:
+        lines.append(issue["message"])
+        lines.extend(f"  {d}" for d in issue["details"])
+    if lines:
+        print(f"发现 {len(lines)} 个问题:")
+        for line in lines:
+            print(f"  ⚠️  {line}")
     else:
         print("✓ 数据库一致性检查通过，无问题")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -5,48 +5,53 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
-from core import connect, TYPE_GROUP, TYPE_CONTAINER, TYPE_APP
+from core import connect, GridSnapshot, TYPE_APP
+from profiling import add_profile_argument
+
+
+def find_ungrouped(snap) -> dict:
+    """基于快照找出不在任何分组内的应用"""
+    # 获取所有分组容器 ID
+    container_ids = snap.group_container_ids()
+
+    # 获取所有应用（按名称排序）
+    apps = [
+        {"rowid": rid, "parent_id": item["parent_id"],
+         "title": snap.apps[rid]["title"], "bundleid": snap.apps[rid]["bundleid"]}
+        for rid, item in sorted(snap.items.items())
+        if item["type"] == TYPE_APP and rid in snap.apps
+    ]
+    apps.sort(key=lambda a: (a["title"] is not None, a["title"] or ""))
+
+    ungrouped = [a for a in apps if a["parent_id"] not in container_ids]
+    grouped = len(apps) - len(ungrouped)
+    return {"total": len(apps), "grouped": grouped, "ungrouped": ungrouped}
 
 
 def main():
     parser = argparse.ArgumentParser(description="检查未归组的 AppGrid 应用")
     parser.add_argument("--db", required=True, help=".agrid 数据库路径")
     parser.add_argument("--format", choices=["table", "json"], default="table")
+    add_profile_argument(parser)
     args = parser.parse_args()
 
-    conn = connect(args.db)
+    conn = connect(args.db, "read")
+    snap = GridSnapshot(conn)
+    conn.close()
 
-    # 获取所有分组容器 ID
-    group_containers = conn.execute(
-        """SELECT i.rowid FROM items i
-           WHERE i.type = ? AND i.parent_id IN (SELECT rowid FROM items WHERE type = ?)""",
-        (TYPE_CONTAINER, TYPE_GROUP),
-    ).fetchall()
-    container_ids = {r["rowid"] for r in group_containers}
-
-    # 获取所有应用
-    apps = conn.execute(
-        """SELECT i.rowid, i.parent_id, a.title, a.bundleid
-           FROM items i JOIN apps a ON i.rowid = a.item_id
-           WHERE i.type = ? ORDER BY a.title""",
-        (TYPE_APP,),
-    ).fetchall()
-
-    ungrouped = [dict(a) for a in apps if a["parent_id"] not in container_ids]
-    grouped = len(apps) - len(ungrouped)
+    result = find_ungrouped(snap)
+    ungrouped = result["ungrouped"]
 
     if args.format == "json":
-        print(json.dumps({"total": len(apps), "grouped": grouped, "ungrouped": ungrouped}, ensure_ascii=False, indent=2))
+        print(json.dumps(result, ensure_ascii=False, indent=2))
     else:
-        print(f"总应用: {len(apps)}, 已归组: {grouped}, 未归组: {len(ungrouped)}")
+        print(f"总应用: {result['total']}, 已归组: {result['grouped']}, 未归组: {len(ungrouped)}")
         if ungrouped:
             print(f"\n{'ID':<8} {'名称':<30} {'Bundle ID':<45} {'父节点'}")
             print("-" * 95)
             for a in ungrouped:
                 print(f"{a['rowid']:<8} {(a['title'] or ''):<30} {(a['bundleid'] or ''):<45} {a['parent_id']}")
 
-    conn.close()
-
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
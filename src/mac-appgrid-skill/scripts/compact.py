@@ -0,0 +1,101 @@
+"""整理分组分页：按顺序把应用前移填满分页，删除空分页，并重新连续编号"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import (
+    connect, WriteSession, ordering_at, GridSnapshot,
+    MAX_ITEMS_PER_CONTAINER, TYPE_CONTAINER, TYPE_GROUP,
+)
+from journal import prepare_journal
+from profiling import add_profile_argument
+
+
+def plan_compaction(snap, remove_empty_pages: bool = False) -> tuple[dict, list[int]]:
+    """计算整理后的布局，返回 ({父节点: [子项...]}, 待删除容器列表)"""
+    layout = {pid: list(children) for pid, children in snap.children.items()}
+    deleted = []
+
+    # 分组：所有分页的应用按原顺序连接后，每 35 个一页依次填满，多余分页删除（至少保留一页）
+    for gid, item in snap.items.items():
+        if item["type"] != TYPE_GROUP:
+            continue
+        pages = [c for c in layout.get(gid, []) if snap.items[c]["type"] == TYPE_CONTAINER]
+        if not pages:
+            continue
+        members = [rid for page in pages for rid in layout.get(page, [])]
+        needed = max(1, -(-len(members) // MAX_ITEMS_PER_CONTAINER))
+        for i, page in enumerate(pages):
+            layout[page] = members[i * MAX_ITEMS_PER_CONTAINER:(i + 1) * MAX_ITEMS_PER_CONTAINER] if i < needed else []
+        for page in pages[needed:]:
+            layout[gid].remove(page)
+            layout.pop(page, None)
+            deleted.append(page)
+
+    # 顶层空页面（可选，至少保留一页）
+    grid = snap.get_grid()
+    if remove_empty_pages and grid is not None:
+        pages = [p for p in layout.get(grid, []) if snap.items[p]["type"] == TYPE_CONTAINER]
+        empty = [p for p in pages if not layout.get(p)]
+        if len(empty) == len(pages):
+            empty = empty[1:]
+        for page in empty:
+            layout[grid].remove(page)
+            layout.pop(page, None)
+            deleted.append(page)
+    return layout, deleted
+
+
+def compact(conn, remove_empty_pages: bool = False) -> dict:
+    """一次读取、一次批量写入完成整理（不提交），返回 {moved, renumbered, deleted_pages}"""
+    snap = GridSnapshot(conn)
+    layout, deleted = plan_compaction(snap, remove_empty_pages)
+
+    updates, moved = [], 0
+    for parent_id, children in layout.items():
+        if parent_id == 0:
+            continue
+        for i, rid in enumerate(children):
+            item = snap.items[rid]
+            ordering = ordering_at(i)
+            if item["parent_id"] != parent_id or item["ordering"] != ordering:
+                moved += item["parent_id"] != parent_id
+                updates.append((parent_id, ordering, rid))
+    conn.executemany("UPDATE items SET parent_id=?, ordering=? WHERE rowid=?", updates)
+    conn.executemany("DELETE FROM items WHERE rowid=?", [(rid,) for rid in deleted])
+    return {"moved": moved, "renumbered": len(updates) - moved, "deleted_pages": deleted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="整理 AppGrid 分组分页（填满分页、删除空分页、重新编号）")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--remove-empty-pages", action="store_true", help="同时删除没有任何子项的顶层页面")
+    parser.add_argument("--dry-run", action="store_true", help="只计算变更，不写入数据库")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "write")
+    try:
+        on_begin = None if args.dry_run else prepare_journal(conn, "compact", vars(args))
+        result = WriteSession(conn).run(compact, args.remove_empty_pages, on_begin=on_begin, commit=not args.dry_run)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    conn.close()
+
+    if args.format == "json":
+        print(json.dumps({**result, "dry_run": args.dry_run}, ensure_ascii=False, indent=2))
+        return
+    if not (result["moved"] or result["renumbered"] or result["deleted_pages"]):
+        print("✓ 无需整理")
+        return
+    prefix = "（预演，未写入）" if args.dry_run else "✓ 整理完成："
+    print(f"{prefix}跨页移动 {result['moved']} 项，重新编号 {result['renumbered']} 项，"
+          f"删除空分页 {len(result['deleted_pages'])} 个")
+
+
+if __name__ == "__main__":
+    main()
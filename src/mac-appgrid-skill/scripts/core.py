@@ -1,8 +1,13 @@
 """AppGrid 数据库核心操作模块"""
+import os
 import sqlite3
-import uuid
+import sys
+import time
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent))
+from profiling import connection_factory
+
 
 # 类型常量
 TYPE_CONTAINER = 3  # 容器/页面
@@ -12,17 +17,166 @@ TYPE_APP = 4        # 应用
 # 容量限制：AppGrid 单个容器（页面或分组）最多容纳的子项数（7列 × 5行）
 MAX_ITEMS_PER_CONTAINER = 35
 
+# 排序间隔：默认 1（与 AppGrid 一致的连续编号）；设置 APPGRID_ORDERING_GAP（如 1024）启用间隔模式，
+# 在已有间隔处插入时直接取中间值，无需改动其他兄弟节点
+ORDERING_GAP = max(1, int(os.environ.get("APPGRID_ORDERING_GAP", "1")))
+
+# 写事务：等待写锁的超时（秒，APPGRID_BUSY_TIMEOUT）与超时后的重试次数（APPGRID_WRITE_RETRIES）
+BUSY_TIMEOUT = float(os.environ.get("APPGRID_BUSY_TIMEOUT", "5"))
+WRITE_RETRIES = int(os.environ.get("APPGRID_WRITE_RETRIES", "3"))
+# 等锁累计超过该秒数时在 stderr 提示
+LOCK_WAIT_NOTICE = 1.0
+
+# 只读连接的内存映射上限与页缓存（KiB）：整库通常只有几 MB，全部映射后查询不再逐页 read()
+READ_MMAP_SIZE = 256 * 1024 * 1024
+READ_CACHE_KB = 32 * 1024
+
 
-def connect(db_path: str) -> sqlite3.Connection:
-    """连接数据库，返回 Connection"""
+def ordering_at(index: int) -> int:
+    """第 index 个子项在重新编号后的排序值；间隔模式从 ORDERING_GAP 起编，保证首位之前也有空隙"""
+    return index * ORDERING_GAP if ORDERING_GAP == 1 else (index + 1) * ORDERING_GAP
+
+
+def connect(db_path: str, profile: str | None = None, attach: dict[str, str] | None = None) -> sqlite3.Connection:
+    """连接数据库，返回 Connection
+
+    profile="read"：只读打开（mode=ro + query_only），调大 mmap/页缓存，并开启一个读事务，
+    之后的所有查询看到同一个一致快照，不会读到其他程序写了一半的修改；
+    attach 为 {别名: 路径}，在读事务开始前同样以只读方式 ATTACH（读事务内不能 ATTACH）；
+    profile="write"：面向短时写入的日志/同步设置（见 _write_profile），配合 WriteSession 使用。
+    """
     p = Path(db_path).expanduser().resolve()
     if not p.exists():
         raise FileNotFoundError(f"数据库文件不存在: {p}")
-    conn = sqlite3.connect(str(p))
+    if profile not in (None, "read", "write"):
+        raise ValueError(f"未知的连接配置: {profile}")
+    if attach and profile != "read":
+        raise ValueError("attach 只用于 read 配置")
+    if profile == "read":
+        conn = sqlite3.connect(f"{p.as_uri()}?mode=ro", uri=True, factory=connection_factory())
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {READ_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{READ_CACHE_KB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        for alias, path in (attach or {}).items():
+            other = Path(path).expanduser().resolve()
+            if not other.exists():
+                conn.close()
+                raise FileNotFoundError(f"数据库文件不存在: {other}")
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (f"{other.as_uri()}?mode=ro",))
+        # 延迟读事务：第一次查询时取得快照，直到 close() 才释放
+        conn.execute("BEGIN DEFERRED")
+    else:
+        conn = sqlite3.connect(str(p), factory=connection_factory())
+        if profile == "write":
+            _write_profile(conn)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def _write_profile(conn: sqlite3.Connection):
+    """写入配置：只改本连接的设置，不改变数据库文件的日志模式（WAL 会持久写入文件头，AppGrid 也要打开它）"""
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0].lower()
+    if mode == "wal":
+        # WAL 下 NORMAL 只在检查点时 fsync，断电最多丢失最后一次提交，不会损坏数据库
+        conn.execute("PRAGMA synchronous = NORMAL")
+    elif mode == "delete":
+        # 回滚日志截断而非删除：每次提交少一次目录项的创建/删除
+        conn.execute("PRAGMA journal_mode = TRUNCATE")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def sidecar_path(db_path: str, suffix: str) -> Path:
+    """数据库旁路文件路径（如搜索索引、统计缓存）：<db>.<suffix>"""
+    p = Path(db_path).expanduser().resolve()
+    return p.with_name(f"{p.name}.{suffix}")
+
+
+def file_stamp(db_path: str) -> str:
+    """数据库文件（含 -wal）的 size/mtime 指纹加文件头修改计数，用于判断旁路文件是否过期"""
+    p = Path(db_path).expanduser().resolve()
+    parts = []
+    for f in (p, p.with_name(p.name + "-wal")):
+        if f.exists():
+            st = f.stat()
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+    if parts:
+        # 文件头偏移 24 处为 file change counter，每次提交写事务都会递增（跨进程持久，不同于 data_version）
+        with open(p, "rb") as fh:
+            fh.seek(24)
+            parts[0] += ":" + fh.read(4).hex()
+    return "/".join(parts)
+
+
+def _is_busy(e: sqlite3.OperationalError) -> bool:
+    code = getattr(e, "sqlite_errorcode", None)
+    return code in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED) if code is not None else "locked" in str(e)
+
+
+class WriteSession:
+    """写事务：BEGIN IMMEDIATE 先取得写锁再读取/检查/写入，避免读后升级写锁时直接报 database is locked
+    或容量检查与其他写入交错；等锁超时后随机退避重试，并记录等锁耗时与外部修改（data_version）"""
+
+    def __init__(self, conn: sqlite3.Connection, busy_timeout: float | None = None, retries: int | None = None):
+        self.conn = conn
+        self.retries = WRITE_RETRIES if retries is None else retries
+        conn.execute(f"PRAGMA busy_timeout = {int((BUSY_TIMEOUT if busy_timeout is None else busy_timeout) * 1000)}")
+        # 创建会话时看到的版本；其他连接提交后 data_version 会变化（本连接的提交不会）
+        self.version = self._data_version()
+        self.stats = {"attempts": 0, "lock_wait": 0.0, "external_change": False}
+
+    def _data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def run(self, fn, *args, on_begin=None, commit: bool = True, **kwargs):
+        """在写事务中执行 fn(conn, *args, **kwargs) 并提交（commit=False 时回滚，用于预演）；
+        on_begin(conn) 在取得写锁后、fn 之前调用（如登记操作日志）。fn 抛出异常时回滚并原样抛出"""
+        if self.conn.in_transaction:
+            raise ValueError("写事务开始前连接上还有未提交的事务")
+        for attempt in range(self.retries + 1):
+            self.stats["attempts"] += 1
+            start = time.perf_counter()
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                self.stats["lock_wait"] += time.perf_counter() - start
+                if not _is_busy(e):
+                    raise
+                if attempt == self.retries:
+                    raise ValueError(
+                        f"数据库被其他程序占用，等待 {self.stats['lock_wait']:.1f}s 后仍无法写入（可关闭 AppGrid 后重试）"
+                    ) from e
+                import random  # 只在等锁重试时用到，不拖慢每次启动
+                time.sleep(min(2.0, 0.05 * 2 ** attempt) * random.uniform(0.5, 1.5))
+                continue
+            self.stats["lock_wait"] += time.perf_counter() - start
+
+            version = self._data_version()
+            if version != self.version:
+                self.stats["external_change"] = True
+                self.version = version
+            try:
+                if on_begin:
+                    on_begin(self.conn)
+                result = fn(self.conn, *args, **kwargs)
+                if commit:
+                    self.conn.commit()
+                else:
+                    self.conn.rollback()
+            except sqlite3.OperationalError as e:
+                self.conn.rollback()
+                if not _is_busy(e) or attempt == self.retries:
+                    raise
+                continue
+            except BaseException:
+                self.conn.rollback()
+                raise
+            if self.stats["lock_wait"] >= LOCK_WAIT_NOTICE:
+                print(f"⏳ 等待数据库写锁 {self.stats['lock_wait']:.1f}s（尝试 {self.stats['attempts']} 次）",
+                      file=sys.stderr)
+            return result
+
+
 def get_pages(conn: sqlite3.Connection) -> list[dict]:
     """获取所有页面（网格下的 type=3 容器）"""
     # 网格节点: type=3, parent_id=0 的子节点中 type=3
@@ -74,12 +228,17 @@ def get_group_containers(conn: sqlite3.Connection, group_id: int) -> list[int]:
 
 def find_available_container(conn: sqlite3.Connection, group_id: int, auto_create: bool = True) -> int:
     """在分组中找到有空位的容器，如果都满了且 auto_create=True 则自动创建新分页"""
-    containers = get_group_containers(conn, group_id)
+    # 一次查询得到各分页的占用数，而不是逐页 COUNT
+    containers = conn.execute(
+        """SELECT c.rowid, (SELECT COUNT(*) FROM items x WHERE x.parent_id = c.rowid) AS used
+           FROM items c WHERE c.type=? AND c.parent_id=? ORDER BY c.ordering""",
+        (TYPE_CONTAINER, group_id),
+    ).fetchall()
     if not containers:
         raise ValueError(f"分组 {group_id} 缺少内部容器")
-    for cid in containers:
-        if count_children(conn, cid) < MAX_ITEMS_PER_CONTAINER:
-            return cid
+    for c in containers:
+        if c["used"] < MAX_ITEMS_PER_CONTAINER:
+            return c["rowid"]
     if not auto_create:
         raise ValueError(f"分组 {group_id} 所有分页已满（共 {len(containers)} 页）")
     # 自动创建新分页
@@ -93,11 +252,12 @@ def get_next_ordering(conn: sqlite3.Connection, parent_id: int) -> int:
     row = conn.execute(
         "SELECT MAX(ordering) AS max_ord FROM items WHERE parent_id=?", (parent_id,)
     ).fetchone()
-    return (row["max_ord"] or -1) + 1
+    return 0 if row["max_ord"] is None else row["max_ord"] + ORDERING_GAP
 
 
 def insert_item(conn: sqlite3.Connection, type_: int, parent_id: int, ordering: int) -> int:
     """插入 items 记录，返回 rowid"""
+    import uuid  # uuid 会导入 platform，启动开销约数毫秒；只有新建节点时才需要
     uid = str(uuid.uuid4()).upper()
     cur = conn.execute(
         "INSERT INTO items (uuid, flags, type, parent_id, ordering) VALUES (?, 0, ?, ?, ?)",
@@ -114,13 +274,52 @@ def shift_ordering(conn: sqlite3.Connection, parent_id: int, from_pos: int, delt
     )
 
 
+def make_room(conn: sqlite3.Connection, parent_id: int, position: int) -> int:
+    """为第 position 个位置（从 0 开始）腾出排序值并返回；相邻排序值之间有空隙时不改动其他行"""
+    orderings = [
+        r["ordering"] for r in conn.execute(
+            "SELECT ordering FROM items WHERE parent_id=? ORDER BY ordering", (parent_id,)
+        )
+    ]
+    if position >= len(orderings):
+        return 0 if not orderings else orderings[-1] + ORDERING_GAP
+    after = orderings[position]
+    before = orderings[position - 1] if position > 0 else -1
+    if after - before > 1:
+        return (before + after) // 2
+    if ORDERING_GAP > 1:
+        # 间隔模式下空隙耗尽：按间隔重新编号一次，之后的插入又可直接取中间值
+        reorder_children(conn, parent_id)
+        return ordering_at(position) - ORDERING_GAP // 2
+    shift_ordering(conn, parent_id, after)
+    return after
+
+
+def reorder_after_removal(conn: sqlite3.Connection, parent_id: int):
+    """子项移出后整理原父节点：连续编号模式下重新编号；间隔模式下剩余子项的顺序不受影响，不改动任何行"""
+    if ORDERING_GAP == 1:
+        reorder_children(conn, parent_id)
+
+
 def reorder_children(conn: sqlite3.Connection, parent_id: int):
-    """重新整理子项的 ordering，从 0 开始连续编号"""
+    """重新整理子项的 ordering，按 ordering_at 连续编号（单条语句，只写变化的行）"""
+    if sqlite3.sqlite_version_info >= (3, 33, 0):
+        conn.execute(
+            """UPDATE items SET ordering = r.new_ord
+               FROM (SELECT rowid AS rid,
+                            (ROW_NUMBER() OVER (ORDER BY ordering, rowid) - 1) * ? + ? AS new_ord
+                     FROM items WHERE parent_id = ?) AS r
+               WHERE items.rowid = r.rid AND items.ordering IS NOT r.new_ord""",
+            (ORDERING_GAP, ordering_at(0), parent_id),
+        )
+        return
     rows = conn.execute(
-        "SELECT rowid FROM items WHERE parent_id=? ORDER BY ordering", (parent_id,)
+        "SELECT rowid, ordering FROM items WHERE parent_id=? ORDER BY ordering, rowid", (parent_id,)
     ).fetchall()
-    for i, row in enumerate(rows):
-        conn.execute("UPDATE items SET ordering=? WHERE rowid=?", (i, row["rowid"]))
+    conn.executemany(
+        "UPDATE items SET ordering=? WHERE rowid=?",
+        [(ordering_at(i), r["rowid"]) for i, r in enumerate(rows) if r["ordering"] != ordering_at(i)],
+    )
 
 
 def resolve_target(conn: sqlite3.Connection, target_id: int) -> int:
@@ -148,3 +347,220 @@ def check_capacity(conn: sqlite3.Connection, parent_id: int, adding: int = 1):
         raise ValueError(
             f"容器 {parent_id} 已有 {current} 个子项，添加 {adding} 个后将超出上限 {MAX_ITEMS_PER_CONTAINER}"
         )
+
+
+class GridSnapshot:
+    """数据库的内存快照：三次批量查询读取 items/apps/groups，之后的遍历全部在内存中完成"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.items: dict[int, dict] = {}
+        self.children: dict[int, list[int]] = {}
+        rows = conn.execute(
+            "SELECT rowid, uuid, flags, type, parent_id, ordering FROM items "
+            "ORDER BY parent_id, ordering, rowid"
+        )
+        for r in rows:
+            item = dict(r)
+            self.items[item["rowid"]] = item
+            self.children.setdefault(item["parent_id"], []).append(item["rowid"])
+        self.apps: dict[int, dict] = {
+            r["item_id"]: dict(r)
+            for r in conn.execute(
+                "SELECT item_id, title, bundleid, storeid, category_id, custom_path "
+                "FROM apps ORDER BY item_id"
+            )
+        }
+        self.groups: dict[int, dict] = {
+            r["item_id"]: dict(r)
+            for r in conn.execute("SELECT item_id, category_id, title FROM groups ORDER BY item_id")
+        }
+
+    def get_grid(self) -> int | None:
+        """网格节点 rowid（type=3, parent_id=0）"""
+        for rid in self.children.get(0, []):
+            if self.items[rid]["type"] == TYPE_CONTAINER:
+                return rid
+        return None
+
+    def get_pages(self) -> list[dict]:
+        """获取所有页面，与 get_pages(conn) 返回结构一致"""
+        grid = self.get_grid()
+        if grid is None:
+            return []
+        return [
+            {"rowid": rid, "ordering": self.items[rid]["ordering"]}
+            for rid in self.children.get(grid, [])
+            if self.items[rid]["type"] == TYPE_CONTAINER
+        ]
+
+    def get_children(self, parent_id: int) -> list[dict]:
+        """获取子项，与 get_children(conn, ...) 返回结构一致"""
+        result = []
+        for rid in self.children.get(parent_id, []):
+            item = self.items[rid]
+            app = self.apps.get(rid, {})
+            group = self.groups.get(rid, {})
+            result.append({
+                "rowid": rid,
+                "type": item["type"],
+                "parent_id": item["parent_id"],
+                "ordering": item["ordering"],
+                "app_title": app.get("title"),
+                "bundleid": app.get("bundleid"),
+                "custom_path": app.get("custom_path"),
+                "group_title": group.get("title"),
+            })
+        return result
+
+    def get_group_containers(self, group_id: int) -> list[int]:
+        """获取分组所有分页容器 rowid，按 ordering 排序"""
+        return [
+            rid for rid in self.children.get(group_id, [])
+            if self.items[rid]["type"] == TYPE_CONTAINER
+        ]
+
+    def count_children(self, parent_id: int, type_: int | None = None) -> int:
+        """统计子项数量，可按类型过滤"""
+        kids = self.children.get(parent_id, [])
+        if type_ is None:
+            return len(kids)
+        return sum(1 for rid in kids if self.items[rid]["type"] == type_)
+
+    def group_container_ids(self) -> set[int]:
+        """所有分组分页容器的 rowid 集合"""
+        return {
+            rid for rid, item in self.items.items()
+            if item["type"] == TYPE_CONTAINER
+            and self.items.get(item["parent_id"], {}).get("type") == TYPE_GROUP
+        }
+
+
+class MoveBatch:
+    """批量移动：子项顺序与容量在内存中维护，flush 时每个受影响容器只写一次"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.children: dict[int, list[int]] = {}
+        self.items: dict[int, dict] = {}
+        self.parent: dict[int, int] = {}
+        self.dirty: set[int] = set()
+
+    def preload(self, item_ids):
+        """批量读取 items 基本信息，避免逐个查询"""
+        ids = [i for i in set(item_ids) if i not in self.items]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT rowid, type, parent_id, ordering FROM items "
+                f"WHERE rowid IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for r in rows:
+                self.items[r["rowid"]] = dict(r)
+
+    def get_item(self, item_id: int) -> dict:
+        """获取 items 记录（带缓存），不存在则抛出 ValueError"""
+        if item_id not in self.items:
+            self.preload([item_id])
+        if item_id not in self.items:
+            raise ValueError(f"目标 ID {item_id} 不存在")
+        return self.items[item_id]
+
+    def get_children(self, parent_id: int) -> list[int]:
+        """获取子项 rowid 列表（首次访问时查询，之后在内存中维护）"""
+        if parent_id not in self.children:
+            rows = self.conn.execute(
+                "SELECT rowid, type, parent_id, ordering FROM items WHERE parent_id=? ORDER BY ordering",
+                (parent_id,),
+            ).fetchall()
+            for r in rows:
+                self.items.setdefault(r["rowid"], dict(r))
+            self.children[parent_id] = [r["rowid"] for r in rows]
+        return self.children[parent_id]
+
+    def find_available_container(self, group_id: int) -> int:
+        """find_available_container 的内存版本：按页查找空位，都满了则新建分页"""
+        pages = [
+            cid for cid in self.get_children(group_id)
+            if self.get_item(cid)["type"] == TYPE_CONTAINER
+        ]
+        if not pages:
+            raise ValueError(f"分组 {group_id} 缺少内部容器")
+        for cid in pages:
+            if len(self.get_children(cid)) < MAX_ITEMS_PER_CONTAINER:
+                return cid
+        return self.add_container(group_id)
+
+    def _insert(self, type_: int, parent_id: int) -> int:
+        """在 parent_id 的子项末尾插入新项目并登记到内存状态"""
+        siblings = self.get_children(parent_id)
+        ordering = ordering_at(len(siblings))
+        rowid = insert_item(self.conn, type_, parent_id, ordering)
+        self.items[rowid] = {"rowid": rowid, "type": type_, "parent_id": parent_id, "ordering": ordering}
+        siblings.append(rowid)
+        self.children[rowid] = []
+        self.dirty.add(parent_id)
+        return rowid
+
+    def add_container(self, parent_id: int) -> int:
+        """在网格末尾新建页面，或在分组末尾新建分页，返回容器 ID"""
+        return self._insert(TYPE_CONTAINER, parent_id)
+
+    def add_group(self, page_id: int, title: str, category_id: int = 0) -> tuple[int, int]:
+        """在页面末尾新建分组（含第一个分页），返回 (分组ID, 容器ID)；容量由调用方保证"""
+        group_id = self._insert(TYPE_GROUP, page_id)
+        self.conn.execute(
+            "INSERT INTO groups (item_id, category_id, title) VALUES (?, ?, ?)",
+            (group_id, category_id, title),
+        )
+        return group_id, self.add_container(group_id)
+
+    def resolve_target(self, target_id: int) -> int:
+        """解析移动目标：分组返回有空位的分页容器，否则原样返回"""
+        if self.get_item(target_id)["type"] == TYPE_GROUP:
+            return self.find_available_container(target_id)
+        return target_id
+
+    def move(self, item_id: int, target_id: int, position: int | None = None) -> int:
+        """移动项目到目标（页面/分组/容器），返回实际所在容器 ID"""
+        item = self.get_item(item_id)
+        container = self.resolve_target(target_id)
+        old_parent = self.parent.get(item_id, item["parent_id"])
+        src = self.get_children(old_parent)
+        dst = self.get_children(container)
+        if container != old_parent and len(dst) + 1 > MAX_ITEMS_PER_CONTAINER:
+            raise ValueError(
+                f"容器 {container} 已有 {len(dst)} 个子项，添加 1 个后将超出上限 {MAX_ITEMS_PER_CONTAINER}"
+            )
+        src.remove(item_id)
+        dst.insert(len(dst) if position is None else position, item_id)
+        self.parent[item_id] = container
+        self.dirty.update((old_parent, container))
+        return container
+
+    def set_children(self, parent_id: int, item_ids: list[int]):
+        """直接指定容器的完整子项顺序（如合并结果），容量由调用方保证"""
+        self.get_children(parent_id)
+        self.preload(item_ids)
+        for rid in item_ids:
+            old_parent = self.parent.get(rid, self.get_item(rid)["parent_id"])
+            if old_parent != parent_id and rid in self.children.get(old_parent, []):
+                self.children[old_parent].remove(rid)
+                self.dirty.add(old_parent)
+            self.parent[rid] = parent_id
+        self.children[parent_id] = list(item_ids)
+        self.dirty.add(parent_id)
+
+    def flush(self) -> int:
+        """将受影响容器的 parent_id/ordering 一次性写回（只写变化的行），返回写入行数"""
+        updates = []
+        for parent_id in self.dirty:
+            for i, rid in enumerate(self.children[parent_id]):
+                item = self.items[rid]
+                ordering = ordering_at(i)
+                if item["parent_id"] != parent_id or item["ordering"] != ordering:
+                    item["parent_id"], item["ordering"] = parent_id, ordering
+                    updates.append((parent_id, ordering, rid))
+        self.conn.executemany("UPDATE items SET parent_id=?, ordering=? WHERE rowid=?", updates)
+        self.dirty.clear()
+        return len(updates)
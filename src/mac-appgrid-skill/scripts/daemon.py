@@ -0,0 +1,159 @@
+"""AppGrid 常驻进程：从 stdin 读取 JSON Lines 命令，结果逐行写到 stdout
+
+请求：{"id": 1, "cmd": "tree", "args": {"page": 2}}
+响应：{"id": 1, "ok": true, "result": ...} 或 {"id": 1, "ok": false, "error": "..."}
+"""
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect, GridSnapshot, WriteSession
+from check_ungrouped import find_ungrouped
+from create_group import create_group
+from delete_group import delete_group
+from export import iter_apps
+from journal import attach_journal, prepare_journal, undo, redo
+from list_tree import build_pages
+from move_app import move_app, move_batch
+from move_group import move_group
+from rename_group import rename_group
+from resolve_bookmarks import resolve_bookmarks
+from search import search_indexed
+from stats import collect_stats
+from profiling import add_profile_argument
+
+
+class GridServer:
+    """持有数据库连接、树快照与统计结果；只在 data_version 或文件 mtime/size 变化时重新加载"""
+
+    def __init__(self, db_path: str):
+        self.path = Path(db_path).expanduser().resolve()
+        self.conn = connect(db_path, "write")
+        self.session = WriteSession(self.conn)
+        self._snap = None
+        self._stamp = None
+        self._stats = None
+        self._stats_stamp = None
+
+    def _db_stamp(self) -> tuple:
+        st = self.path.stat()
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        return version, st.st_mtime_ns, st.st_size
+
+    def snapshot(self) -> GridSnapshot:
+        """返回缓存的快照；其他进程修改过数据库时自动重新加载"""
+        stamp = self._db_stamp()
+        if self._snap is None or stamp != self._stamp:
+            self._snap = GridSnapshot(self.conn)
+            self._stamp = stamp
+        return self._snap
+
+    def stats(self) -> dict:
+        """统计结果与快照使用同一指纹缓存"""
+        stamp = self._db_stamp()
+        if self._stats is None or stamp != self._stats_stamp:
+            self._stats = collect_stats(self.conn)
+            self._stats_stamp = stamp
+        return self._stats
+
+    def write(self, fn, *args, journal: bool = True):
+        """在写事务中执行写操作并记录操作日志；本连接的提交不会改变 data_version，因此主动失效缓存"""
+        try:
+            if journal:
+                on_begin = prepare_journal(self.conn, fn.__name__, list(args))
+            else:
+                attach_journal(self.conn)
+                on_begin = None
+            return self.session.run(fn, *args, on_begin=on_begin)
+        finally:
+            self._snap = None
+            self._stats = None
+
+    def handle(self, cmd: str, args: dict):
+        if cmd == "ping":
+            return "pong"
+        if cmd == "tree":
+            return build_pages(self.snapshot(), args.get("page"))
+        if cmd == "search":
+            return search_indexed(str(self.path), self.conn, args["query"], args.get("field", "all"),
+                                  args.get("limit"))
+        if cmd == "stats":
+            return self.stats()
+        if cmd == "bookmarks":
+            resolved = resolve_bookmarks(self.conn, str(self.path), args.get("apps"))
+            return [{"id": item_id, **entry} for item_id, entry in resolved.items()]
+        if cmd == "ungrouped":
+            return find_ungrouped(self.snapshot())
+        if cmd == "export":
+            return list(iter_apps(self.conn))
+        if cmd == "move":
+            if "apps" in args or "moves" in args:
+                moves = args.get("moves") or [
+                    {"app": app_id, "to": args["to"], "position": None} for app_id in args["apps"]
+                ]
+                for m in moves:
+                    m.setdefault("position", None)
+                moved, touched = self.write(move_batch, moves)
+                return {"moved": moved, "containers": touched}
+            title, pos = self.write(move_app, args["app"], args["to"], args.get("position"))
+            return {"title": title, "ordering": pos}
+        if cmd == "move_group":
+            title, pos = self.write(move_group, args["group"], args["to_page"], args.get("position"))
+            return {"title": title, "ordering": pos}
+        if cmd == "create_group":
+            group_id, container_id = self.write(create_group, args["page"], args["name"], args.get("position"))
+            return {"group_id": group_id, "container_id": container_id}
+        if cmd == "delete_group":
+            title, moved = self.write(delete_group, args["group"])
+            return {"title": title, "moved": moved}
+        if cmd in ("undo", "redo"):
+            ops = self.write(undo if cmd == "undo" else redo, args.get("steps", 1), args.get("force", False),
+                             journal=False)
+            return [{"id": op["id"], "command": op["command"], "changes": op["changes"]} for op in ops]
+        if cmd == "rename_group":
+            old_name = self.write(rename_group, args["group"], args["name"])
+            return {"old_name": old_name}
+        raise ValueError(f"未知命令: {cmd}")
+
+    def close(self):
+        self.conn.close()
+
+
+def serve(server: GridServer, stdin, stdout):
+    """逐行处理请求，直到 EOF 或 quit 命令"""
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        req_id = None
+        try:
+            req = json.loads(line)
+            req_id = req.get("id")
+            if req.get("cmd") == "quit":
+                break
+            resp = {"id": req_id, "ok": True, "result": server.handle(req.get("cmd"), req.get("args") or {})}
+        except (ValueError, KeyError, TypeError, AttributeError, sqlite3.Error) as e:
+            msg = f"缺少参数: {e}" if isinstance(e, KeyError) else str(e)
+            resp = {"id": req_id, "ok": False, "error": msg}
+        stdout.write(json.dumps(resp, ensure_ascii=False) + "\n")
+        stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AppGrid 常驻进程（JSON Lines 协议）")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    server = GridServer(args.db)
+    try:
+        serve(server, sys.stdin, sys.stdout)
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
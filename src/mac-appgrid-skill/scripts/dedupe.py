@@ -0,0 +1,160 @@
+"""查找重复的应用条目（同一 bundleid 或同一路径出现多次），可按策略删除多余副本
+
+一次遍历全部应用，按键哈希分组：--by both 时 bundleid 或路径任一相同即视为同一应用（合并为一簇）。
+删除时在同一事务中清理 items/apps/image_cache 中多余副本的记录，每个受影响的容器只重新编号一次。
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect, WriteSession, reorder_children
+from export import iter_apps
+from journal import prepare_journal
+from profiling import add_profile_argument
+
+KEEP_POLICIES = {
+    "first": "保留网格中最靠前的一个",
+    "grouped": "优先保留已归入分组的一个（都在或都不在分组时取最靠前的）",
+    "oldest": "保留最早加入的一个（ID 最小）",
+}
+
+
+def app_keys(app: dict, by: str) -> list[tuple]:
+    """应用的去重键：bundleid 不区分大小写，路径忽略末尾的 /；空值不参与比较"""
+    keys = []
+    if by in ("bundleid", "both") and app["bundleid"]:
+        keys.append(("bundleid", app["bundleid"].lower()))
+    if by in ("path", "both") and app["custom_path"]:
+        keys.append(("path", app["custom_path"].rstrip("/")))
+    return keys
+
+
+def find_duplicates(conn, by: str = "both") -> list[list[dict]]:
+    """返回重复簇列表，每簇为按网格顺序排列的应用记录（含 page/group 位置）"""
+    clusters: dict[int, list[dict]] = {}   # 簇编号（首个成员的网格序号）→ 成员
+    owner: dict[tuple, int] = {}           # 去重键 → 簇编号
+    for seq, app in enumerate(iter_apps(conn)):
+        keys = app_keys(app, by)
+        if not keys:
+            continue
+        app["seq"] = seq
+        hits = {owner[k] for k in keys if k in owner}
+        cid = min(hits) if hits else seq
+        members = clusters.setdefault(cid, [])
+        # 新应用同时命中两个簇（A 的 bundleid、B 的路径）：并入编号较小的簇
+        for other in hits - {cid}:
+            merged = clusters.pop(other)
+            members.extend(merged)
+            for m in merged:
+                for k in app_keys(m, by):
+                    owner[k] = cid
+        members.append(app)
+        for k in keys:
+            owner[k] = cid
+    result = []
+    for members in clusters.values():
+        if len(members) > 1:
+            members.sort(key=lambda m: m["seq"])
+            result.append(members)
+    return result
+
+
+def choose_keeper(members: list[dict], policy: str) -> dict:
+    if policy == "grouped":
+        return next((m for m in members if m["group"]), members[0])
+    if policy == "oldest":
+        return min(members, key=lambda m: m["id"])
+    return members[0]
+
+
+def remove_duplicates(conn, by: str, policy: str) -> dict:
+    """查找并删除多余副本（在调用方的事务中执行，不提交），返回 {clusters, removed, containers}"""
+    clusters = find_duplicates(conn, by)
+    extra = []
+    for members in clusters:
+        keeper = choose_keeper(members, policy)
+        for m in members:
+            m["keep"] = m is keeper
+            if not m["keep"]:
+                extra.append(m["id"])
+
+    parents = set()
+    for start in range(0, len(extra), 500):
+        chunk = extra[start:start + 500]
+        parents.update(r[0] for r in conn.execute(
+            f"SELECT DISTINCT parent_id FROM items WHERE rowid IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    rows = [(rid,) for rid in extra]
+    conn.executemany("DELETE FROM image_cache WHERE item_id=?", rows)
+    conn.executemany("DELETE FROM apps WHERE item_id=?", rows)
+    conn.executemany("DELETE FROM items WHERE rowid=?", rows)
+    for parent_id in parents:
+        reorder_children(conn, parent_id)
+    return {"clusters": clusters, "removed": len(extra), "containers": len(parents)}
+
+
+def location(app: dict) -> str:
+    return f"{app['page']} / {app['group']}" if app["group"] else app["page"]
+
+
+def print_clusters(clusters: list[list[dict]]):
+    for members in clusters:
+        first = members[0]
+        print(f"{first['title'] or first['bundleid']}（{len(members)} 个）")
+        for m in members:
+            mark = {True: "保留", False: "删除", None: "    "}[m.get("keep")]
+            path = f"  {m['custom_path']}" if m["custom_path"] else ""
+            print(f"  {mark} [{m['id']}] {m['title']}  {m['bundleid']}  — {location(m)}{path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查找并清理 AppGrid 中重复的应用条目")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--by", choices=["bundleid", "path", "both"], default="both",
+                        help="重复判定：相同 bundleid、相同路径，或任一相同（默认）")
+    parser.add_argument("--keep", choices=list(KEEP_POLICIES),
+                        help="删除多余副本并按此策略保留一个：" + "；".join(f"{k} {v}" for k, v in KEEP_POLICIES.items())
+                        + "。省略时只报告")
+    parser.add_argument("--dry-run", action="store_true", help="只计算变更，不写入数据库")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    try:
+        if args.keep is None:
+            conn = connect(args.db, "read")
+            result = {"clusters": find_duplicates(conn, args.by), "removed": 0, "containers": 0}
+        else:
+            conn = connect(args.db, "write")
+            on_begin = None if args.dry_run else prepare_journal(conn, "dedupe", vars(args))
+            result = WriteSession(conn).run(remove_duplicates, args.by, args.keep,
+                                            on_begin=on_begin, commit=not args.dry_run)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    conn.close()
+
+    clusters = result["clusters"]
+    for members in clusters:
+        for m in members:
+            m.pop("seq", None)
+    if args.format == "json":
+        print(json.dumps({**result, "dry_run": args.dry_run}, ensure_ascii=False, indent=2))
+        return
+    if not clusters:
+        print("✓ 没有重复的应用")
+        return
+    print_clusters(clusters)
+    copies = sum(len(m) for m in clusters)
+    print(f"\n共 {len(clusters)} 组重复，{copies} 个条目")
+    if args.keep is None:
+        print("使用 --keep first|grouped|oldest 删除多余副本（可先加 --dry-run 预览）")
+        return
+    prefix = "（预演，未写入）" if args.dry_run else "✓ 清理完成："
+    print(f"{prefix}删除 {result['removed']} 个多余副本，重新编号 {result['containers']} 个容器")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,60 +5,71 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 from core import (
-    connect, get_group_containers, get_next_ordering, reorder_children,
-    TYPE_GROUP, TYPE_APP,
+    connect, WriteSession, get_group_containers, get_next_ordering, reorder_after_removal,
+    ORDERING_GAP, TYPE_GROUP, TYPE_APP, TYPE_CONTAINER,
 )
+from journal import prepare_journal
+from profiling import add_profile_argument
 
 
-def main():
-    parser = argparse.ArgumentParser(description="删除 AppGrid 分组")
-    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
-    parser.add_argument("--group", required=True, type=int, help="分组 ID")
-    args = parser.parse_args()
-
-    conn = connect(args.db)
-
+def delete_group(conn, group_id: int) -> tuple[str, int]:
+    """删除分组并将组内应用移回父页面，返回 (分组名称, 移回应用数)；不提交事务"""
     # 验证分组存在
     group = conn.execute(
         "SELECT i.rowid, i.parent_id, g.title FROM items i JOIN groups g ON i.rowid = g.item_id WHERE i.rowid=? AND i.type=?",
-        (args.group, TYPE_GROUP),
+        (group_id, TYPE_GROUP),
     ).fetchone()
     if not group:
-        print(f"错误: 分组 {args.group} 不存在", file=sys.stderr)
-        sys.exit(1)
+        raise ValueError(f"分组 {group_id} 不存在")
 
     page_id = group["parent_id"]
-    containers = get_group_containers(conn, args.group)
+    containers = get_group_containers(conn, group_id)
 
-    # 将所有分页内的应用移回父页面
-    moved = 0
+    # 将所有分页内的应用按 分页/ordering 顺序一次性移回父页面
     next_ord = get_next_ordering(conn, page_id)
-    for container_id in containers:
-        apps = conn.execute(
-            "SELECT rowid FROM items WHERE parent_id=? AND type=? ORDER BY ordering",
-            (container_id, TYPE_APP),
-        ).fetchall()
-        for app in apps:
-            conn.execute(
-                "UPDATE items SET parent_id=?, ordering=? WHERE rowid=?",
-                (page_id, next_ord, app["rowid"]),
-            )
-            next_ord += 1
-            moved += 1
-        # 删除容器
-        conn.execute("DELETE FROM items WHERE rowid=?", (container_id,))
+    apps = conn.execute(
+        """SELECT i.rowid FROM items i JOIN items c ON i.parent_id = c.rowid
+           WHERE c.parent_id=? AND c.type=? AND i.type=?
+           ORDER BY c.ordering, c.rowid, i.ordering""",
+        (group_id, TYPE_CONTAINER, TYPE_APP),
+    ).fetchall()
+    conn.executemany(
+        "UPDATE items SET parent_id=?, ordering=? WHERE rowid=?",
+        [(page_id, next_ord + i * ORDERING_GAP, app["rowid"]) for i, app in enumerate(apps)],
+    )
+    moved = len(apps)
+
+    # 删除容器
+    conn.executemany("DELETE FROM items WHERE rowid=?", [(cid,) for cid in containers])
 
     # 删除分组记录
-    conn.execute("DELETE FROM groups WHERE item_id=?", (args.group,))
-    conn.execute("DELETE FROM items WHERE rowid=?", (args.group,))
+    conn.execute("DELETE FROM groups WHERE item_id=?", (group_id,))
+    conn.execute("DELETE FROM items WHERE rowid=?", (group_id,))
 
     # 重新整理父页面排序
-    reorder_children(conn, page_id)
+    reorder_after_removal(conn, page_id)
+    return group["title"], moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="删除 AppGrid 分组")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--group", required=True, type=int, help="分组 ID")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "write")
+
+    try:
+        on_begin = prepare_journal(conn, "delete_group", vars(args))
+        title, moved = WriteSession(conn).run(delete_group, args.group, on_begin=on_begin)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    conn.commit()
     conn.close()
 
-    print(f"✓ 分组 '{group['title']}' 已删除，{moved} 个应用已移回页面")
+    print(f"✓ 分组 '{title}' 已删除，{moved} 个应用已移回页面")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,216 @@
+"""比较两个 .agrid 数据库的结构差异
+
+应用按 bundleid、其余节点按 uuid 匹配（网格根节点固定匹配）；每个节点计算包含子树的哈希，
+哈希相同的子树整体跳过，因此只有发生变化的容器才会被逐项比较。
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect, TYPE_APP, TYPE_CONTAINER, TYPE_GROUP
+from profiling import add_profile_argument
+
+GRID_KEY = "grid"
+
+CHANGE_KINDS = ("added", "removed", "moved", "reordered", "renamed")
+
+
+class KeyedTree:
+    """以跨数据库稳定的键标识节点的树：nodes[键] = {key, id, type, title, parent}，children[键] = [子键...]"""
+
+    def __init__(self, conn, schema: str = "main"):
+        self.nodes: dict[str, dict] = {}
+        self.children: dict[str, list[str]] = {}
+        self.key_of: dict[int, str] = {}
+        self._hashes: dict[str, bytes] = {}
+
+        # 一次联表查询取全部节点；不用 sqlite3.Row，逐行构造字典的开销占大头
+        cur = conn.cursor()
+        cur.row_factory = None
+        rows = cur.execute(
+            f"""SELECT i.rowid, i.uuid, i.type, i.parent_id, COALESCE(a.title, g.title), a.bundleid
+                FROM {schema}.items i
+                LEFT JOIN {schema}.apps a ON a.item_id = i.rowid AND i.type = {TYPE_APP}
+                LEFT JOIN {schema}.groups g ON g.item_id = i.rowid AND i.type = {TYPE_GROUP}
+                ORDER BY i.parent_id, i.ordering, i.rowid"""
+        ).fetchall()
+        grid = next((r[0] for r in rows if r[2] == TYPE_CONTAINER and r[3] == 0), None)
+        # 键按 rowid 顺序分配，重复 bundleid 的编号不受排列顺序影响
+        for rid, uid, type_, _, title, bundleid in sorted(rows):
+            key = self._key(rid, uid, bundleid, grid)
+            self.key_of[rid] = key
+            self.nodes[key] = {"key": key, "id": rid, "type": type_, "title": title, "parent": None}
+        for rid, _, _, parent, _, _ in rows:
+            pkey = self.key_of.get(parent)
+            self.nodes[self.key_of[rid]]["parent"] = pkey
+            self.children.setdefault(pkey, []).append(self.key_of[rid])
+        # 父节点不存在的项（含网格根节点）作为根
+        self.roots = self.children.pop(None, [])
+
+    def _key(self, rid: int, uid: str | None, bundleid: str | None, grid: int | None) -> str:
+        if rid == grid:
+            return GRID_KEY
+        base = f"app:{bundleid}" if bundleid else (f"uuid:{uid}" if uid else f"id:{rid}")
+        # 同一 bundleid 出现多次（重复图标）时依次编号
+        key, n = base, 1
+        while key in self.nodes:
+            n += 1
+            key = f"{base}#{n}"
+        return key
+
+    def hash(self, key: str) -> bytes:
+        """子树哈希：节点键、类型、名称与子节点列表（叶子按键和名称，子容器按其哈希）"""
+        h = self._hashes.get(key)
+        if h is None:
+            node = self.nodes[key]
+            d = hashlib.sha1(f"{key}\0{node['type']}\0{node['title']}\0".encode())
+            parts = []
+            for child in self.children.get(key, []):
+                if child in self.children:
+                    parts.append(self.hash(child).hex())
+                else:
+                    c = self.nodes[child]
+                    parts.append(f"{child}\0{c['type']}\0{c['title']}")
+            d.update("\1".join(parts).encode())
+            h = self._hashes[key] = d.digest()
+        return h
+
+    def label(self, key: str | None) -> str:
+        """便于阅读的节点描述：应用/分组名称，页面序号，分组分页序号"""
+        node = self.nodes.get(key)
+        if node is None:
+            return "（无）"
+        if node["type"] != TYPE_CONTAINER:
+            return f"「{node['title'] or ''}」"
+        if key == GRID_KEY:
+            return "网格"
+        parent = node["parent"]
+        index = self.children.get(parent, []).index(key) + 1
+        if parent == GRID_KEY:
+            return f"页面 {index}"
+        return f"{self.label(parent)} 第 {index} 页"
+
+
+def _stable(seq: list[int]) -> set[int]:
+    """最长递增子序列的下标集合：这些子项相对顺序不变，其余视为重排"""
+    tails, tail_idx, prev = [], [], [-1] * len(seq)
+    for i, v in enumerate(seq):
+        j = bisect.bisect_left(tails, v)
+        if j == len(tails):
+            tails.append(v)
+            tail_idx.append(i)
+        else:
+            tails[j] = v
+            tail_idx[j] = i
+        prev[i] = tail_idx[j - 1] if j else -1
+    keep, i = set(), tail_idx[-1] if tail_idx else -1
+    while i >= 0:
+        keep.add(i)
+        i = prev[i]
+    return keep
+
+
+def _entry(tree: KeyedTree, key: str, **extra) -> dict:
+    node = tree.nodes[key]
+    return {"key": key, "type": node["type"], "title": node["title"], **extra}
+
+
+def diff_trees(a: KeyedTree, b: KeyedTree) -> dict:
+    """a → b 的变更集：{added, removed, moved, reordered, renamed}，各为条目列表"""
+    changes = {kind: [] for kind in CHANGE_KINDS}
+    stack = list(reversed(b.roots)) + [k for k in reversed(a.roots) if k not in b.nodes]
+    visited = set()
+    while stack:
+        key = stack.pop()
+        if key in visited:
+            continue
+        visited.add(key)
+        in_a, in_b = key in a.nodes, key in b.nodes
+        if in_a and in_b:
+            if a.hash(key) == b.hash(key):
+                continue
+            old, new = a.nodes[key]["title"], b.nodes[key]["title"]
+            if old != new:
+                changes["renamed"].append(_entry(b, key, old_title=old, new_title=new))
+
+        a_kids = a.children.get(key, []) if in_a else []
+        b_kids = b.children.get(key, []) if in_b else []
+        stayed = []
+        for pos, child in enumerate(b_kids):
+            if child not in a.nodes:
+                changes["added"].append(_entry(b, child, parent=key, position=pos))
+            elif a.nodes[child]["parent"] != key:
+                changes["moved"].append(_entry(b, child, from_parent=a.nodes[child]["parent"],
+                                               to_parent=key, position=pos))
+            else:
+                stayed.append((pos, child))
+        for child in a_kids:
+            if child not in b.nodes:
+                changes["removed"].append(_entry(a, child, parent=key))
+
+        if len(stayed) > 1:
+            a_index = {c: i for i, c in enumerate(a_kids)}
+            keep = _stable([a_index[c] for _, c in stayed])
+            for i, (pos, child) in enumerate(stayed):
+                if i not in keep:
+                    changes["reordered"].append(_entry(b, child, parent=key, position=pos))
+
+        stack.extend(reversed(b_kids))
+        stack.extend(c for c in reversed(a_kids) if c not in b.nodes)
+    return changes
+
+
+def diff_databases(old_path: str, new_path: str) -> tuple[dict, KeyedTree, KeyedTree]:
+    """以 old 为主库、ATTACH new 后分别读取两棵树并比较（两个库都只读打开，在同一个读事务中读取）"""
+    conn = connect(old_path, "read", attach={"other": new_path})
+    a, b = KeyedTree(conn), KeyedTree(conn, "other")
+    conn.close()
+    return diff_trees(a, b), a, b
+
+
+def print_changes(changes: dict, a: KeyedTree, b: KeyedTree):
+    """按类别输出可读的变更列表"""
+    for e in changes["added"]:
+        print(f"+ {b.label(e['key'])} → {b.label(e['parent'])} #{e['position']}")
+    for e in changes["removed"]:
+        print(f"- {a.label(e['key'])}（原在 {a.label(e['parent'])}）")
+    for e in changes["moved"]:
+        print(f"→ {b.label(e['key'])}: {a.label(e['from_parent'])} → {b.label(e['to_parent'])} #{e['position']}")
+    for e in changes["reordered"]:
+        print(f"↕ {b.label(e['key'])}: {b.label(e['parent'])} 内调整到 #{e['position']}")
+    for e in changes["renamed"]:
+        print(f"✎ 「{e['old_title']}」 → 「{e['new_title']}」")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较两个 AppGrid 数据库的结构差异")
+    parser.add_argument("--old", required=True, help="旧的 .agrid 数据库")
+    parser.add_argument("--new", required=True, help="新的 .agrid 数据库")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    try:
+        changes, a, b = diff_databases(args.old, args.new)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.format == "json":
+        print(json.dumps(changes, ensure_ascii=False, indent=2))
+        return
+    total = sum(len(v) for v in changes.values())
+    if not total:
+        print("✓ 两个数据库结构相同")
+        return
+    print_changes(changes, a, b)
+    names = {"added": "新增", "removed": "删除", "moved": "移动", "reordered": "重排", "renamed": "重命名"}
+    print("\n" + "，".join(f"{names[k]} {len(changes[k])}" for k in CHANGE_KINDS))
+
+
+if __name__ == "__main__":
+    main()
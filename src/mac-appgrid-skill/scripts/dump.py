@@ -0,0 +1,123 @@
+"""无损导出网格数据为 NDJSON（逐行流式写出，内存占用与数据量无关），可用 load.py 还原
+
+文件格式（每行一个 JSON）：
+  {"format": "appgrid-dump", "version": 1, "created": ..., "tables": [...], "schema": [建表/索引 SQL...]}
+  {"table": "items", "columns": ["rowid", "uuid", ...]}
+  [1, "6D25...", 0, 3, 0, 0]                      ← 按 rowid 顺序的行，BLOB 写作 {"b64": "..."}
+  ...
+  {"end": true, "rows": {"items": 123, ...}}      ← 结束标记，缺失说明文件被截断
+"""
+import argparse
+import base64
+import gzip
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect
+from profiling import add_profile_argument
+
+DUMP_FORMAT = "appgrid-dump"
+DUMP_VERSION = 1
+
+# 默认导出的表：网格结构与应用/分组/分类；--all 时导出全部表（含图标缓存），用于完整克隆
+GRID_TABLES = ["items", "apps", "groups", "categories"]
+
+
+def _encode(value):
+    if isinstance(value, (bytes, memoryview)):
+        return {"b64": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+# 紧凑分隔符、不转义中文；只有 BLOB 会走 default
+ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_encode)
+
+
+def open_dump(path: str | None, mode: str):
+    """打开转储文件（.gz 结尾时读写 gzip）；path 为空或 "-" 时使用 stdin/stdout"""
+    if not path or path == "-":
+        return sys.stdin if mode == "r" else sys.stdout
+    p = Path(path).expanduser()
+    if mode == "w":
+        p.parent.mkdir(parents=True, exist_ok=True)
+    if p.suffix == ".gz":
+        return gzip.open(p, mode + "t", encoding="utf-8", compresslevel=6)
+    return open(p, mode, encoding="utf-8", newline="\n")
+
+
+def table_columns(conn, table: str) -> list[str]:
+    """表的列名；没有 INTEGER PRIMARY KEY 别名的表在前面加上 rowid，保证还原后 rowid 不变"""
+    info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+    columns = [r[1] for r in info]
+    pks = [r for r in info if r[5]]
+    if len(pks) == 1 and pks[0][2].upper() == "INTEGER":
+        return columns
+    without_rowid = conn.execute(
+        "SELECT sql LIKE '%WITHOUT ROWID%' FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()[0]
+    return columns if without_rowid else ["rowid", *columns]
+
+
+def dump_grid(conn: sqlite3.Connection, out, tables: list[str] | None = None) -> dict:
+    """把 tables（默认 GRID_TABLES）流式写到 out，返回 {表名: 行数}"""
+    existing = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+    )]
+    tables = existing if tables is None else [t for t in tables if t in existing]
+    schema = [r[0] for r in conn.execute(
+        f"SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND tbl_name IN ({','.join('?' * len(tables))}) "
+        "ORDER BY type = 'table' DESC, rowid",
+        tables,
+    )]
+    out.write(ENCODER.encode({"format": DUMP_FORMAT, "version": DUMP_VERSION, "created": time.time(),
+                              "tables": tables, "schema": schema}) + "\n")
+
+    counts = {}
+    cur = conn.cursor()
+    cur.row_factory = None
+    for table in tables:
+        columns = table_columns(conn, table)
+        out.write(ENCODER.encode({"table": table, "columns": columns}) + "\n")
+        select = ", ".join(f'"{c}"' if c != "rowid" else c for c in columns)
+        n = 0
+        for row in cur.execute(f'SELECT {select} FROM "{table}" ORDER BY rowid'):
+            out.write(ENCODER.encode(row))
+            out.write("\n")
+            n += 1
+        counts[table] = n
+    out.write(ENCODER.encode({"end": True, "rows": counts}) + "\n")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无损导出 AppGrid 网格数据（NDJSON，可用 load.py 还原）")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--output", help="输出文件（.gz 结尾时压缩；省略则输出到终端）")
+    parser.add_argument("--all", action="store_true", help="导出全部表（含图标缓存等），用于完整克隆")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    try:
+        conn = connect(args.db, "read")
+    except FileNotFoundError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    out = open_dump(args.output, "w")
+    try:
+        counts = dump_grid(conn, out, None if args.all else GRID_TABLES)
+    finally:
+        conn.close()
+        if out is not sys.stdout:
+            out.close()
+
+    if args.output and args.output != "-":
+        detail = "，".join(f"{t} {n}" for t, n in counts.items())
+        print(f"✓ 已导出到 {args.output}：{detail}")
+
+
+if __name__ == "__main__":
+    main()
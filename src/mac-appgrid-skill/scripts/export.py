@@ -3,42 +3,95 @@ import argparse
 import csv
 import json
 import sys
-from io import StringIO
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
-from core import connect, get_pages, get_group_containers, TYPE_GROUP, TYPE_APP
+from core import connect, TYPE_GROUP, TYPE_APP, TYPE_CONTAINER
+from resolve_bookmarks import resolve_bookmarks
+from profiling import add_profile_argument
 
+FIELDS = ["id", "title", "bundleid", "custom_path", "page", "group"]
 
-def collect_apps(conn, parent_id, page_name, group_name=""):
-    """递归收集应用列表"""
-    results = []
-    rows = conn.execute(
-        """SELECT i.rowid, i.type, a.title, a.bundleid, a.custom_path, g.title AS group_title
-           FROM items i
-           LEFT JOIN apps a ON i.rowid = a.item_id
-           LEFT JOIN groups g ON i.rowid = g.item_id
-           WHERE i.parent_id=? ORDER BY i.ordering""",
-        (parent_id,),
-    ).fetchall()
+# 一条递归 CTE 完成整棵树的遍历：页面 → 应用/分组 → 分组分页 → 应用。
+# 递归部分按 path 排序，SQLite 会用优先队列做深度优先展开，
+# 结果天然按 页面/分组/ordering 的顺序产出，无需最终排序，可边查边写。
+# 应用详情在递归步骤内关联：外层若再做 JOIN，SQLite 可能忽略 CTE 内的 ORDER BY。
+EXPORT_SQL = """
+WITH RECURSIVE
+  grid AS (
+    SELECT rowid FROM items WHERE type = :container AND parent_id = 0 ORDER BY rowid LIMIT 1
+  ),
+  tree(rowid, type, page_no, group_name, path, title, bundleid, custom_path) AS (
+    SELECT i.rowid, i.type,
+           ROW_NUMBER() OVER (ORDER BY i.ordering, i.rowid),
+           '',
+           printf('%010d.%010d', i.ordering, i.rowid),
+           NULL, NULL, NULL
+    FROM items i
+    WHERE i.type = :container AND i.parent_id = (SELECT rowid FROM grid)
+    UNION ALL
+    SELECT c.rowid, c.type, t.page_no,
+           CASE WHEN t.type = :group
+                THEN COALESCE((SELECT title FROM groups WHERE item_id = t.rowid), '')
+                ELSE t.group_name END,
+           t.path || printf('.%010d.%010d', c.ordering, c.rowid),
+           a.title, a.bundleid, a.custom_path
+    FROM tree t
+    JOIN items c ON c.parent_id = t.rowid
+    LEFT JOIN apps a ON a.item_id = c.rowid
+    WHERE (t.type = :container AND c.type IN (:app, :group))
+       OR (t.type = :group AND c.type = :container)
+    ORDER BY 5
+  )
+SELECT rowid, title, bundleid, custom_path, page_no, group_name
+FROM tree
+WHERE type = :app
+"""
 
+
+def iter_apps(conn):
+    """按页面/分组/ordering 顺序逐条产出应用记录（生成器）"""
+    cur = conn.execute(
+        EXPORT_SQL, {"container": TYPE_CONTAINER, "group": TYPE_GROUP, "app": TYPE_APP}
+    )
+    for row in cur:
+        yield {
+            "id": row["rowid"],
+            "title": row["title"] or "",
+            "bundleid": row["bundleid"] or "",
+            "custom_path": row["custom_path"] or "",
+            "page": f"页面{row['page_no']}",
+            "group": row["group_name"],
+        }
+
+
+def with_bookmark_paths(rows, resolved: dict):
+    """为每条记录追加书签解析出的实际路径（bookmark_path）"""
+    for row in rows:
+        row["bookmark_path"] = resolved.get(row["id"], {}).get("path", "")
+        yield row
+
+
+def write_csv(rows, out, fields=FIELDS) -> int:
+    """流式写出 CSV，返回写出行数"""
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    count = 0
     for row in rows:
-        if row["type"] == TYPE_APP:
-            results.append({
-                "id": row["rowid"],
-                "title": row["title"] or "",
-                "bundleid": row["bundleid"] or "",
-                "custom_path": row["custom_path"] or "",
-                "page": page_name,
-                "group": group_name,
-            })
-        elif row["type"] == TYPE_GROUP:
-            containers = get_group_containers(conn, row["rowid"])
-            for cid in containers:
-                results.extend(
-                    collect_apps(conn, cid, page_name, row["group_title"] or "")
-                )
-    return results
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_json(rows, out) -> int:
+    """流式写出 JSON 数组（格式与 json.dumps(indent=2) 一致），返回写出条数"""
+    count = 0
+    for row in rows:
+        item = json.dumps(row, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        out.write(("[\n  " if count == 0 else ",\n  ") + item)
+        count += 1
+    out.write("\n]\n" if count else "[]\n")
+    return count
 
 
 def main():
@@ -46,32 +99,29 @@ def main():
     parser.add_argument("--db", required=True, help=".agrid 数据库路径")
     parser.add_argument("--format", choices=["csv", "json"], default="csv")
     parser.add_argument("--output", help="输出文件路径（省略则输出到终端）")
+    parser.add_argument("--bookmark-paths", action="store_true", help="追加 bookmark_path 列（解析书签得到的实际路径）")
+    add_profile_argument(parser)
     args = parser.parse_args()
 
-    conn = connect(args.db)
-    pages = get_pages(conn)
-
-    all_apps = []
-    for i, page in enumerate(pages):
-        all_apps.extend(collect_apps(conn, page["rowid"], f"页面{i + 1}"))
+    conn = connect(args.db, "read")
+    rows = iter_apps(conn)
+    fields = FIELDS
+    if args.bookmark_paths:
+        rows = with_bookmark_paths(rows, resolve_bookmarks(conn, args.db))
+        fields = FIELDS + ["bookmark_path"]
 
-    conn.close()
-
-    if args.format == "json":
-        content = json.dumps(all_apps, ensure_ascii=False, indent=2)
-    else:
-        buf = StringIO()
-        writer = csv.DictWriter(buf, fieldnames=["id", "title", "bundleid", "custom_path", "page", "group"])
-        writer.writeheader()
-        writer.writerows(all_apps)
-        content = buf.getvalue()
+    def write(rows, out):
+        return write_json(rows, out) if args.format == "json" else write_csv(rows, out, fields)
 
     if args.output:
         Path(args.output).parent.mkdir(parents=True, exist_ok=True)
-        Path(args.output).write_text(content, encoding="utf-8")
-        print(f"✓ 已导出 {len(all_apps)} 个应用到 {args.output}")
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            count = write(rows, f)
+        print(f"✓ 已导出 {count} 个应用到 {args.output}")
     else:
-        print(content)
+        write(rows, sys.stdout)
+
+    conn.close()
 
 
 if __name__ == "__main__":
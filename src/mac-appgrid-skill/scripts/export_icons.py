@@ -0,0 +1,195 @@
+"""导出 image_cache 中的应用图标
+
+图标按块从 BLOB 流式写入磁盘（Connection.blobopen），单个图标不会整体读入内存；
+可选的缩略图规整（需要 Pillow）在进程池中对已写出的文件执行。
+"""
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect
+from profiling import add_profile_argument
+
+# 每次从 BLOB 读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+# 进程池中每个进程最多排队的任务数（限制待处理结果的内存）
+PENDING_PER_WORKER = 4
+
+COLUMNS = {"big": "image_data", "mini": "image_data_mini"}
+
+# 文件头特征 → 扩展名
+SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"icns", "icns"),
+    (b"GIF8", "gif"),
+    (b"BM", "bmp"),
+]
+
+
+def sniff_format(head: bytes) -> str:
+    """根据文件头判断图片格式，无法识别返回 bin"""
+    for magic, ext in SIGNATURES:
+        if head.startswith(magic):
+            return ext
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1"):
+        return "heic"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return "bin"
+
+
+def safe_name(text: str | None) -> str:
+    """文件名中去掉路径分隔符等非法字符"""
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", text or "").strip("_")[:60]
+
+
+def iter_chunks(conn, column: str, rowid: int, length: int):
+    """逐块读取 image_cache 的 BLOB；Python 3.11 以下没有 blobopen 时退回 substr 分段查询"""
+    if hasattr(conn, "blobopen"):
+        with conn.blobopen("image_cache", column, rowid, readonly=True) as blob:
+            while chunk := blob.read(CHUNK_SIZE):
+                yield chunk
+        return
+    for offset in range(1, length + 1, CHUNK_SIZE):
+        yield conn.execute(
+            f"SELECT substr({column}, ?, ?) FROM image_cache WHERE rowid=?", (offset, CHUNK_SIZE, rowid)
+        ).fetchone()[0]
+
+
+def normalize_icon(path: str, size: int) -> str:
+    """（子进程）把图标缩放为 size×size 的 PNG，返回新文件路径"""
+    from PIL import Image
+
+    src = Path(path)
+    dst = src.with_suffix(".png") if src.suffix != ".png" else src
+    with Image.open(src) as img:
+        img = img.convert("RGBA")
+        img.thumbnail((size, size))
+        canvas = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        canvas.paste(img, ((size - img.width) // 2, (size - img.height) // 2))
+        canvas.save(dst, "PNG")
+    if dst != src:
+        src.unlink()
+    return str(dst)
+
+
+def export_icons(conn, out_dir: str, kinds=("big",), app_ids=None,
+                 normalize: int | None = None, jobs: int | None = None) -> list[dict]:
+    """流式导出图标，返回每个文件的 {item_id, title, kind, format, bytes, path}"""
+    if normalize and importlib.util.find_spec("PIL") is None:
+        raise ValueError("--normalize 需要安装 Pillow (pip install Pillow)")
+    out = Path(out_dir).expanduser()
+    out.mkdir(parents=True, exist_ok=True)
+
+    where = ""
+    params = []
+    if app_ids:
+        where = f"WHERE ic.item_id IN ({','.join('?' * len(app_ids))})"
+        params = list(app_ids)
+    # 只取元数据与长度，BLOB 内容稍后按块读取
+    rows = conn.execute(
+        f"""SELECT ic.rowid, ic.item_id, a.title, a.bundleid,
+                   length(ic.image_data) AS big, length(ic.image_data_mini) AS mini
+            FROM image_cache ic LEFT JOIN apps a ON a.item_id = ic.item_id
+            {where}
+            ORDER BY ic.item_id, ic.rowid""",
+        params,
+    )
+
+    results = []
+    seen = set()
+    workers = jobs or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if normalize else None
+    pending = []
+    try:
+        for r in rows:
+            for kind in kinds:
+                length = r[kind]
+                if not length:
+                    continue
+                stem = f"{r['item_id']}_{safe_name(r['title'] or r['bundleid'])}"
+                if kind == "mini":
+                    stem += "_mini"
+                if stem in seen:
+                    stem += f"_{r['rowid']}"
+                seen.add(stem)
+
+                chunks = iter_chunks(conn, COLUMNS[kind], r["rowid"], length)
+                first = next(chunks)
+                fmt = sniff_format(first[:16])
+                path = out / f"{stem}.{fmt}"
+                with open(path, "wb") as f:
+                    f.write(first)
+                    for chunk in chunks:
+                        f.write(chunk)
+
+                entry = {"item_id": r["item_id"], "title": r["title"], "kind": kind,
+                         "format": fmt, "bytes": length, "path": str(path)}
+                results.append(entry)
+                if pool:
+                    pending.append((entry, pool.submit(normalize_icon, str(path), normalize)))
+                    if len(pending) >= workers * PENDING_PER_WORKER:
+                        _collect(pending.pop(0))
+        while pending:
+            _collect(pending.pop(0))
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    return results
+
+
+def _collect(task):
+    """等待规整任务完成并更新结果；无法解码的图标保留原文件"""
+    entry, future = task
+    try:
+        entry["path"] = future.result()
+        entry["format"] = "png"
+    except Exception as e:
+        entry["error"] = str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 AppGrid 图标缓存")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--output", required=True, help="输出目录")
+    parser.add_argument("--kind", choices=["big", "mini", "both"], default="big", help="导出大图标/小图标/全部")
+    parser.add_argument("--apps", type=int, nargs="+", help="只导出指定应用 ID")
+    parser.add_argument("--normalize", type=int, metavar="SIZE", help="规整为 SIZE×SIZE 的 PNG（需要 Pillow）")
+    parser.add_argument("--jobs", type=int, default=None, help="规整使用的进程数（默认 CPU 核数）")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    kinds = ("big", "mini") if args.kind == "both" else (args.kind,)
+    conn = connect(args.db, "read")
+    try:
+        results = export_icons(conn, args.output, kinds, args.apps, args.normalize, args.jobs)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    if args.format == "json":
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    failed = [r for r in results if "error" in r]
+    total = sum(r["bytes"] for r in results)
+    print(f"✓ 已导出 {len(results)} 个图标到 {args.output} ({total / 1024 / 1024:.1f} MB)")
+    for r in failed:
+        print(f"  ⚠️  [{r['item_id']}] {r['title']} 规整失败: {r['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""操作日志：记录每次修改的行级前后镜像，支持撤销/重做
+
+日志保存在数据库旁的 <db>.journal（SQLite），通过 ATTACH 与修改在同一事务中写入；
+行变化由连接内的 TEMP 触发器捕获，因此撤销的代价只与变更行数有关，与文件大小无关。
+设置环境变量 APPGRID_JOURNAL=0 可关闭记录。
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import sidecar_path
+
+JOURNAL_ENABLED = os.environ.get("APPGRID_JOURNAL", "1") != "0"
+
+# 最多保留的操作数，超出后删除最早的记录
+MAX_OPS = 200
+
+# 需要记录的表：(主键列, 其余列)；BLOB 列以十六进制保存
+TRACKED = {
+    "items": ("rowid", ["uuid", "flags", "type", "parent_id", "ordering"]),
+    "groups": ("item_id", ["category_id", "title"]),
+    "apps": ("item_id", ["title", "bundleid", "storeid", "category_id", "moddate", "bookmark", "custom_path"]),
+    # item_id 上没有唯一约束，按 rowid 记录，撤销时原样写回
+    "image_cache": ("rowid", ["item_id", "uuid", "size_big", "size_mini", "image_data", "image_data_mini"]),
+}
+BLOB_COLUMNS = {"bookmark", "image_data", "image_data_mini"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal.appgrid_ops (
+    id INTEGER PRIMARY KEY, command TEXT, args TEXT, created REAL, undone INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS journal.appgrid_changes (
+    seq INTEGER PRIMARY KEY, op_id INTEGER NOT NULL, tbl TEXT NOT NULL, row_id INTEGER NOT NULL,
+    before TEXT, after TEXT
+);
+CREATE INDEX IF NOT EXISTS journal.appgrid_changes_op ON appgrid_changes(op_id);
+"""
+
+
+def _image(alias: str, table: str) -> str:
+    """生成行镜像的 json_object 表达式（含主键）"""
+    key, cols = TRACKED[table]
+    parts = [f"'{key}', {alias}.{key}"]
+    for c in cols:
+        parts.append(f"'{c}', hex({alias}.{c})" if c in BLOB_COLUMNS else f"'{c}', {alias}.{c}")
+    return f"json_object({', '.join(parts)})"
+
+
+def _db_path(conn) -> str:
+    return next(r[2] for r in conn.execute("PRAGMA database_list") if r[1] == "main")
+
+
+def attach_journal(conn, create: bool = True) -> bool:
+    """挂载日志库（需在事务之外调用），返回日志库是否存在"""
+    if any(r[1] == "journal" for r in conn.execute("PRAGMA database_list")):
+        return True
+    path = sidecar_path(_db_path(conn), "journal")
+    if not create and not path.exists():
+        return False
+    conn.execute("ATTACH DATABASE ? AS journal", (str(path),))
+    conn.executescript(SCHEMA)
+    return True
+
+
+def _install_triggers(conn):
+    """创建 TEMP 触发器：只在设置了当前操作 ID 时记录 main 库的行变化"""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS appgrid_journal_op (op_id INTEGER)")
+    active = "(SELECT op_id FROM appgrid_journal_op) IS NOT NULL"
+    for table, (key, cols) in TRACKED.items():
+        record = ("INSERT INTO appgrid_changes (op_id, tbl, row_id, before, after) "
+                  f"VALUES ((SELECT op_id FROM appgrid_journal_op), '{table}', {{rid}}, {{before}}, {{after}})")
+        changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in [key] + cols)
+        triggers = {
+            "ins": ("INSERT", active, record.format(rid=f"NEW.{key}", before="NULL", after=_image("NEW", table))),
+            "upd": ("UPDATE", f"{active} AND ({changed})",
+                    record.format(rid=f"OLD.{key}", before=_image("OLD", table), after=_image("NEW", table))),
+            "del": ("DELETE", active, record.format(rid=f"OLD.{key}", before=_image("OLD", table), after="NULL")),
+        }
+        for suffix, (event, when, body) in triggers.items():
+            conn.execute(
+                f"CREATE TEMP TRIGGER IF NOT EXISTS appgrid_journal_{table}_{suffix} "
+                f"AFTER {event} ON main.{table} WHEN {when} BEGIN {body}; END"
+            )
+
+
+def prepare_journal(conn, command: str, args=None):
+    """准备记录一次操作（事务之外调用：挂载日志库、创建触发器），返回在写事务开始后调用的登记函数；
+    关闭记录时返回 None。登记后的修改随同一事务提交或回滚
+
+    args 为可 JSON 序列化的操作参数（dict 中的 db、profile 键不记录），仅用于 undo --list 显示。
+    """
+    if not JOURNAL_ENABLED:
+        return None
+    if isinstance(args, dict):
+        args = {k: v for k, v in args.items() if k not in ("db", "profile")}
+    if conn.in_transaction:
+        raise ValueError("prepare_journal 必须在事务开始前调用")
+    attach_journal(conn)
+    _install_triggers(conn)
+    return lambda c: _record_op(c, command, args)
+
+
+def _record_op(conn, command: str, args) -> int:
+    """登记操作并设为当前操作，返回操作 ID"""
+    # 新操作使重做栈失效
+    conn.execute("DELETE FROM journal.appgrid_changes WHERE op_id IN "
+                 "(SELECT id FROM journal.appgrid_ops WHERE undone = 1)")
+    conn.execute("DELETE FROM journal.appgrid_ops WHERE undone = 1")
+    op_id = conn.execute(
+        "INSERT INTO journal.appgrid_ops (command, args, created) VALUES (?, ?, ?)",
+        (command, json.dumps(args, ensure_ascii=False) if args is not None else None, time.time()),
+    ).lastrowid
+    conn.execute("DELETE FROM temp.appgrid_journal_op")
+    conn.execute("INSERT INTO temp.appgrid_journal_op VALUES (?)", (op_id,))
+    oldest = op_id - MAX_OPS
+    conn.execute("DELETE FROM journal.appgrid_changes WHERE op_id <= ?", (oldest,))
+    conn.execute("DELETE FROM journal.appgrid_ops WHERE id <= ?", (oldest,))
+    return op_id
+
+
+def _pause(conn):
+    """撤销/重做自身的写入不能记到之前的操作下"""
+    if conn.execute("SELECT 1 FROM temp.sqlite_master WHERE name = 'appgrid_journal_op'").fetchone():
+        conn.execute("DELETE FROM temp.appgrid_journal_op")
+
+
+def _current(conn, table: str, row_id: int) -> str | None:
+    key = TRACKED[table][0]
+    row = conn.execute(f"SELECT {_image('t', table)} FROM main.{table} t WHERE t.{key} = ?", (row_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _write(conn, table: str, row_id: int, image: str | None):
+    """把行恢复为 image（None 表示删除）"""
+    key, cols = TRACKED[table]
+    if image is None:
+        conn.execute(f"DELETE FROM main.{table} WHERE {key} = ?", (row_id,))
+        return
+    data = json.loads(image)
+    values = [bytes.fromhex(data[c]) if c in BLOB_COLUMNS and data[c] is not None else data[c] for c in cols]
+    names = ", ".join([key] + cols)
+    conn.execute(
+        f"INSERT OR REPLACE INTO main.{table} ({names}) VALUES ({', '.join('?' * (len(cols) + 1))})",
+        [row_id, *values],
+    )
+
+
+def _replay(conn, op: dict, undo: bool, force: bool) -> int:
+    """撤销（逆序写回 before）或重做（顺序写回 after）一次操作，返回写入行数"""
+    order = "DESC" if undo else "ASC"
+    changes = conn.execute(
+        f"SELECT tbl, row_id, before, after FROM journal.appgrid_changes WHERE op_id = ? ORDER BY seq {order}",
+        (op["id"],),
+    ).fetchall()
+    for tbl, row_id, before, after in changes:
+        expected, target = (after, before) if undo else (before, after)
+        if not force and _current(conn, tbl, row_id) != expected:
+            raise ValueError(
+                f"操作 #{op['id']} ({op['command']}) 之后 {tbl} 行 {row_id} 已被其他修改改变，"
+                f"无法安全{'撤销' if undo else '重做'}（可加 --force 强制）"
+            )
+        _write(conn, tbl, row_id, target)
+    return len(changes)
+
+
+def _ops(conn, undone: bool, steps: int) -> list[dict]:
+    order = "ASC" if undone else "DESC"
+    rows = conn.execute(
+        f"""SELECT o.id, o.command, o.args, o.created,
+                   (SELECT COUNT(*) FROM journal.appgrid_changes c WHERE c.op_id = o.id) AS changes
+            FROM journal.appgrid_ops o WHERE o.undone = ? ORDER BY o.id {order}""",
+        (1 if undone else 0,),
+    )
+    # 没有行变化的操作（如重命名为原名）直接跳过，不占步数
+    result, skipped = [], []
+    for r in rows:
+        op = {"id": r[0], "command": r[1], "args": json.loads(r[2]) if r[2] else None,
+              "created": r[3], "changes": r[4]}
+        (result if op["changes"] else skipped).append(op)
+        if len(result) >= steps:
+            break
+    return result + skipped
+
+
+def undo(conn, steps: int = 1, force: bool = False) -> list[dict]:
+    """撤销最近 steps 次操作（不提交；日志库需已在事务外 attach_journal），返回被撤销的操作"""
+    if not attach_journal(conn, create=False):
+        raise ValueError("没有操作日志，无可撤销的操作")
+    _pause(conn)
+    ops = _ops(conn, undone=False, steps=steps)
+    done = []
+    for op in ops:
+        if op["changes"]:
+            _replay(conn, op, undo=True, force=force)
+            done.append(op)
+        conn.execute("UPDATE journal.appgrid_ops SET undone = 1 WHERE id = ?", (op["id"],))
+    if not done:
+        raise ValueError("没有可撤销的操作")
+    return done
+
+
+def redo(conn, steps: int = 1, force: bool = False) -> list[dict]:
+    """重做最近撤销的 steps 次操作（不提交；日志库需已在事务外 attach_journal），返回被重做的操作"""
+    if not attach_journal(conn, create=False):
+        raise ValueError("没有操作日志，无可重做的操作")
+    _pause(conn)
+    ops = _ops(conn, undone=True, steps=steps)
+    done = []
+    for op in ops:
+        if op["changes"]:
+            _replay(conn, op, undo=False, force=force)
+            done.append(op)
+        conn.execute("UPDATE journal.appgrid_ops SET undone = 0 WHERE id = ?", (op["id"],))
+    if not done:
+        raise ValueError("没有可重做的操作")
+    return done
+
+
+def history(conn, limit: int = 20) -> list[dict]:
+    """最近的操作记录（新到旧），含是否已撤销与变更行数"""
+    if not attach_journal(conn, create=False):
+        return []
+    rows = conn.execute(
+        """SELECT o.id, o.command, o.args, o.created, o.undone,
+                  (SELECT COUNT(*) FROM journal.appgrid_changes c WHERE c.op_id = o.id) AS changes
+           FROM journal.appgrid_ops o ORDER BY o.id DESC LIMIT ?""",
+        (limit,),
+    )
+    return [{"id": r[0], "command": r[1], "args": json.loads(r[2]) if r[2] else None,
+             "created": r[3], "undone": bool(r[4]), "changes": r[5]} for r in rows]
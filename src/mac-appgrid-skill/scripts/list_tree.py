@@ -5,16 +5,18 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
-from core import connect, get_pages, get_children, get_group_containers, TYPE_GROUP, TYPE_APP, TYPE_CONTAINER
+from core import connect, GridSnapshot, TYPE_GROUP, TYPE_APP, TYPE_CONTAINER
+from profiling import add_profile_argument
 
 
-def build_tree(conn, parent_id, depth=0):
-    """递归构建树形结构"""
+def build_tree(snap, parent_id, depth=0):
+    """递归构建树形结构（基于内存快照，不再逐容器查询）"""
     result = []
-    children = get_children(conn, parent_id)
+    children = snap.get_children(parent_id)
     for child in children:
         node = {
             "id": child["rowid"],
+            "uuid": snap.items[child["rowid"]]["uuid"],
             "type": child["type"],
             "ordering": child["ordering"],
         }
@@ -23,14 +25,15 @@ def build_tree(conn, parent_id, depth=0):
             node["bundleid"] = child["bundleid"] or ""
         elif child["type"] == TYPE_GROUP:
             node["title"] = child["group_title"] or ""
-            containers = get_group_containers(conn, child["rowid"])
+            containers = snap.get_group_containers(child["rowid"])
             all_children = []
             for ci, cid in enumerate(containers):
-                page_children = build_tree(conn, cid, depth + 1)
+                page_children = build_tree(snap, cid, depth + 1)
                 if len(containers) > 1:
                     # 多分页时包装为分页节点
                     all_children.append({
                         "id": cid,
+                        "uuid": snap.items[cid]["uuid"],
                         "type": TYPE_CONTAINER,
                         "ordering": ci,
                         "title": f"分页 {ci + 1}",
@@ -40,11 +43,32 @@ def build_tree(conn, parent_id, depth=0):
                     all_children.extend(page_children)
             node["children"] = all_children
         elif child["type"] == TYPE_CONTAINER:
-            node["children"] = build_tree(conn, child["rowid"], depth + 1)
+            node["children"] = build_tree(snap, child["rowid"], depth + 1)
         result.append(node)
     return result
 
 
+def build_pages(snap, page_id=None):
+    """构建页面级树形结构，page_id 指定时只返回该页面"""
+    pages = snap.get_pages()
+    if page_id:
+        pages = [p for p in pages if p["rowid"] == page_id]
+        if not pages:
+            raise ValueError(f"页面 {page_id} 不存在")
+
+    tree = []
+    for i, page in enumerate(pages):
+        tree.append({
+            "id": page["rowid"],
+            "uuid": snap.items[page["rowid"]]["uuid"],
+            "type": TYPE_CONTAINER,
+            "ordering": page["ordering"],
+            "title": f"页面 {i + 1}",
+            "children": build_tree(snap, page["rowid"]),
+        })
+    return tree
+
+
 def print_tree(nodes, indent=0):
     """打印树形结构"""
     for node in nodes:
@@ -62,35 +86,24 @@ def main():
     parser.add_argument("--db", required=True, help=".agrid 数据库路径")
     parser.add_argument("--page", type=int, help="只显示指定页面 ID")
     parser.add_argument("--format", choices=["tree", "json"], default="tree")
+    add_profile_argument(parser)
     args = parser.parse_args()
 
-    conn = connect(args.db)
-    pages = get_pages(conn)
-
-    if args.page:
-        pages = [p for p in pages if p["rowid"] == args.page]
-        if not pages:
-            print(f"页面 {args.page} 不存在", file=sys.stderr)
-            sys.exit(1)
+    conn = connect(args.db, "read")
+    snap = GridSnapshot(conn)
+    conn.close()
 
-    tree = []
-    for i, page in enumerate(pages):
-        page_node = {
-            "id": page["rowid"],
-            "type": TYPE_CONTAINER,
-            "ordering": page["ordering"],
-            "title": f"页面 {i + 1}",
-            "children": build_tree(conn, page["rowid"]),
-        }
-        tree.append(page_node)
+    try:
+        tree = build_pages(snap, args.page)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
 
     if args.format == "json":
         print(json.dumps(tree, ensure_ascii=False, indent=2))
     else:
         print_tree(tree)
 
-    conn.close()
-
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,146 @@
+"""从 dump.py 的 NDJSON 转储还原网格数据：逐行解析，按表 executemany 批量写入，整个还原在一个事务中完成
+
+目标数据库不存在时按转储中的建表语句新建（克隆）；已存在时清空转储中包含的表后写入，
+写入前自动建备份快照。转储缺少结束标记或行数不符时回滚，不会留下写了一半的数据库。
+"""
+import argparse
+import base64
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from backup import create_backup
+from core import connect, WriteSession
+from dump import open_dump, DUMP_FORMAT, DUMP_VERSION
+from profiling import add_profile_argument
+
+
+class DumpReader:
+    """按顺序读取转储：header 为首行，sections() 依次产出 (表名, 列名, 行迭代器)"""
+
+    def __init__(self, f):
+        self.lines = iter(f)
+        self.header = self._meta(next(self.lines, ""))
+        if self.header.get("format") != DUMP_FORMAT:
+            raise ValueError("不是 appgrid 转储文件")
+        if self.header.get("version") != DUMP_VERSION:
+            raise ValueError(f"不支持的转储版本: {self.header.get('version')}")
+        self.end = None
+        self._next = None
+
+    @staticmethod
+    def _meta(line: str) -> dict:
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"转储文件格式错误: {e}") from e
+        if not isinstance(value, dict):
+            raise ValueError("转储文件格式错误：缺少表头")
+        return value
+
+    def _rows(self):
+        """产出当前表的行，遇到下一个表头或结束标记时停下并留给 sections()"""
+        for line in self.lines:
+            if line.startswith("{"):
+                self._next = self._meta(line)
+                return
+            row = json.loads(line)
+            # BLOB 以 {"b64": ...} 保存；大多数行没有，先按原始文本判断，省去逐值检查
+            if '{"b64":' in line:
+                row = [base64.b64decode(v["b64"]) if isinstance(v, dict) else v for v in row]
+            yield row
+
+    def sections(self):
+        self._next = self._meta(next(self.lines, "{}"))
+        while "table" in self._next:
+            meta, self._next = self._next, {}
+            yield meta["table"], meta["columns"], self._rows()
+            if not self._next:
+                # 调用方没有读完这一节（或文件结束）：跳过剩余行
+                for _ in self._rows():
+                    pass
+        if self._next.get("end"):
+            self.end = self._next
+
+
+def create_from_schema(db_path: Path, schema: list[str]):
+    """按转储中的建表/索引语句新建数据库"""
+    conn = sqlite3.connect(str(db_path))
+    try:
+        conn.executescript(";\n".join(schema) + ";")
+    finally:
+        conn.close()
+
+
+def load_grid(conn: sqlite3.Connection, reader: DumpReader) -> dict:
+    """清空并写入转储中的各表（在调用方的事务中执行，不提交），返回 {表名: 行数}"""
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    counts = {}
+    for table, columns, rows in reader.sections():
+        if table not in existing:
+            raise ValueError(f"目标数据库没有表 {table}")
+        target = {r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')} | {"rowid"}
+        missing = [c for c in columns if c not in target]
+        if missing:
+            raise ValueError(f"目标数据库的 {table} 表缺少列: {', '.join(missing)}")
+        conn.execute(f'DELETE FROM "{table}"')
+        names = ", ".join(c if c == "rowid" else f'"{c}"' for c in columns)
+        cur = conn.executemany(
+            f'INSERT INTO "{table}" ({names}) VALUES ({", ".join("?" * len(columns))})', rows
+        )
+        counts[table] = cur.rowcount
+    if reader.end is None:
+        raise ValueError("转储文件不完整（缺少结束标记），已放弃还原")
+    expected = reader.end.get("rows", {})
+    for table, n in counts.items():
+        if expected.get(table) != n:
+            raise ValueError(f"{table} 表写入 {n} 行，与转储记录的 {expected.get(table)} 行不符，已放弃还原")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 dump.py 的转储还原 AppGrid 网格数据")
+    parser.add_argument("--db", required=True, help="目标 .agrid 数据库（不存在时新建）")
+    parser.add_argument("--input", help="转储文件（.gz 结尾时解压；省略则从标准输入读取）")
+    parser.add_argument("--no-backup", action="store_true", help="覆盖已有数据库前不建备份快照")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    db = Path(args.db).expanduser().resolve()
+    created = not db.exists()
+    src = open_dump(args.input, "r")
+    safety = None
+    try:
+        reader = DumpReader(src)
+        if created:
+            create_from_schema(db, reader.header.get("schema", []))
+        elif not args.no_backup:
+            safety = create_backup(str(db), "load 前自动备份")
+        conn = connect(str(db), "write")
+        try:
+            # 转储是一次性读取的流，写锁等待交给 busy_timeout，不能整体重试
+            counts = WriteSession(conn, retries=0).run(load_grid, reader)
+        finally:
+            conn.close()
+    except (ValueError, sqlite3.Error, OSError) as e:
+        if created:
+            for leftover in (db, db.with_name(db.name + "-journal")):
+                if leftover.exists():
+                    os.unlink(leftover)
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+
+    detail = "，".join(f"{t} {n}" for t, n in counts.items())
+    print(f"✓ 已{'新建并' if created else ''}还原 {db}：{detail}")
+    if safety:
+        print(f"  还原前的状态保存在快照 #{safety['id']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""三方合并：以共同祖先为基准，把另一台机器上的布局修改合并进本机数据库
+
+节点匹配方式与 diff.py 相同（应用按 bundleid，分组/页面按 uuid）。每个节点的父容器与分组名称
+分别做三方合并：只有一方修改时采用该修改，双方改成不同结果时记为冲突并保留本机。
+容器内顺序：对方调整了顺序而本机没有时采用对方顺序，其余新移入的项按对方列表中的前驱位置插入。
+合并结果满足每个容器 35 个子项的上限（放不下的项移到同级有空位的页面/分页，必要时新建），
+在一个事务中写入。
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect, WriteSession, MoveBatch, MAX_ITEMS_PER_CONTAINER, TYPE_APP, TYPE_CONTAINER, TYPE_GROUP
+from diff import KeyedTree, GRID_KEY
+from journal import prepare_journal
+from profiling import add_profile_argument
+
+# 节点在某一方不存在
+GONE = "\0gone"
+
+
+def _pick(base, ours, theirs) -> tuple[object, bool]:
+    """三方合并单个值，返回 (结果, 是否冲突)；冲突时保留本机"""
+    if ours == theirs or theirs == base:
+        return ours, False
+    if ours == base:
+        return theirs, False
+    return ours, True
+
+
+def _value(tree: KeyedTree, key: str, field: str):
+    node = tree.nodes.get(key)
+    return GONE if node is None else node[field]
+
+
+def _depth(tree: KeyedTree, key: str) -> int:
+    depth = 0
+    while (key := tree.nodes[key]["parent"]) is not None:
+        depth += 1
+    return depth
+
+
+def _weave(skeleton: list[str], ref: list[str], members: set[str]) -> list[str]:
+    """把 members 中不在 skeleton 的项按它在 ref 中的前驱位置插入（没有前驱则放在最前）"""
+    seq = list(skeleton)
+    placed = set(seq)
+    for i, key in enumerate(ref):
+        if key in placed or key not in members:
+            continue
+        pos = 0
+        for prev in reversed(ref[:i]):
+            if prev in placed:
+                pos = seq.index(prev) + 1
+                break
+        seq.insert(pos, key)
+        placed.add(key)
+    return seq
+
+
+class MergePlan:
+    """计算三方合并结果：parent/title/create/delete 决策、各容器最终顺序与冲突列表"""
+
+    def __init__(self, base: KeyedTree, ours: KeyedTree, theirs: KeyedTree):
+        self.base, self.ours, self.theirs = base, ours, theirs
+        self.parent: dict[str, str] = {}
+        self.titles: dict[str, str] = {}
+        self.create: list[str] = []
+        self.delete: list[str] = []
+        self.conflicts: list[dict] = []
+        self.skipped: list[dict] = []
+        self.seqs: dict[str, list[str]] = {}
+        self._plan()
+
+    def _label(self, key, tree=None):
+        if key is GONE or key is None:
+            return "（已删除）"
+        for t in (tree, self.ours, self.theirs, self.base):
+            if t is not None and key in t.nodes:
+                return t.label(key)
+        return key
+
+    def _conflict(self, key: str, kind: str, ours, theirs):
+        node = self.ours.nodes.get(key) or self.theirs.nodes[key]
+        self.conflicts.append({"key": key, "title": node["title"], "type": node["type"], "kind": kind,
+                               "ours": ours, "theirs": theirs})
+
+    def _plan(self):
+        base, ours, theirs = self.base, self.ours, self.theirs
+        keys = [k for k in ours.nodes if k != GRID_KEY] + [k for k in theirs.nodes if k not in ours.nodes]
+
+        # 对方新建的分组/页面（按深度先父后子）
+        for key in keys:
+            if key not in ours.nodes and key not in base.nodes and theirs.nodes[key]["type"] != TYPE_APP:
+                self.create.append(key)
+        self.create.sort(key=lambda k: _depth(theirs, k))
+        exists = set(ours.nodes) | set(self.create)
+
+        for key in keys:
+            pb, po, pt = (_value(t, key, "parent") for t in (base, ours, theirs))
+            parent, conflict = _pick(pb, po, pt)
+            node = ours.nodes.get(key) or theirs.nodes[key]
+            if po is None:
+                continue  # 网格以外的根节点不参与合并
+            if conflict:
+                self._conflict(key, "move", self._label(po, ours), self._label(pt, theirs))
+            if po is GONE:
+                if key not in self.create:
+                    if parent is not GONE and node["type"] == TYPE_APP:
+                        self.skipped.append({"key": key, "title": node["title"], "reason": "本机没有该应用"})
+                    continue
+            elif parent is GONE:
+                if node["type"] == TYPE_APP:
+                    # 对方卸载/移除的应用在本机仍然存在，保留
+                    self.skipped.append({"key": key, "title": node["title"], "reason": "对方已移除，本机保留"})
+                else:
+                    self.delete.append(key)
+                parent = po
+            if parent not in exists:
+                # 目标容器已被本机删除
+                self._conflict(key, "move", self._label(po, ours), self._label(pt, theirs))
+                parent = po
+            self.parent[key] = parent
+
+            tb, to, tt = (_value(t, key, "title") for t in (base, ours, theirs))
+            if node["type"] == TYPE_GROUP and GONE not in (to, tt):
+                title, conflict = _pick(tb, to, tt)
+                if conflict:
+                    self._conflict(key, "rename", to, tt)
+                if title != to:
+                    self.titles[key] = title
+
+        members: dict[str, set[str]] = {}
+        for key, parent in self.parent.items():
+            members.setdefault(parent, set()).add(key)
+
+        # 对方删除的分组/页面：合并后已空才删除（先子后父），否则保留并记为冲突
+        for key in sorted(self.delete, key=lambda k: -_depth(ours, k)):
+            if members.get(key):
+                self._conflict(key, "delete", "保留（仍有子项）", "已删除")
+                continue
+            members[self.parent.pop(key)].discard(key)
+        self.delete = [k for k in self.delete if k not in self.parent]
+
+        for container, keys_in in members.items():
+            self.seqs[container] = self._order(container, keys_in)
+
+    def _order(self, container: str, members: set[str]) -> list[str]:
+        """合并容器内的顺序"""
+        b = self.base.children.get(container, [])
+        o = self.ours.children.get(container, [])
+        t = self.theirs.children.get(container, [])
+        common = set(b) & set(o) & set(t) & members
+        b_order = [k for k in b if k in common]
+        o_order = [k for k in o if k in common]
+        t_order = [k for k in t if k in common]
+        if t_order != b_order and o_order == b_order:
+            return _weave([k for k in t if k in members], o, members)
+        if t_order != b_order and o_order != t_order:
+            self._conflict(container, "reorder", "本机顺序", "对方顺序")
+        return _weave([k for k in o if k in members], t, members)
+
+    def spill(self, new_container) -> list[str]:
+        """处理超出容量的容器：新移入的项移到同级有空位的容器，必要时调用 new_container(父键) 新建；
+        返回新建的容器键"""
+        created = []
+        for container in list(self.seqs):
+            seq = self.seqs[container]
+            # 只有页面与分组分页受容量限制（网格下的页面数、分组的分页数不限）
+            if len(seq) <= MAX_ITEMS_PER_CONTAINER or container == GRID_KEY or not self._is_container(container):
+                continue
+            mine = set(self.ours.children.get(container, []))
+            extra = [k for k in reversed(seq) if k not in mine][:len(seq) - MAX_ITEMS_PER_CONTAINER]
+            if not extra:
+                continue  # 本机原本就超限，不做调整
+            for k in extra:
+                seq.remove(k)
+            parent = self.parent.get(container, self.ours.nodes.get(container, {}).get("parent"))
+            siblings = [c for c in self.seqs.get(parent, []) if c != container and self._is_container(c)]
+            for k in reversed(extra):
+                target = next((c for c in siblings
+                               if len(self.seqs.setdefault(c, [])) < MAX_ITEMS_PER_CONTAINER), None)
+                if target is None:
+                    target = new_container(parent)
+                    created.append(target)
+                    self.seqs[target] = []
+                    self.seqs[parent].append(target)
+                    self.parent[target] = parent
+                    siblings.append(target)
+                self.seqs[target].append(k)
+                self.parent[k] = target
+        return created
+
+    def _is_container(self, key: str) -> bool:
+        for t in (self.ours, self.theirs):
+            if key in t.nodes:
+                return t.nodes[key]["type"] == TYPE_CONTAINER
+        return key.startswith("new:")
+
+
+def attach_sources(conn, base_path: str, theirs_path: str):
+    """以 base / theirs 别名挂载祖先与对方数据库（需在事务之外调用）"""
+    for alias, path in (("base", base_path), ("theirs", theirs_path)):
+        p = Path(path).expanduser().resolve()
+        if not p.exists():
+            raise ValueError(f"数据库文件不存在: {p}")
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (str(p),))
+
+
+def merge(conn) -> dict:
+    """把 theirs 相对 base 的修改合并进本机数据库（需先 attach_sources，不提交），返回统计与冲突列表"""
+    base, ours, theirs = KeyedTree(conn, "base"), KeyedTree(conn), KeyedTree(conn, "theirs")
+    plan = MergePlan(base, ours, theirs)
+    batch = MoveBatch(conn)
+    rowid = {k: n["id"] for k, n in ours.nodes.items()}
+
+    # 新建对方的分组/页面，沿用对方的 uuid 以便下次合并时仍能匹配
+    for key in plan.create:
+        node = theirs.nodes[key]
+        if key in rowid:  # 已随分组一起创建的第一个分页
+            continue
+        parent = rowid[plan.parent[key]]
+        if node["type"] == TYPE_GROUP:
+            rowid[key], first = batch.add_group(parent, node["title"] or "")
+            first_key = next((c for c in theirs.children.get(key, []) if c in plan.create), None)
+            if first_key:
+                rowid[first_key] = first
+            plan.titles.pop(key, None)
+        else:
+            rowid[key] = batch.add_container(parent)
+    for key in plan.create:
+        if key.startswith("uuid:"):
+            conn.execute("UPDATE items SET uuid=? WHERE rowid=?", (key[5:], rowid[key]))
+
+    def new_container(parent_key):
+        rid = batch.add_container(rowid[parent_key])
+        rowid[f"new:{rid}"] = rid
+        return f"new:{rid}"
+    new_pages = plan.spill(new_container)
+
+    for key, title in plan.titles.items():
+        conn.execute("UPDATE groups SET title=? WHERE item_id=?", (title, rowid[key]))
+
+    moved = rewritten = 0
+    for container, seq in plan.seqs.items():
+        if seq == ours.children.get(container, []):
+            continue
+        rewritten += 1
+        moved += sum(1 for k in seq if k in ours.nodes and ours.nodes[k]["parent"] != container)
+        batch.set_children(rowid[container], [rowid[k] for k in seq])
+    batch.flush()
+
+    for key in plan.delete:
+        conn.execute("DELETE FROM groups WHERE item_id=?", (rowid[key],))
+        conn.execute("DELETE FROM items WHERE rowid=?", (rowid[key],))
+
+    return {
+        "moved": moved,
+        "renamed": sum(1 for k in plan.titles if k in ours.nodes),
+        "created": len(plan.create) + len(new_pages),
+        "deleted": len(plan.delete),
+        "containers": rewritten,
+        "conflicts": plan.conflicts,
+        "skipped": plan.skipped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="三方合并 AppGrid 布局")
+    parser.add_argument("--db", required=True, help="本机 .agrid 数据库（合并结果写入此库）")
+    parser.add_argument("--base", required=True, help="共同祖先 .agrid（上次同步时的副本）")
+    parser.add_argument("--theirs", required=True, help="另一台机器的 .agrid")
+    parser.add_argument("--dry-run", action="store_true", help="只计算合并结果，不写入数据库")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "write")
+    try:
+        attach_sources(conn, args.base, args.theirs)
+        on_begin = None if args.dry_run else prepare_journal(conn, "merge", vars(args))
+        result = WriteSession(conn).run(merge, on_begin=on_begin, commit=not args.dry_run)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    conn.close()
+
+    if args.format == "json":
+        print(json.dumps({**result, "dry_run": args.dry_run}, ensure_ascii=False, indent=2))
+        return
+    prefix = "（预演，未写入）" if args.dry_run else "✓ 合并完成："
+    print(f"{prefix}移动 {result['moved']}，重命名 {result['renamed']}，新建 {result['created']}，"
+          f"删除 {result['deleted']}，涉及容器 {result['containers']}")
+    kinds = {"move": "位置", "rename": "名称", "reorder": "顺序", "delete": "删除"}
+    for c in result["conflicts"]:
+        print(f"  ⚠️  冲突（{kinds[c['kind']]}）{c['title'] or c['key']}: 本机 {c['ours']} / 对方 {c['theirs']}，已保留本机")
+    for s in result["skipped"]:
+        print(f"  · 跳过 {s['title'] or s['key']}: {s['reason']}")
+
+
+if __name__ == "__main__":
+    main()
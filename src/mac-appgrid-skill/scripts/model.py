@@ -0,0 +1,394 @@
+"""对象模型 API：Grid → Page → App/Group → GroupPage → App，供其他工具作为库使用
+
+- 节点类使用 __slots__，每行只有一个对象，不为每行复制 dict
+- 子项在首次访问时按容器查询（load_all() 可一次读入全部）
+- 标识映射：同一 rowid 在一个 Grid 内始终对应同一个对象
+- 修改（移动、重命名、新建分组/分页）只记在内存中，save() 在一个写事务中一次写回并记入操作日志
+
+    grid = Grid.open("MyGrid.agrid")
+    for page in grid.pages:
+        for node in page.children:
+            ...
+    app = grid.find_app("com.apple.Safari")
+    app.move_to(grid.get(105))
+    grid.save()
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import (
+    connect, insert_item, ordering_at, WriteSession,
+    MAX_ITEMS_PER_CONTAINER, TYPE_APP, TYPE_CONTAINER, TYPE_GROUP,
+)
+from journal import prepare_journal
+
+# 一次联表取出节点及其 app/group 字段；按需追加 WHERE
+# uuid 很少用到且每个约 85 字节，不随节点读取，首次访问 node.uuid 时再查
+NODE_SQL = f"""SELECT i.rowid, i.type, i.parent_id, i.ordering,
+                     a.title, a.bundleid, a.storeid, a.category_id, a.custom_path, g.title, g.category_id
+              FROM items i
+              LEFT JOIN apps a ON a.item_id = i.rowid AND i.type = {TYPE_APP}
+              LEFT JOIN groups g ON g.item_id = i.rowid AND i.type = {TYPE_GROUP}"""
+
+
+class Node:
+    """节点基类：parent_id/ordering 为数据库中的值，save() 后更新；parent 为内存中的当前父节点"""
+
+    __slots__ = ("grid", "rowid", "_uuid", "parent_id", "ordering", "_parent")
+
+    def __init__(self, grid: "Grid", rowid: int | None, uuid: str | None, parent_id: int, ordering: int):
+        self.grid = grid
+        self.rowid = rowid
+        self._uuid = uuid
+        self.parent_id = parent_id
+        self.ordering = ordering
+        self._parent = None
+
+    @property
+    def uuid(self) -> str | None:
+        if self._uuid is None and self.rowid is not None:
+            row = self.grid.conn.execute("SELECT uuid FROM items WHERE rowid=?", (self.rowid,)).fetchone()
+            self._uuid = row[0] if row else None
+        return self._uuid
+
+    @property
+    def parent(self) -> "Container | None":
+        if self._parent is None and self.parent_id:
+            self._parent = self.grid.get(self.parent_id)
+        return self._parent
+
+    @property
+    def index(self) -> int:
+        """在父节点子项中的当前位置"""
+        return self.parent.children.index(self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(rowid={self.rowid})"
+
+
+class Container(Node):
+    """有子项的节点；children 首次访问时查询"""
+
+    __slots__ = ("_children",)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._children = None
+
+    @property
+    def children(self) -> list:
+        if self._children is None:
+            self._children = [] if self.rowid is None else self.grid._load_children(self)
+        return self._children
+
+    def __len__(self):
+        return len(self.children)
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def _accept(self, node: Node, position: int | None):
+        """把 node 从原父节点移入本容器（容量检查、两边都标记为待写）；网格下的页面数不受限"""
+        old = node.parent
+        kids = self.children
+        if old is not self and self is not self.grid and len(kids) + 1 > MAX_ITEMS_PER_CONTAINER:
+            raise ValueError(
+                f"容器 {self.rowid} 已有 {len(kids)} 个子项，添加 1 个后将超出上限 {MAX_ITEMS_PER_CONTAINER}"
+            )
+        if old is not None:
+            old.children.remove(node)
+            self.grid._dirty.add(old)
+        kids.insert(len(kids) if position is None else position, node)
+        node._parent = self
+        self.grid._dirty.add(self)
+
+
+class Page(Container):
+    """网格下的页面，子项为 App 与 Group"""
+
+    __slots__ = ()
+
+    def add_group(self, title: str, position: int | None = None, category_id: int = 0) -> "Group":
+        """新建分组（含第一个分页），save() 时写入"""
+        group = Group(self.grid, None, None, 0, 0, title, category_id)
+        group._children = []
+        self.grid._new.append(group)
+        self._accept(group, position)
+        group.add_page()
+        return group
+
+
+class GroupPage(Container):
+    """分组的分页，子项为 App"""
+
+    __slots__ = ()
+
+
+class Group(Container):
+    """分组，子项为 GroupPage；title 赋值后在 save() 时写回"""
+
+    __slots__ = ("_title", "category_id")
+
+    def __init__(self, grid, rowid, uuid, parent_id, ordering, title: str | None, category_id: int | None):
+        super().__init__(grid, rowid, uuid, parent_id, ordering)
+        self._title = title
+        self.category_id = category_id
+
+    @property
+    def title(self) -> str | None:
+        return self._title
+
+    @title.setter
+    def title(self, value: str):
+        if value != self._title:
+            self._title = value
+            self.grid._titles.add(self)
+
+    @property
+    def pages(self) -> list[GroupPage]:
+        return [c for c in self.children if isinstance(c, GroupPage)]
+
+    def apps(self):
+        """按分页顺序遍历组内应用"""
+        for page in self.pages:
+            yield from page.children
+
+    def add_page(self) -> GroupPage:
+        """在分组末尾新建分页，save() 时写入"""
+        page = GroupPage(self.grid, None, None, 0, 0)
+        page._children = []
+        self.grid._new.append(page)
+        self._accept(page, None)
+        return page
+
+    def available_page(self) -> GroupPage:
+        """第一个有空位的分页，都满了则新建"""
+        for page in self.pages:
+            if len(page.children) < MAX_ITEMS_PER_CONTAINER:
+                return page
+        return self.add_page()
+
+    def move_to(self, page: Page, position: int | None = None):
+        """移动到页面（分组不能嵌套）"""
+        if not isinstance(page, Page):
+            raise ValueError(f"分组只能移动到页面，目标 {page.rowid} 不是页面")
+        page._accept(self, position)
+
+    def __repr__(self):
+        return f"Group(rowid={self.rowid}, title={self._title!r})"
+
+
+class App(Node):
+    """应用；字段取自 apps 表"""
+
+    __slots__ = ("title", "bundleid", "storeid", "category_id", "custom_path")
+
+    def __init__(self, grid, rowid, uuid, parent_id, ordering, title, bundleid, storeid, category_id, custom_path):
+        super().__init__(grid, rowid, uuid, parent_id, ordering)
+        self.title = title
+        self.bundleid = bundleid
+        self.storeid = storeid
+        self.category_id = category_id
+        self.custom_path = custom_path
+
+    @property
+    def group(self) -> Group | None:
+        """所在分组（散落在页面上时为 None）"""
+        parent = self.parent
+        return parent.parent if isinstance(parent, GroupPage) else None
+
+    def move_to(self, target: Container, position: int | None = None):
+        """移动到页面、分组分页或分组（分组时放入第一个有空位的分页）"""
+        if isinstance(target, Group):
+            target = target.available_page()
+        elif not isinstance(target, (Page, GroupPage)):
+            raise ValueError(f"目标 {target.rowid} 不是页面、分组或分组分页")
+        target._accept(self, position)
+
+    def __repr__(self):
+        return f"App(rowid={self.rowid}, title={self.title!r})"
+
+
+class Grid(Container):
+    """网格根节点，同时持有连接、标识映射与待写入的修改"""
+
+    __slots__ = ("conn", "_map", "_dirty", "_titles", "_new", "_session")
+
+    def __init__(self, conn: sqlite3.Connection):
+        row = conn.execute(
+            "SELECT rowid, uuid, parent_id, ordering FROM items WHERE type=? AND parent_id=0 ORDER BY rowid",
+            (TYPE_CONTAINER,),
+        ).fetchone()
+        if row is None:
+            raise ValueError("数据库中没有网格节点")
+        super().__init__(self, *tuple(row))
+        self.conn = conn
+        self._map: dict[int, Node] = {self.rowid: self}
+        self._dirty: set[Container] = set()
+        self._titles: set[Group] = set()
+        self._new: list[Container] = []
+        # 记录加载时的 data_version，save() 时据此发现其他程序的修改
+        self._session = WriteSession(conn)
+
+    @classmethod
+    def open(cls, db_path: str) -> "Grid":
+        return cls(connect(db_path, "write"))
+
+    def close(self):
+        self.conn.close()
+
+    @property
+    def pages(self) -> list[Page]:
+        return [c for c in self.children if isinstance(c, Page)]
+
+    # ---- 加载 ----
+
+    def _make(self, row, parent_type: int | None) -> Node:
+        """由查询行构造节点；已在标识映射中的直接返回原对象（保留未保存的修改）"""
+        node = self._map.get(row[0])
+        if node is not None:
+            return node
+        rowid, type_, parent_id, ordering = row[:4]
+        if type_ == TYPE_APP:
+            node = App(self, rowid, None, parent_id, ordering, *row[4:9])
+        elif type_ == TYPE_GROUP:
+            node = Group(self, rowid, None, parent_id, ordering, row[9], row[10])
+        elif parent_type == TYPE_GROUP:
+            node = GroupPage(self, rowid, None, parent_id, ordering)
+        else:
+            node = Page(self, rowid, None, parent_id, ordering)
+        self._map[rowid] = node
+        return node
+
+    def _rows(self, where: str = "", params=()):
+        cur = self.conn.cursor()
+        cur.row_factory = None
+        return cur.execute(f"{NODE_SQL} {where}", params)
+
+    def _load_children(self, parent: Container) -> list[Node]:
+        parent_type = TYPE_GROUP if isinstance(parent, Group) else TYPE_CONTAINER
+        kids = []
+        for row in self._rows("WHERE i.parent_id = ? ORDER BY i.ordering, i.rowid", (parent.rowid,)):
+            node = self._make(row, parent_type)
+            node._parent = parent
+            kids.append(node)
+        return kids
+
+    def get(self, rowid: int) -> Node | None:
+        """按 rowid 取节点（不存在时返回 None）"""
+        node = self._map.get(rowid)
+        if node is None:
+            row = self._rows("WHERE i.rowid = ?", (rowid,)).fetchone()
+            if row is None:
+                return None
+            parent_type = self.conn.execute("SELECT type FROM items WHERE rowid=?", (row[2],)).fetchone()
+            node = self._make(row, parent_type[0] if parent_type else None)
+        return node
+
+    def find_app(self, bundleid: str) -> App | None:
+        """按 bundleid 查找应用"""
+        row = self.conn.execute(
+            "SELECT item_id FROM apps WHERE bundleid=? ORDER BY item_id LIMIT 1", (bundleid,)
+        ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def load_all(self) -> "Grid":
+        """一次查询读入全部节点并填好所有子项列表，适合需要遍历整棵树的场合"""
+        rows = self._rows("ORDER BY i.parent_id, i.ordering, i.rowid").fetchall()
+        types = {r[0]: r[1] for r in rows}
+        types[self.rowid] = TYPE_CONTAINER
+        loaded: dict[int, list[Node]] = {}
+        for row in rows:
+            if row[0] == self.rowid:
+                continue
+            node = self._make(row, types.get(row[2]))
+            loaded.setdefault(row[2], []).append(node)
+        for rowid, node in self._map.items():
+            if isinstance(node, Container) and node._children is None:
+                node._children = loaded.get(rowid, [])
+                for child in node._children:
+                    child._parent = node
+        return self
+
+    def walk(self):
+        """深度优先遍历全部节点（不含网格本身）"""
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            yield node
+            if isinstance(node, Container):
+                stack.extend(reversed(node.children))
+
+    def apps(self):
+        for node in self.walk():
+            if isinstance(node, App):
+                yield node
+
+    # ---- 修改 ----
+
+    def add_page(self) -> Page:
+        """在网格末尾新建页面，save() 时写入"""
+        page = Page(self, None, None, 0, 0)
+        page._children = []
+        self._new.append(page)
+        self._accept(page, None)
+        return page
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty or self._titles or self._new)
+
+    def _flush(self, conn) -> tuple[list, list[Container]]:
+        if self._session.stats["external_change"]:
+            raise ValueError("数据库在加载后已被其他程序修改，请重新打开后再保存")
+        created = []
+        try:
+            # 新节点按创建顺序插入，父节点总在子节点之前；位置稍后随所在容器统一编号
+            for node in self._new:
+                node.rowid = insert_item(conn, _item_type(node), node.parent.rowid, 0)
+                created.append(node)
+                if isinstance(node, Group):
+                    conn.execute("INSERT INTO groups (item_id, category_id, title) VALUES (?, ?, ?)",
+                                 (node.rowid, node.category_id, node.title))
+            conn.executemany("UPDATE groups SET title=? WHERE item_id=?",
+                             [(g.title, g.rowid) for g in self._titles if g.rowid is not None and g not in created])
+            updates = []
+            for parent in self._dirty:
+                for i, child in enumerate(parent.children):
+                    ordering = ordering_at(i)
+                    if child in created or child.parent_id != parent.rowid or child.ordering != ordering:
+                        updates.append((parent.rowid, ordering, child.rowid))
+            conn.executemany("UPDATE items SET parent_id=?, ordering=? WHERE rowid=?", updates)
+        except BaseException:
+            for node in created:
+                node.rowid = None
+            raise
+        return updates, created
+
+    def save(self) -> int:
+        """在一个写事务中写回所有未保存的修改并记入操作日志，返回写入的行数"""
+        if not self.dirty:
+            return 0
+        on_begin = prepare_journal(self.conn, "model.save")
+        try:
+            updates, created = self._session.run(self._flush, on_begin=on_begin)
+        except BaseException:
+            for node in self._new:
+                node.rowid = None
+            raise
+        for node in created:
+            self._map[node.rowid] = node
+        for parent_id, ordering, rowid in updates:
+            node = self._map[rowid]
+            node.parent_id, node.ordering = parent_id, ordering
+        written = len(updates) + len(created) + len(self._titles)
+        self._dirty.clear()
+        self._titles.clear()
+        self._new.clear()
+        return written
+
+
+def _item_type(node: Node) -> int:
+    return TYPE_GROUP if isinstance(node, Group) else TYPE_APP if isinstance(node, App) else TYPE_CONTAINER
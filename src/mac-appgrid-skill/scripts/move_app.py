@@ -1,64 +1,146 @@
 """移动 AppGrid 应用到指定页面或分组"""
 import argparse
+import csv
+import json
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 from core import (
-    connect, resolve_target, shift_ordering, get_next_ordering,
-    reorder_children, check_capacity, TYPE_APP,
+    connect, resolve_target, make_room, get_next_ordering,
+    reorder_after_removal, check_capacity, MoveBatch, WriteSession, TYPE_APP,
 )
+from journal import prepare_journal
+from profiling import add_profile_argument
 
 
-def main():
-    parser = argparse.ArgumentParser(description="移动 AppGrid 应用")
-    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
-    parser.add_argument("--app", required=True, type=int, help="应用 ID")
-    parser.add_argument("--to", required=True, type=int, help="目标页面或分组 ID")
-    parser.add_argument("--position", type=int, default=None, help="目标位置（省略则追加到末尾）")
-    args = parser.parse_args()
+def load_moves(path: str, default_to: int | None) -> list[dict]:
+    """读取批量移动清单：.json 为对象数组，其他按 CSV（表头 app,to,position）解析"""
+    p = Path(path).expanduser()
+    if p.suffix.lower() == ".json":
+        rows = json.loads(p.read_text(encoding="utf-8"))
+    else:
+        with open(p, encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+    moves = []
+    for i, row in enumerate(rows, 1):
+        to = row.get("to") or default_to
+        if not row.get("app") or not to:
+            raise ValueError(f"第 {i} 条缺少 app 或 to")
+        position = row.get("position")
+        moves.append({
+            "app": int(row["app"]),
+            "to": int(to),
+            "position": int(position) if position not in (None, "") else None,
+        })
+    return moves
 
-    conn = connect(args.db)
 
+def move_app(conn, app_id: int, to: int, position: int | None = None) -> tuple[str, int]:
+    """移动单个应用到页面或分组，返回 (应用名称, 排序值)；不提交事务"""
     # 验证应用存在
     app = conn.execute(
         "SELECT i.rowid, i.parent_id, a.title FROM items i JOIN apps a ON i.rowid = a.item_id WHERE i.rowid=? AND i.type=?",
-        (args.app, TYPE_APP),
+        (app_id, TYPE_APP),
     ).fetchone()
     if not app:
-        print(f"错误: 应用 {args.app} 不存在", file=sys.stderr)
-        sys.exit(1)
+        raise ValueError(f"应用 {app_id} 不存在")
 
     old_parent = app["parent_id"]
-    target_id = resolve_target(conn, args.to)
+    target_id = resolve_target(conn, to)
 
     # 检查目标容器容量（同容器内移动不需要检查）
     if target_id != old_parent:
-        try:
-            check_capacity(conn, target_id)
-        except ValueError as e:
-            print(f"错误: {e}", file=sys.stderr)
-            sys.exit(1)
+        check_capacity(conn, target_id)
 
-    pos = args.position if args.position is not None else get_next_ordering(conn, target_id)
-
-    # 如果指定位置，先腾出空间
-    if args.position is not None:
-        shift_ordering(conn, target_id, pos)
+    # 指定位置时腾出排序值（间隔模式下通常无需改动其他行），否则追加到末尾
+    if position is not None:
+        pos = make_room(conn, target_id, position)
+    else:
+        pos = get_next_ordering(conn, target_id)
 
     # 移动应用
     conn.execute(
         "UPDATE items SET parent_id=?, ordering=? WHERE rowid=?",
-        (target_id, pos, args.app),
+        (target_id, pos, app_id),
     )
 
     # 重新整理原父节点排序
-    reorder_children(conn, old_parent)
+    reorder_after_removal(conn, old_parent)
+    return app["title"], pos
+
+
+def move_batch(conn, moves: list[dict]) -> tuple[int, int]:
+    """在同一事务中执行多次移动，每个受影响容器最后只重排一次，返回 (移动数, 涉及容器数)"""
+    app_ids = [m["app"] for m in moves]
+    found = set()
+    for start in range(0, len(app_ids), 500):
+        chunk = app_ids[start:start + 500]
+        found.update(r[0] for r in conn.execute(
+            f"SELECT i.rowid FROM items i JOIN apps a ON i.rowid = a.item_id "
+            f"WHERE i.type=? AND i.rowid IN ({','.join('?' * len(chunk))})",
+            [TYPE_APP, *chunk],
+        ))
+    missing = [i for i in app_ids if i not in found]
+    if missing:
+        raise ValueError(f"应用不存在: {missing}")
+
+    batch = MoveBatch(conn)
+    batch.preload(app_ids + [m["to"] for m in moves])
+    for m in moves:
+        batch.move(m["app"], m["to"], m["position"])
+    touched = len(batch.dirty)
+    batch.flush()
+    return len(moves), touched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="移动 AppGrid 应用")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--app", type=int, help="应用 ID")
+    source.add_argument("--apps", type=int, nargs="+", help="批量移动：多个应用 ID（依次放入 --to）")
+    source.add_argument("--batch", help="批量移动清单文件（JSON 或 CSV，字段 app,to,position）")
+    parser.add_argument("--to", type=int, help="目标页面或分组 ID")
+    parser.add_argument("--position", type=int, default=None, help="目标位置（省略则追加到末尾）")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if args.batch is None and args.to is None:
+        parser.error("--app/--apps 需要同时指定 --to")
+
+    conn = connect(args.db, "write")
+    session = WriteSession(conn)
+
+    if args.app is None:
+        try:
+            if args.batch:
+                moves = load_moves(args.batch, args.to)
+            else:
+                moves = [
+                    {"app": app_id, "to": args.to,
+                     "position": None if args.position is None else args.position + i}
+                    for i, app_id in enumerate(args.apps)
+                ]
+            on_begin = prepare_journal(conn, "move_app", vars(args))
+            moved, touched = session.run(move_batch, moves, on_begin=on_begin)
+        except ValueError as e:
+            print(f"错误: {e}", file=sys.stderr)
+            sys.exit(1)
+        conn.close()
+        print(f"✓ 已批量移动 {moved} 个应用，重排 {touched} 个容器")
+        return
+
+    try:
+        on_begin = prepare_journal(conn, "move_app", vars(args))
+        title, pos = session.run(move_app, args.app, args.to, args.position, on_begin=on_begin)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    conn.commit()
     conn.close()
 
-    print(f"✓ 应用 '{app['title']}' 已移动到目标 {args.to} (位置 {pos})")
+    print(f"✓ 应用 '{title}' 已移动到目标 {args.to} (位置 {pos})")
 
 
 if __name__ == "__main__":
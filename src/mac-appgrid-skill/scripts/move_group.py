@@ -5,64 +5,72 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 from core import (
-    connect, shift_ordering, get_next_ordering, reorder_children,
+    connect, WriteSession, make_room, get_next_ordering, reorder_after_removal,
     check_capacity, TYPE_GROUP, TYPE_CONTAINER,
 )
+from journal import prepare_journal
+from profiling import add_profile_argument
 
 
-def main():
-    parser = argparse.ArgumentParser(description="移动 AppGrid 分组")
-    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
-    parser.add_argument("--group", required=True, type=int, help="分组 ID")
-    parser.add_argument("--to-page", required=True, type=int, help="目标页面 ID")
-    parser.add_argument("--position", type=int, default=None, help="目标位置（省略则追加到末尾）")
-    args = parser.parse_args()
-
-    conn = connect(args.db)
-
+def move_group(conn, group_id: int, to_page: int, position: int | None = None) -> tuple[str, int]:
+    """移动分组到页面，返回 (分组名称, 排序值)；不提交事务"""
     # 验证分组存在
     group = conn.execute(
         "SELECT i.rowid, i.parent_id, g.title FROM items i JOIN groups g ON i.rowid = g.item_id WHERE i.rowid=? AND i.type=?",
-        (args.group, TYPE_GROUP),
+        (group_id, TYPE_GROUP),
     ).fetchone()
     if not group:
-        print(f"错误: 分组 {args.group} 不存在", file=sys.stderr)
-        sys.exit(1)
+        raise ValueError(f"分组 {group_id} 不存在")
 
     # 验证目标页面
     page = conn.execute(
-        "SELECT type FROM items WHERE rowid=?", (args.to_page,)
+        "SELECT type FROM items WHERE rowid=?", (to_page,)
     ).fetchone()
     if not page or page["type"] != TYPE_CONTAINER:
-        print(f"错误: 页面 {args.to_page} 不存在或不是容器类型", file=sys.stderr)
-        sys.exit(1)
+        raise ValueError(f"页面 {to_page} 不存在或不是容器类型")
 
     old_parent = group["parent_id"]
 
     # 检查目标页面容量（同页面内移动不需要检查）
-    if args.to_page != old_parent:
-        try:
-            check_capacity(conn, args.to_page)
-        except ValueError as e:
-            print(f"错误: {e}", file=sys.stderr)
-            sys.exit(1)
-
-    pos = args.position if args.position is not None else get_next_ordering(conn, args.to_page)
+    if to_page != old_parent:
+        check_capacity(conn, to_page)
 
-    if args.position is not None:
-        shift_ordering(conn, args.to_page, pos)
+    # 指定位置时腾出排序值（间隔模式下通常无需改动其他行），否则追加到末尾
+    if position is not None:
+        pos = make_room(conn, to_page, position)
+    else:
+        pos = get_next_ordering(conn, to_page)
 
     conn.execute(
         "UPDATE items SET parent_id=?, ordering=? WHERE rowid=?",
-        (args.to_page, pos, args.group),
+        (to_page, pos, group_id),
     )
 
-    reorder_children(conn, old_parent)
+    reorder_after_removal(conn, old_parent)
+    return group["title"], pos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="移动 AppGrid 分组")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--group", required=True, type=int, help="分组 ID")
+    parser.add_argument("--to-page", required=True, type=int, help="目标页面 ID")
+    parser.add_argument("--position", type=int, default=None, help="目标位置（省略则追加到末尾）")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "write")
+
+    try:
+        on_begin = prepare_journal(conn, "move_group", vars(args))
+        title, pos = WriteSession(conn).run(move_group, args.group, args.to_page, args.position, on_begin=on_begin)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    conn.commit()
     conn.close()
 
-    print(f"✓ 分组 '{group['title']}' 已移动到页面 {args.to_page} (位置 {pos})")
+    print(f"✓ 分组 '{title}' 已移动到页面 {args.to_page} (位置 {pos})")
 
 
 if __name__ == "__main__":
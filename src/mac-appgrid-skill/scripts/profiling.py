@@ -0,0 +1,256 @@
+"""SQL 性能剖析：--profile 打开后记录每条语句的耗时，退出时输出统计
+
+语句耗时在游标上计量（execute 加上取完结果行的时间）；SQLite 实际执行的次数另由 set_trace_callback
+取得并记到正在执行的那条语句上，executemany 的逐行执行、触发器与隐式 BEGIN 因此都会计入。
+报告写到 stderr，不影响脚本在 stdout 上的 JSON 输出。
+"""
+import argparse
+import atexit
+import json
+import re
+import sqlite3
+import sys
+import time
+
+# 报告中列出的语句种类数与最慢语句数
+TOP_QUERIES = 15
+TOP_SLOWEST = 5
+
+_NORMALIZE = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize(sql: str) -> str:
+    """归一化语句：字面量替换为 ?，IN 列表折叠，空白合并"""
+    for pattern, repl in _NORMALIZE:
+        sql = pattern.sub(repl, sql)
+    return sql.strip()
+
+
+class Profiler:
+    """按归一化语句汇总耗时与执行次数；slowest[语句] 保存最慢一次的原始 SQL、参数与查询计划"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: dict[str, list[float]] = {}
+        self.executed: dict[str, int] = {}
+        self.slowest: dict[str, dict] = {}
+        # 正在执行的语句（归一化后）；trace 回调每行都会触发，不能在回调里逐条归一化
+        self.current: str | None = None
+
+    def trace(self, sql: str):
+        key = self.current or normalize(sql)
+        self.executed[key] = self.executed.get(key, 0) + 1
+
+    def record(self, conn, sql: str, params, elapsed: float):
+        key = normalize(sql)
+        self.durations.setdefault(key, []).append(elapsed)
+        slow = self.slowest.get(key)
+        if slow is None or elapsed > slow["seconds"]:
+            self.slowest[key] = {"sql": sql, "params": params, "seconds": elapsed, "conn": conn, "plan": None}
+
+    def explain(self, conn):
+        """连接关闭前为它执行过的最慢语句取得 EXPLAIN QUERY PLAN（参数沿用那一次的）"""
+        for slow in self.slowest.values():
+            if slow["conn"] is not conn:
+                continue
+            slow["conn"] = None
+            if slow["params"] is None:
+                continue
+            try:
+                rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {slow['sql']}", slow["params"]).fetchall()
+                slow["plan"] = [r[3] for r in rows]
+            except sqlite3.Error:
+                pass
+
+    def report(self) -> dict:
+        queries = []
+        for key in self.durations.keys() | self.executed.keys():
+            # 只在 trace 中出现的语句（如隐式 BEGIN）没有计时
+            ordered = sorted(self.durations.get(key, [])) or [0.0]
+            queries.append({
+                "sql": key, "count": len(self.durations.get(key, [])), "executed": self.executed.get(key, 0),
+                "total_ms": sum(ordered) * 1000,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                "max_ms": ordered[-1] * 1000,
+            })
+        queries.sort(key=lambda q: q["total_ms"], reverse=True)
+        slowest = sorted(self.slowest.items(), key=lambda kv: kv[1]["seconds"], reverse=True)[:TOP_SLOWEST]
+        return {
+            "wall_ms": (time.perf_counter() - self.started) * 1000,
+            "statements": sum(q["count"] for q in queries),
+            "executed": sum(self.executed.values()),
+            "sql_ms": sum(q["total_ms"] for q in queries),
+            "queries": queries,
+            "slowest": [{"sql": s["sql"], "ms": s["seconds"] * 1000, "plan": s["plan"]} for _, s in slowest],
+        }
+
+
+_profiler: Profiler | None = None
+
+
+class TracedCursor(sqlite3.Cursor):
+    """把 execute 与取行的时间累计到当前语句上，游标执行下一条语句或取完时登记"""
+
+    _pending = None
+
+    def _flush(self):
+        if self._pending is not None:
+            sql, params, elapsed = self._pending
+            self._pending = None
+            if _profiler is not None:
+                _profiler.record(self.connection, sql, params, elapsed)
+
+    def _timed(self, method, sql, params):
+        self._flush()
+        if _profiler is not None:
+            _profiler.current = normalize(sql)
+        start = time.perf_counter()
+        try:
+            return method(self, sql, params)
+        finally:
+            self._pending = (sql, params, time.perf_counter() - start)
+            if _profiler is not None:
+                _profiler.current = None
+
+    def execute(self, sql, params=()):
+        return self._timed(sqlite3.Cursor.execute, sql, params)
+
+    def executemany(self, sql, seq):
+        # 参数序列可能是生成器，不保留；查询计划也就无法复现
+        self._timed(lambda c, s, _: sqlite3.Cursor.executemany(c, s, seq), sql, None)
+        return self
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            if self._pending is not None:
+                sql, params, elapsed = self._pending
+                self._pending = (sql, params, elapsed + time.perf_counter() - start)
+
+    def fetchone(self):
+        row = self._fetch(sqlite3.Cursor.fetchone)
+        if row is None:
+            self._flush()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(sqlite3.Cursor.fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._flush()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(sqlite3.Cursor.fetchall)
+        self._flush()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._fetch(sqlite3.Cursor.__next__)
+        except StopIteration:
+            self._flush()
+            raise
+
+    def close(self):
+        self._flush()
+        super().close()
+
+    def __del__(self):
+        self._flush()
+
+
+class TracedConnection(sqlite3.Connection):
+    """游标默认使用 TracedCursor；conn.execute 等快捷方法也经过它（基类的实现不会调用 cursor()）"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if _profiler is not None:
+            self.set_trace_callback(_profiler.trace)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+    def executescript(self, script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            if _profiler is not None:
+                _profiler.record(self, script, None, time.perf_counter() - start)
+
+    def commit(self):
+        if _profiler is not None:
+            _profiler.current = "COMMIT"
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            if _profiler is not None:
+                _profiler.current = None
+                _profiler.record(self, "COMMIT", None, time.perf_counter() - start)
+
+    def close(self):
+        if _profiler is not None:
+            self.set_trace_callback(None)
+            _profiler.explain(self)
+        super().close()
+
+
+def connection_factory() -> type[sqlite3.Connection]:
+    """sqlite3.connect 的 factory 参数：开启剖析时返回 TracedConnection"""
+    return TracedConnection if _profiler is not None else sqlite3.Connection
+
+
+def start(fmt: str = "text"):
+    """开启剖析，进程退出时按 fmt（text/json）把报告写到 stderr"""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+        atexit.register(lambda: print_report(_profiler.report(), fmt))
+
+
+def print_report(report: dict, fmt: str = "text"):
+    if fmt == "json":
+        print(json.dumps(report, ensure_ascii=False), file=sys.stderr)
+        return
+    out = sys.stderr
+    print(f"\n── SQL 剖析：调用 {report['statements']} 次（SQLite 执行 {report['executed']} 次），"
+          f"SQL 耗时 {report['sql_ms']:.1f} ms / 总耗时 {report['wall_ms']:.1f} ms", file=out)
+    print(f"{'调用':>6} {'执行':>7} {'总计ms':>9} {'p95ms':>8} {'最大ms':>8}  语句", file=out)
+    for q in report["queries"][:TOP_QUERIES]:
+        sql = q["sql"] if len(q["sql"]) <= 100 else q["sql"][:97] + "..."
+        print(f"{q['count']:>6} {q['executed']:>7} {q['total_ms']:>9.2f} {q['p95_ms']:>8.2f} {q['max_ms']:>8.2f}  {sql}",
+              file=out)
+    if report["slowest"]:
+        print("最慢语句:", file=out)
+    for s in report["slowest"]:
+        print(f"  {s['ms']:.2f} ms  {normalize(s['sql'])[:200]}", file=out)
+        for line in s["plan"] or []:
+            print(f"      ↳ {line}", file=out)
+
+
+class ProfileAction(argparse.Action):
+    """解析到 --profile 时立即开启剖析，使之后打开的连接都被计量"""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, values)
+        start(values)
+
+
+def add_profile_argument(parser: argparse.ArgumentParser):
+    """所有脚本共用的 --profile [text|json] 参数"""
+    parser.add_argument("--profile", nargs="?", const="text", choices=["text", "json"], action=ProfileAction,
+                        help="输出 SQL 剖析报告到 stderr（每类语句的次数、总耗时、p95 与最慢语句的查询计划）")
@@ -0,0 +1,42 @@
+"""重做最近撤销的 AppGrid 修改（基于 <db>.journal 操作日志）"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect, WriteSession
+from journal import attach_journal, redo
+from undo import describe
+from profiling import add_profile_argument
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重做已撤销的 AppGrid 修改")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--steps", type=int, default=1, help="重做的操作数")
+    parser.add_argument("--force", action="store_true", help="行已被其他程序修改时仍强制写回")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "write")
+    try:
+        if not attach_journal(conn, create=False):
+            raise ValueError("没有操作日志，无可重做的操作")
+        ops = WriteSession(conn).run(redo, args.steps, args.force)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    conn.close()
+
+    if args.format == "json":
+        print(json.dumps(ops, ensure_ascii=False, indent=2))
+        return
+    print(f"✓ 已重做 {len(ops)} 个操作")
+    for op in ops:
+        print(f"  ↷ {describe(op)}")
+
+
+if __name__ == "__main__":
+    main()
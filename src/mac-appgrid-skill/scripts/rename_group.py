@@ -4,7 +4,23 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
-from core import connect, TYPE_GROUP
+from core import connect, WriteSession, TYPE_GROUP
+from journal import prepare_journal
+from profiling import add_profile_argument
+
+
+def rename_group(conn, group_id: int, name: str) -> str:
+    """重命名分组，返回原名称；不提交事务"""
+    row = conn.execute(
+        "SELECT g.title FROM groups g JOIN items i ON g.item_id = i.rowid WHERE g.item_id=? AND i.type=?",
+        (group_id, TYPE_GROUP),
+    ).fetchone()
+    if not row:
+        raise ValueError(f"分组 {group_id} 不存在")
+
+    old_name = row["title"]
+    conn.execute("UPDATE groups SET title=? WHERE item_id=?", (name, group_id))
+    return old_name
 
 
 def main():
@@ -12,21 +28,18 @@ def main():
     parser.add_argument("--db", required=True, help=".agrid 数据库路径")
     parser.add_argument("--group", required=True, type=int, help="分组 ID")
     parser.add_argument("--name", required=True, help="新名称")
+    add_profile_argument(parser)
     args = parser.parse_args()
 
-    conn = connect(args.db)
+    conn = connect(args.db, "write")
 
-    row = conn.execute(
-        "SELECT g.title FROM groups g JOIN items i ON g.item_id = i.rowid WHERE g.item_id=? AND i.type=?",
-        (args.group, TYPE_GROUP),
-    ).fetchone()
-    if not row:
-        print(f"错误: 分组 {args.group} 不存在", file=sys.stderr)
+    try:
+        on_begin = prepare_journal(conn, "rename_group", vars(args))
+        old_name = WriteSession(conn).run(rename_group, args.group, args.name, on_begin=on_begin)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
 
-    old_name = row["title"]
-    conn.execute("UPDATE groups SET title=? WHERE item_id=?", (args.name, args.group))
-    conn.commit()
     conn.close()
 
     print(f"✓ 分组已重命名: '{old_name}' → '{args.name}'")
@@ -0,0 +1,248 @@
+"""解析 apps.bookmark（macOS 书签二进制格式），得到应用实际指向的路径、卷与文件 ID
+
+纯 Python 实现，可离线在任意平台运行；解析结果以 BLOB 的 SHA-1 为键缓存在 <db>.bookmarks，
+书签未变化的应用不会重复解析。
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect, sidecar_path
+from profiling import add_profile_argument
+
+# 缓存格式版本；解析逻辑变化时使旧缓存失效
+CACHE_VERSION = 1
+
+BOOKMARK_MAGIC = b"book"
+TOC_MAGIC = 0xFFFFFFFE
+
+# 记录类型（高 24 位）与子类型（低 8 位）
+TYPE_MASK = 0xFFFFFF00
+SUBTYPE_MASK = 0x000000FF
+BMK_STRING = 0x0100
+BMK_DATA = 0x0200
+BMK_NUMBER = 0x0300
+BMK_DATE = 0x0400
+BMK_BOOLEAN = 0x0500
+BMK_ARRAY = 0x0600
+BMK_DICT = 0x0700
+BMK_UUID = 0x0800
+BMK_URL = 0x0900
+BMK_NULL = 0x0A00
+
+# 常用键
+KEY_PATH = 0x1004          # 路径各级名称（数组）
+KEY_CNID_PATH = 0x1005     # 路径各级文件 ID（数组）
+KEY_VOLUME_PATH = 0x2002   # 卷挂载路径
+KEY_VOLUME_URL = 0x2005
+KEY_VOLUME_NAME = 0x2010
+KEY_VOLUME_UUID = 0x2011
+KEY_DISPLAY_NAME = 0xF017
+
+# CFNumber 子类型 → struct 格式
+NUMBER_FORMATS = {1: "<b", 2: "<h", 3: "<i", 4: "<q", 5: "<f", 6: "<d",
+                  7: "<b", 8: "<h", 9: "<i", 10: "<q", 11: "<q", 12: "<f", 13: "<d", 14: "<q"}
+
+# 书签日期以 2001-01-01 UTC 为起点
+MAC_EPOCH = datetime.datetime(2001, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _u32(data: bytes, offset: int) -> int:
+    if offset < 0 or offset + 4 > len(data):
+        raise ValueError(f"书签数据越界 (偏移 {offset})")
+    return struct.unpack_from("<I", data, offset)[0]
+
+
+def _item(data: bytes, offset: int, depth: int = 0):
+    """解析 data 中 offset 处的一条记录"""
+    if depth > 8:
+        raise ValueError("书签记录嵌套过深")
+    length, type_ = _u32(data, offset), _u32(data, offset + 4)
+    start = offset + 8
+    payload = data[start:start + length]
+    if len(payload) != length:
+        raise ValueError(f"书签记录越界 (偏移 {offset})")
+    kind, sub = type_ & TYPE_MASK, type_ & SUBTYPE_MASK
+
+    if kind == BMK_STRING:
+        return payload.decode("utf-8", errors="replace")
+    if kind == BMK_DATA:
+        return payload.hex()
+    if kind == BMK_NUMBER:
+        fmt = NUMBER_FORMATS.get(sub)
+        if not fmt or struct.calcsize(fmt) > length:
+            return None
+        return struct.unpack_from(fmt, payload)[0]
+    if kind == BMK_DATE:
+        seconds = struct.unpack(">d", payload)[0]
+        return (MAC_EPOCH + datetime.timedelta(seconds=seconds)).isoformat()
+    if kind == BMK_BOOLEAN:
+        return bool(sub)
+    if kind == BMK_ARRAY:
+        return [_item(data, _u32(payload, i), depth + 1) for i in range(0, length - length % 4, 4)]
+    if kind == BMK_DICT:
+        offsets = [_u32(payload, i) for i in range(0, length - length % 4, 4)]
+        return {str(_item(data, k, depth + 1)): _item(data, v, depth + 1)
+                for k, v in zip(offsets[::2], offsets[1::2])}
+    if kind == BMK_UUID:
+        return str(uuid.UUID(bytes=payload[:16])).upper()
+    if kind == BMK_URL:
+        if sub == 2:
+            # 相对 URL：两个偏移分别指向 base 与相对部分
+            base, rel = _item(data, _u32(payload, 0), depth + 1), _item(data, _u32(payload, 4), depth + 1)
+            return f"{base}{rel}"
+        return payload.decode("utf-8", errors="replace")
+    if kind == BMK_NULL:
+        return None
+    return payload.hex()
+
+
+def parse_bookmark(blob: bytes) -> dict[int, object]:
+    """解析书签主目录（TOC 1），返回 {键: 值}；格式不符时抛出 ValueError"""
+    if not blob or len(blob) < 16 or blob[:4] != BOOKMARK_MAGIC:
+        raise ValueError("不是有效的书签数据（缺少 book 文件头）")
+    header_size = _u32(blob, 12)
+    if header_size < 16 or header_size >= len(blob):
+        raise ValueError(f"书签文件头长度无效: {header_size}")
+    data = blob[header_size:]
+
+    entries = {}
+    toc = _u32(data, 0)
+    visited = set()
+    while toc and toc not in visited:
+        visited.add(toc)
+        magic, identifier, next_toc, count = (_u32(data, toc + 4), _u32(data, toc + 8),
+                                              _u32(data, toc + 12), _u32(data, toc + 16))
+        if magic != TOC_MAGIC:
+            raise ValueError("书签目录标记无效")
+        if identifier == 1:
+            for i in range(count):
+                pos = toc + 20 + i * 12
+                key, offset = _u32(data, pos), _u32(data, pos + 4)
+                if key & 0x80000000:
+                    key = str(_item(data, key & 0x7FFFFFFF))
+                entries[key] = _item(data, offset)
+        toc = next_toc
+    if not entries:
+        raise ValueError("书签不含目录项")
+    return entries
+
+
+def decode_bookmark(blob: bytes) -> dict:
+    """提取目标路径、卷信息与文件 ID"""
+    entries = parse_bookmark(blob)
+    components = entries.get(KEY_PATH)
+    if not isinstance(components, list) or not components:
+        raise ValueError("书签缺少路径信息")
+    cnids = entries.get(KEY_CNID_PATH)
+    return {
+        "path": "/" + "/".join(str(c) for c in components),
+        "file_id": cnids[-1] if isinstance(cnids, list) and cnids else None,
+        "volume_path": entries.get(KEY_VOLUME_PATH),
+        "volume_name": entries.get(KEY_VOLUME_NAME),
+        "volume_uuid": entries.get(KEY_VOLUME_UUID),
+        "display_name": entries.get(KEY_DISPLAY_NAME),
+    }
+
+
+def _load_cache(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("entries") or {}
+
+
+def _save_cache(path: Path, entries: dict):
+    """先写临时文件再原子替换；目录不可写时只是不缓存"""
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=path.name + ".", dir=path.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def resolve_bookmarks(conn, db_path: str | None = None, app_ids=None) -> dict[int, dict]:
+    """批量解析应用书签，返回 {item_id: 解析结果}；解析失败的结果含 error 字段，
+    无书签的应用不在结果中。给出 db_path 时使用 <db>.bookmarks 缓存"""
+    cache_path = sidecar_path(db_path, "bookmarks") if db_path else None
+    cache = _load_cache(cache_path) if cache_path else {}
+
+    where = "WHERE bookmark IS NOT NULL AND length(bookmark) > 0"
+    params = []
+    if app_ids:
+        where += f" AND item_id IN ({','.join('?' * len(app_ids))})"
+        params = list(app_ids)
+
+    results, used, changed = {}, {}, False
+    for item_id, blob in conn.execute(f"SELECT item_id, bookmark FROM apps {where} ORDER BY item_id", params):
+        digest = hashlib.sha1(blob).hexdigest()
+        entry = cache.get(digest)
+        if entry is None:
+            try:
+                entry = decode_bookmark(blob)
+            except (ValueError, struct.error, UnicodeDecodeError, OverflowError) as e:
+                entry = {"error": str(e)}
+            changed = True
+        used[digest] = entry
+        results[item_id] = entry
+
+    if cache_path:
+        # 全量解析时顺带清理已不存在的书签
+        if not app_ids and len(used) != len(cache):
+            cache, changed = used, True
+        elif changed:
+            cache.update(used)
+        if changed:
+            _save_cache(cache_path, cache)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析 AppGrid 应用书签的实际路径")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--apps", type=int, nargs="+", help="只解析指定应用 ID")
+    parser.add_argument("--errors", action="store_true", help="只列出无法解析的书签")
+    parser.add_argument("--no-cache", action="store_true", help="不读写 <db>.bookmarks 缓存")
+    parser.add_argument("--format", choices=["table", "json"], default="table")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "read")
+    resolved = resolve_bookmarks(conn, None if args.no_cache else args.db, args.apps)
+    titles = dict(conn.execute("SELECT item_id, title FROM apps").fetchall())
+    conn.close()
+
+    rows = [{"id": item_id, "title": titles.get(item_id), **entry} for item_id, entry in resolved.items()
+            if not args.errors or "error" in entry]
+
+    if args.format == "json":
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    if not rows:
+        print("没有可显示的书签")
+        return
+    print(f"{'ID':<6} {'名称':<30} {'文件ID':<10} {'路径 / 错误'}")
+    print("-" * 100)
+    for r in rows:
+        target = f"⚠️  {r['error']}" if "error" in r else r["path"]
+        file_id = "" if r.get("file_id") is None else r["file_id"]
+        print(f"{r['id']:<6} {(r['title'] or ''):<30} {file_id!s:<10} {target}")
+    failed = sum(1 for r in rows if "error" in r)
+    print(f"\n共 {len(rows)} 个书签，无法解析 {failed} 个")
+
+
+if __name__ == "__main__":
+    main()
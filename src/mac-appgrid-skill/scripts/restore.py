@@ -0,0 +1,52 @@
+"""从 <db>.backups 增量备份中恢复 AppGrid 数据库"""
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from backup import create_backup, list_backups, restore_backup
+from profiling import add_profile_argument
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从增量备份恢复 AppGrid 数据库")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--snapshot", type=int, default=None, help="快照 ID（省略则为最新快照）")
+    parser.add_argument("--output", help="恢复到新文件而不是覆盖原数据库")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if not Path(args.db).expanduser().exists():
+        print(f"错误: 数据库文件不存在: {args.db}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        snapshot = args.snapshot
+        if snapshot is None:
+            # 先确定"最新"指哪个快照，否则下面的自动备份会成为最新快照，恢复等于什么都没做
+            snapshots = list_backups(args.db)
+            if not snapshots:
+                raise ValueError("没有备份")
+            snapshot = snapshots[-1]["id"]
+        safety = None
+        if not args.output:
+            # 覆盖前先为当前状态建快照，恢复错了还能再恢复回来
+            safety = create_backup(args.db, f"恢复快照 {snapshot} 前自动备份")
+        result = restore_backup(args.db, snapshot, args.output)
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.format == "json":
+        print(json.dumps({**result, "safety_snapshot": safety and safety["id"]}, ensure_ascii=False, indent=2))
+        return
+    print(f"✓ 已从快照 #{result['id']} 恢复到 {result['path']}（{result['page_count']} 页）")
+    if safety:
+        print(f"  恢复前的状态保存在快照 #{safety['id']}")
+
+
+if __name__ == "__main__":
+    main()
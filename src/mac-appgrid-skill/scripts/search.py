@@ -1,33 +1,31 @@
 """搜索 AppGrid 应用"""
 import argparse
 import json
+import sqlite3
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 from core import connect
+from search_index import SearchIndex
+from profiling import add_profile_argument
 
 
-def main():
-    parser = argparse.ArgumentParser(description="搜索 AppGrid 应用")
-    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
-    parser.add_argument("--query", required=True, help="搜索关键词")
-    parser.add_argument("--field", choices=["name", "bundleid", "all"], default="all")
-    parser.add_argument("--format", choices=["table", "json"], default="table")
-    args = parser.parse_args()
-
-    conn = connect(args.db)
-
+def search_apps(conn, query: str, field: str = "all") -> list[dict]:
+    """按名称/Bundle ID/路径做 LIKE 子串搜索（不使用索引，结果按名称排序）"""
     conditions = []
     params = []
-    keyword = f"%{args.query}%"
+    keyword = f"%{query}%"
 
-    if args.field in ("name", "all"):
+    if field in ("name", "all"):
         conditions.append("a.title LIKE ?")
         params.append(keyword)
-    if args.field in ("bundleid", "all"):
+    if field in ("bundleid", "all"):
         conditions.append("a.bundleid LIKE ?")
         params.append(keyword)
+    if field in ("path", "all"):
+        conditions.append("a.custom_path LIKE ?")
+        params.append(keyword)
 
     where = " OR ".join(conditions)
     rows = conn.execute(
@@ -43,13 +41,59 @@ def main():
         params,
     ).fetchall()
 
-    results = [dict(r) for r in rows]
+    return [dict(r) for r in rows]
+
+
+def search_indexed(db_path: str, conn, query: str, field: str = "all", limit: int | None = None,
+                   rebuild: bool = False) -> list[dict]:
+    """通过旁路索引做排序搜索；当前 SQLite 不支持 FTS5 时退回 LIKE 搜索"""
+    index = SearchIndex(db_path, conn)
+    try:
+        if rebuild:
+            index.rebuild()
+        return index.search(query, field, limit)
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e) and "trigram" not in str(e):
+            raise
+        results = search_apps(conn, query, field)
+        return results[:limit] if limit else results
+    finally:
+        index.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索 AppGrid 应用")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--query", required=True, help="搜索关键词")
+    parser.add_argument("--field", choices=["name", "bundleid", "path", "all"], default="all",
+                        help="搜索范围：name 含拼音首字母，path 为自定义路径")
+    parser.add_argument("--limit", type=int, default=0, help="最多显示条数（默认 0，不限制）")
+    parser.add_argument("--no-index", action="store_true", help="不使用索引，直接 LIKE 扫描")
+    parser.add_argument("--rebuild-index", action="store_true", help="强制重建搜索索引")
+    parser.add_argument("--format", choices=["table", "json"], default="table")
+    parser.add_argument("--score", action="store_true", help="JSON 输出中包含匹配分（score 字段，仅索引搜索）")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "read")
+
+    # 取全部匹配再截取，提示中的总数才准确
+    if args.no_index:
+        matches = search_apps(conn, args.query, args.field)
+    else:
+        matches = search_indexed(args.db, conn, args.query, args.field, None, args.rebuild_index)
+    results = matches[:args.limit] if args.limit else matches
+    if not args.score:
+        for r in results:
+            r.pop("score", None)
 
     if args.format == "json":
         print(json.dumps(results, ensure_ascii=False, indent=2))
     else:
         if not results:
             print("未找到匹配的应用")
+        elif len(results) < len(matches):
+            print(f"找到 {len(matches)} 个应用，显示前 {len(results)} 个：")
         else:
             print(f"找到 {len(results)} 个应用：")
             print(f"{'ID':<6} {'名称':<30} {'Bundle ID':<45} {'所在分组'}")
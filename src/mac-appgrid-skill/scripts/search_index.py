@@ -0,0 +1,319 @@
+"""搜索索引：在数据库旁维护 FTS5 (trigram) 索引，支持排序的前缀/子串/模糊匹配与拼音首字母
+
+索引文件为 <db>.search，记录源数据库的 size/mtime 指纹，数据库变化后下次搜索自动重建；
+目录不可写时退回内存索引。
+"""
+import bisect
+import difflib
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import sidecar_path, file_stamp, TYPE_APP, TYPE_GROUP
+from profiling import connection_factory
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 可选依赖：缺失时只用内置的 GB2312 首字母表
+    lazy_pinyin = None
+
+# 索引结构版本；结构或拼音能力变化时触发重建
+INDEX_VERSION = f"3:{'pypinyin' if lazy_pinyin else 'gb2312'}"
+
+# 各搜索范围对应的索引列
+FIELD_COLUMNS = {
+    "name": ["title", "initials", "pinyin"],
+    "bundleid": ["bundleid"],
+    "path": ["custom_path"],
+    "all": ["title", "initials", "pinyin", "bundleid", "custom_path"],
+}
+
+# 列权重：同等匹配程度下名称优先
+COLUMN_WEIGHTS = {"title": 1.0, "initials": 0.95, "pinyin": 0.9, "bundleid": 0.85, "custom_path": 0.7}
+
+# 前缀键种类：整串、单词、中文片段（后缀）；数值越小与查询越接近，用于截断前排序
+KEY_WHOLE, KEY_WORD, KEY_FRAGMENT = 0, 1, 2
+
+# 模糊匹配的最低相似度
+FUZZY_THRESHOLD = 0.75
+
+WORD_SPLIT = re.compile(r"[\s._\-/()]+")
+CJK_RUN = re.compile(r"[\u4e00-\u9fff]+")
+
+# GB2312 一级汉字按拼音排序，各声母首字的区位码（无 pypinyin 时计算首字母）
+GB2312_INITIALS = [
+    (0xB0A1, "a"), (0xB0C5, "b"), (0xB2C1, "c"), (0xB4EE, "d"), (0xB6EA, "e"), (0xB7A2, "f"),
+    (0xB8C1, "g"), (0xB9FE, "h"), (0xBBF7, "j"), (0xBFA6, "k"), (0xC0AC, "l"), (0xC2E8, "m"),
+    (0xC4C3, "n"), (0xC5B6, "o"), (0xC5BE, "p"), (0xC6DA, "q"), (0xC8BB, "r"), (0xC8F6, "s"),
+    (0xCBFA, "t"), (0xCDDA, "w"), (0xCEF4, "x"), (0xD1B9, "y"), (0xD4D1, "z"),
+]
+_GB2312_KEYS = [code for code, _ in GB2312_INITIALS]
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE info (rowid INTEGER PRIMARY KEY, parent_id INTEGER, ordering INTEGER, group_name TEXT);
+CREATE TABLE keys (key TEXT, field TEXT, item_id INTEGER, kind INTEGER);
+CREATE VIRTUAL TABLE docs USING fts5(title, bundleid, custom_path, initials, pinyin, tokenize='trigram');
+"""
+
+SOURCE_SQL = """
+SELECT i.rowid, i.parent_id, i.ordering, a.title, a.bundleid, a.custom_path, g.title AS group_name
+FROM items i
+JOIN apps a ON i.rowid = a.item_id
+LEFT JOIN items pi ON i.parent_id = pi.rowid
+LEFT JOIN items gi ON pi.parent_id = gi.rowid AND gi.type = ?
+LEFT JOIN groups g ON gi.rowid = g.item_id
+WHERE i.type = ?
+"""
+
+
+def _char_initial(ch: str) -> str:
+    """单个汉字的拼音首字母（GB2312 一级汉字），无法识别返回空串"""
+    try:
+        code = ch.encode("gb2312")
+    except UnicodeEncodeError:
+        return ""
+    if len(code) != 2:
+        return ""
+    value = code[0] << 8 | code[1]
+    if value < _GB2312_KEYS[0] or value > 0xD7F9:
+        return ""
+    return GB2312_INITIALS[bisect.bisect_right(_GB2312_KEYS, value) - 1][1]
+
+
+def pinyin_keys(text: str | None) -> tuple[str, str]:
+    """返回 (拼音首字母, 全拼)；不含汉字时均为空串，无 pypinyin 时全拼为空"""
+    if not text or not CJK_RUN.search(text):
+        return "", ""
+    if lazy_pinyin:
+        syllables = lazy_pinyin(text, errors=lambda s: list(s))
+        parts = [s.lower() for s in syllables if s.strip() and s.isalnum()]
+        return "".join(p[0] for p in parts), "".join(parts)
+    initials = []
+    for ch in text:
+        if ch.isascii():
+            if ch.isalnum():
+                initials.append(ch.lower())
+        else:
+            initials.append(_char_initial(ch))
+    return "".join(initials), ""
+
+
+def _prefix_keys(title, bundleid, custom_path, initials, pinyin) -> set[tuple[str, str, int]]:
+    """前缀键 (key, 列, 种类)：整串、各单词、中文片段的所有后缀"""
+    keys = set()
+    for column, text in (("title", title), ("bundleid", bundleid), ("initials", initials),
+                         ("pinyin", pinyin), ("custom_path", custom_path and Path(custom_path).name)):
+        if not text:
+            continue
+        text = text.lower()
+        keys.add((text, column, KEY_WHOLE))
+        keys.update((w, column, KEY_WORD) for w in WORD_SPLIT.split(text) if w)
+    for run in CJK_RUN.findall(title or ""):
+        keys.update((run[i:], "title", KEY_FRAGMENT) for i in range(len(run)))
+    return keys
+
+
+def _score(query: str, values: dict, fuzzy: bool) -> float:
+    """计算匹配分：完全相等 > 前缀 > 单词前缀 > 子串 > 模糊"""
+    best = 0.0
+    for column, text in values.items():
+        if not text:
+            continue
+        text = text.lower()
+        if text == query:
+            s = 1.0
+        elif text.startswith(query):
+            s = 0.9
+        elif any(w.startswith(query) for w in WORD_SPLIT.split(text)):
+            s = 0.8
+        elif query in text:
+            s = 0.6
+        elif fuzzy:
+            words = [w for w in WORD_SPLIT.split(text) if w] + [text[:len(query)]]
+            ratio = max(difflib.SequenceMatcher(None, query, w).ratio() for w in words)
+            s = 0.5 * ratio if ratio >= FUZZY_THRESHOLD else 0.0
+        else:
+            s = 0.0
+        if s:
+            # 同一档内，匹配部分占比越高越靠前
+            s += 0.05 * min(1.0, len(query) / len(text))
+        best = max(best, s * COLUMN_WEIGHTS[column])
+    return best
+
+
+def _fts_phrase(text: str) -> str:
+    """转义为 FTS5 短语"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+class SearchIndex:
+    """数据库旁路搜索索引；search() 前自动检查指纹并按需重建"""
+
+    def __init__(self, db_path: str, conn: sqlite3.Connection):
+        self.db_path = db_path
+        self.source = conn
+        self.path = sidecar_path(db_path, "search")
+        self.conn = None
+        self.stamp = None
+
+    def _open(self, path) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(path), factory=connection_factory())
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _stored_stamp(self, conn) -> tuple | None:
+        try:
+            rows = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        except sqlite3.DatabaseError:
+            return None
+        return rows.get("version"), rows.get("stamp")
+
+    def ensure(self) -> bool:
+        """索引与数据库指纹不一致时重建，返回是否重建"""
+        stamp = file_stamp(self.db_path)
+        if self.conn is not None and self.stamp == stamp:
+            return False
+        if self.conn is None and self.path.exists():
+            conn = self._open(self.path)
+            if self._stored_stamp(conn) == (INDEX_VERSION, stamp):
+                self.conn, self.stamp = conn, stamp
+                return False
+            conn.close()
+        self.rebuild(stamp)
+        return True
+
+    def _fill(self, conn, stamp):
+        """从源数据库读取全部应用写入索引"""
+        conn.executescript(SCHEMA)
+        info, docs, keys = [], [], []
+        for r in self.source.execute(SOURCE_SQL, (TYPE_GROUP, TYPE_APP)):
+            initials, pinyin = pinyin_keys(r["title"])
+            info.append((r["rowid"], r["parent_id"], r["ordering"], r["group_name"]))
+            docs.append((r["rowid"], r["title"], r["bundleid"], r["custom_path"], initials, pinyin))
+            keys.extend((k, column, r["rowid"], kind) for k, column, kind in
+                        _prefix_keys(r["title"], r["bundleid"], r["custom_path"], initials, pinyin))
+        conn.executemany("INSERT INTO info VALUES (?, ?, ?, ?)", info)
+        conn.executemany(
+            "INSERT INTO docs (rowid, title, bundleid, custom_path, initials, pinyin) VALUES (?, ?, ?, ?, ?, ?)",
+            docs)
+        conn.executemany("INSERT INTO keys VALUES (?, ?, ?, ?)", keys)
+        conn.execute("CREATE INDEX keys_key ON keys(key)")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [("version", INDEX_VERSION), ("stamp", stamp)])
+        conn.commit()
+
+    def rebuild(self, stamp: str | None = None):
+        """重建索引：先写临时文件再原子替换；目录不可写时使用内存索引"""
+        stamp = stamp or file_stamp(self.db_path)
+        if self.conn is not None:
+            self.conn.close()
+        try:
+            fd, tmp = tempfile.mkstemp(prefix=self.path.name + ".", dir=self.path.parent)
+            os.close(fd)
+        except OSError:
+            self.conn = self._open(":memory:")
+            self._fill(self.conn, stamp)
+        else:
+            try:
+                conn = self._open(tmp)
+                self._fill(conn, stamp)
+                conn.close()
+                os.replace(tmp, self.path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+            self.conn = self._open(self.path)
+        self.stamp = stamp
+
+    def _prefix_candidates(self, query: str, columns: list[str], cap: int | None) -> list[int]:
+        """前缀候选：整串/单词/中文后缀的前缀键，走普通 B-tree 范围查询
+
+        需要截断时先按最接近查询的那个键排序（整串相等 > 整串前缀 > 单词相等 > 单词前缀 > 中文片段，
+        同档内键越短越靠前），保证完全匹配的应用不会被截掉。
+        """
+        placeholders = ",".join("?" * len(columns))
+        sql = f"SELECT DISTINCT item_id FROM keys WHERE key >= ? AND key < ? AND field IN ({placeholders})"
+        params = [query, query + "\uffff", *columns]
+        if cap is not None:
+            sql = (f"SELECT item_id FROM keys WHERE key >= ? AND key < ? AND field IN ({placeholders}) "
+                   f"GROUP BY item_id ORDER BY MIN((kind * 2 + (key <> ?)) * 1000 + length(key)) LIMIT {int(cap)}")
+            params.append(query)
+        return [r[0] for r in self.conn.execute(sql, params)]
+
+    def _like_candidates(self, query: str, columns: list[str], cap: int | None) -> list[int]:
+        """短查询（1~2 个字符，trigram 索引无法使用）的子串候选：LIKE 扫描，截断时较短的名称优先"""
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        where = " OR ".join(f"{c} LIKE ? ESCAPE '\\'" for c in columns)
+        limit = "" if cap is None else f" ORDER BY length({columns[0]}) LIMIT {int(cap)}"
+        return [r[0] for r in self.conn.execute(f"SELECT rowid FROM docs WHERE {where}{limit}",
+                                                [pattern] * len(columns))]
+
+    def _substring_candidates(self, query: str, columns: list[str], cap: int | None) -> list[int]:
+        """子串候选：trigram 索引（查询至少 3 个字符）"""
+        limit = "" if cap is None else f" LIMIT {int(cap)}"
+        match = "{" + " ".join(columns) + "} : " + _fts_phrase(query)
+        order = "" if cap is None else " ORDER BY rank"
+        return [r[0] for r in self.conn.execute(f"SELECT rowid FROM docs WHERE docs MATCH ?{order}{limit}", (match,))]
+
+    def _fuzzy_candidates(self, query: str, columns: list[str], cap: int | None) -> list[int]:
+        """模糊候选：包含查询中任一 trigram 的应用，按 bm25 排序"""
+        grams = {query[i:i + 3] for i in range(len(query) - 2)}
+        match = "{" + " ".join(columns) + "} : (" + " OR ".join(_fts_phrase(g) for g in sorted(grams)) + ")"
+        limit = "" if cap is None else f" LIMIT {int(cap)}"
+        sql = f"SELECT rowid FROM docs WHERE docs MATCH ? ORDER BY rank{limit}"
+        return [r[0] for r in self.conn.execute(sql, (match,))]
+
+    def _rows(self, ids: list[int]) -> list[sqlite3.Row]:
+        placeholders = ",".join("?" * len(ids))
+        return self.conn.execute(
+            f"""SELECT d.rowid, i.parent_id, i.ordering, d.title, d.bundleid, d.custom_path,
+                       i.group_name, d.initials, d.pinyin
+                FROM docs d JOIN info i ON i.rowid = d.rowid
+                WHERE d.rowid IN ({placeholders})""",
+            ids,
+        ).fetchall()
+
+    def search(self, query: str, field: str = "all", limit: int | None = 20) -> list[dict]:
+        """排序搜索；limit 为 None 或 0 时返回全部匹配"""
+        if field not in FIELD_COLUMNS:
+            raise ValueError(f"未知搜索范围: {field}")
+        query = query.strip().lower()
+        if not query:
+            return []
+        self.ensure()
+        columns = FIELD_COLUMNS[field]
+        limit = limit or None
+        cap = None if limit is None else max(limit * 3, 30)
+
+        # 依次取前缀、子串、模糊候选，结果已足够时不再进入更慢的阶段；
+        # trigram 需要至少 3 个字符，更短的查询以 LIKE 扫描补足子串匹配，不做模糊匹配
+        stages = [(False, self._prefix_candidates)]
+        if len(query) >= 3:
+            stages += [(False, self._substring_candidates), (True, self._fuzzy_candidates)]
+        else:
+            stages.append((False, self._like_candidates))
+        scored = {}
+        for fuzzy, finder in stages:
+            if limit is not None and len(scored) >= limit:
+                break
+            ids = [i for i in finder(query, columns, cap) if i not in scored]
+            for chunk in range(0, len(ids), 500):
+                for r in self._rows(ids[chunk:chunk + 500]):
+                    score = _score(query, {c: r[c] for c in columns}, fuzzy)
+                    if score > 0:
+                        result = {k: r[k] for k in
+                                  ("rowid", "parent_id", "ordering", "title", "bundleid", "custom_path", "group_name")}
+                        result["score"] = round(score, 3)
+                        scored[r["rowid"]] = result
+
+        results = sorted(scored.values(), key=lambda x: (-x["score"], x["title"] or ""))
+        return results if limit is None else results[:limit]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -1,88 +1,158 @@
 """统计 AppGrid 数据库概览"""
 import argparse
 import json
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
-from core import connect, get_pages, get_group_containers, TYPE_GROUP, TYPE_CONTAINER, TYPE_APP
+from core import (
+    connect, sidecar_path, file_stamp,
+    MAX_ITEMS_PER_CONTAINER, TYPE_CONTAINER, TYPE_GROUP, TYPE_APP,
+)
+from profiling import add_profile_argument
 
+# 缓存格式版本；统计结构变化时使旧缓存失效
+CACHE_VERSION = 1
+
+# 一次查询得到：每个顶层页面与每个分组分页的占用数（无分页的分组也返回一行），
+# 以及单独一行全局计数（不依赖网格节点，数据库没有网格或根节点异常时也能数出应用）
+STATS_SQL = """
+WITH grid AS (
+    SELECT rowid FROM items WHERE type = :container AND parent_id = 0 LIMIT 1
+),
+child_counts AS (
+    SELECT parent_id, COUNT(*) AS used, SUM(type = :app) AS apps
+    FROM items GROUP BY parent_id
+),
+totals AS (
+    SELECT (SELECT COUNT(*) FROM apps) AS total_apps,
+           (SELECT COUNT(*) FROM items WHERE type = :app) AS app_items
+)
+SELECT 'page' AS kind, NULL AS group_id, NULL AS title, p.rowid AS container_id, p.ordering AS ord,
+       COALESCE(cc.used, 0) AS used, COALESCE(cc.apps, 0) AS apps, NULL AS total_apps, NULL AS app_items
+FROM items p
+JOIN grid ON p.parent_id = grid.rowid
+LEFT JOIN child_counts cc ON cc.parent_id = p.rowid
+WHERE p.type = :container
+UNION ALL
+SELECT 'group', gi.rowid, g.title, c.rowid, c.ordering, COALESCE(cc.used, 0), COALESCE(cc.apps, 0), NULL, NULL
+FROM items gi
+JOIN groups g ON g.item_id = gi.rowid
+LEFT JOIN items c ON c.parent_id = gi.rowid AND +c.type = :container  -- "+" 让规划器走 (parent_id, ordering) 索引
+LEFT JOIN child_counts cc ON cc.parent_id = c.rowid
+WHERE gi.type = :group
+UNION ALL
+SELECT 'totals', NULL, NULL, NULL, NULL, 0, 0, t.total_apps, t.app_items FROM totals t
+ORDER BY kind DESC, group_id, ord, container_id
+"""
 
-def main():
-    parser = argparse.ArgumentParser(description="AppGrid 数据库统计概览")
-    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
-    parser.add_argument("--format", choices=["table", "json"], default="table")
-    args = parser.parse_args()
 
-    conn = connect(args.db)
+def _usage(container_id: int, used: int) -> dict:
+    return {"id": container_id, "used": used, "utilization": round(used / MAX_ITEMS_PER_CONTAINER, 3)}
 
-    # 页面信息
-    pages = get_pages(conn)
 
-    # 分组信息
-    groups = conn.execute(
-        """SELECT i.rowid, i.parent_id, g.title FROM items i
-           JOIN groups g ON i.rowid = g.item_id WHERE i.type = ?""",
-        (TYPE_GROUP,),
+def collect_stats(conn) -> dict:
+    """单条聚合查询计算统计概览：总数、各分组应用数与分页数、每个容器的容量占用"""
+    rows = conn.execute(
+        STATS_SQL, {"container": TYPE_CONTAINER, "group": TYPE_GROUP, "app": TYPE_APP}
     ).fetchall()
 
-    # 总应用数
-    total_apps = conn.execute("SELECT COUNT(*) FROM apps").fetchone()[0]
+    pages, groups = [], {}
+    total_apps = app_items = grouped = 0
+    for r in rows:
+        if r["kind"] == "totals":
+            total_apps, app_items = r["total_apps"], r["app_items"]
+            continue
+        if r["kind"] == "page":
+            pages.append(_usage(r["container_id"], r["used"]))
+            continue
+        g = groups.setdefault(r["group_id"], {"id": r["group_id"], "title": r["title"], "app_count": 0,
+                                             "containers": []})
+        if r["container_id"] is not None:
+            g["app_count"] += r["apps"]
+            g["containers"].append(_usage(r["container_id"], r["used"]))
+        grouped += r["apps"]
 
-    # 分组容器 ID 集合
-    group_containers = conn.execute(
-        """SELECT i.rowid FROM items i
-           WHERE i.type = ? AND i.parent_id IN (SELECT rowid FROM items WHERE type = ?)""",
-        (TYPE_CONTAINER, TYPE_GROUP),
-    ).fetchall()
-    container_ids = {r["rowid"] for r in group_containers}
-
-    # 未归组数
-    ungrouped = conn.execute(
-        "SELECT COUNT(*) FROM items WHERE type = ?", (TYPE_APP,)
-    ).fetchone()[0]
-    grouped_count = sum(
-        1 for r in conn.execute("SELECT parent_id FROM items WHERE type = ?", (TYPE_APP,)).fetchall()
-        if r["parent_id"] in container_ids
-    )
-    ungrouped_count = ungrouped - grouped_count
+    containers = pages + [c for g in groups.values() for c in g["containers"]]
+    used = sum(c["used"] for c in containers)
+    capacity = len(containers) * MAX_ITEMS_PER_CONTAINER
 
     result = {
         "total_apps": total_apps,
-        "grouped": grouped_count,
-        "ungrouped": ungrouped_count,
+        "grouped": grouped,
+        "ungrouped": app_items - grouped,
         "pages": len(pages),
         "groups": [],
+        "capacity": {
+            "max_per_container": MAX_ITEMS_PER_CONTAINER,
+            "containers": len(containers),
+            "used": used,
+            "utilization": round(used / capacity, 3) if capacity else 0.0,
+            "full": sum(1 for c in containers if c["used"] >= MAX_ITEMS_PER_CONTAINER),
+        },
+        "page_usage": pages,
     }
-
-    for g in groups:
-        containers = get_group_containers(conn, g["rowid"])
-        app_count = 0
-        for cid in containers:
-            app_count += conn.execute(
-                "SELECT COUNT(*) FROM items WHERE parent_id=? AND type=?", (cid, TYPE_APP)
-            ).fetchone()[0]
-        page_count = len(containers)
-        group_info = {
-            "id": g["rowid"],
-            "title": g["title"],
-            "app_count": app_count,
-        }
-        if page_count > 1:
-            group_info["pages"] = page_count
+    for g in groups.values():
+        group_info = {"id": g["id"], "title": g["title"], "app_count": g["app_count"]}
+        if len(g["containers"]) > 1:
+            group_info["pages"] = len(g["containers"])
+        group_info["containers"] = g["containers"]
         result["groups"].append(group_info)
+    return result
+
+
+def cached_stats(db_path: str, conn, use_cache: bool = True) -> dict:
+    """读取 <db>.stats 缓存；数据库指纹（size/mtime/修改计数）变化或缓存不可用时重新统计并写回"""
+    cache = sidecar_path(db_path, "stats")
+    stamp = file_stamp(db_path)
+    if use_cache:
+        try:
+            data = json.loads(cache.read_text(encoding="utf-8"))
+            if data.get("version") == CACHE_VERSION and data.get("stamp") == stamp:
+                return data["result"]
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    result = collect_stats(conn)
+
+    # 先写临时文件再原子替换；目录不可写时只是不缓存
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=cache.name + ".", dir=cache.parent)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "stamp": stamp, "result": result}, f, ensure_ascii=False)
+        os.replace(tmp, cache)
+    except OSError:
+        pass
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AppGrid 数据库统计概览")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--format", choices=["table", "json"], default="table")
+    parser.add_argument("--no-cache", action="store_true", help="忽略 <db>.stats 缓存重新统计")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "read")
+    result = cached_stats(args.db, conn, use_cache=not args.no_cache)
+    conn.close()
 
     if args.format == "json":
         print(json.dumps(result, ensure_ascii=False, indent=2))
     else:
-        print(f"总应用: {total_apps} | 已归组: {grouped_count} | 未归组: {ungrouped_count} | 页面: {len(pages)} | 分组: {len(groups)}")
+        cap = result["capacity"]
+        print(f"总应用: {result['total_apps']} | 已归组: {result['grouped']} | 未归组: {result['ungrouped']} | 页面: {result['pages']} | 分组: {len(result['groups'])}")
+        print(f"容量: {cap['used']}/{cap['containers'] * cap['max_per_container']} ({cap['utilization']:.0%}) | "
+              f"容器: {cap['containers']} | 已满: {cap['full']}")
         print()
         for g in result["groups"]:
             pages_info = f" ({g['pages']}页)" if g.get("pages") else ""
-            print(f"  📁 [{g['id']}] {g['title']}: {g['app_count']} 个应用{pages_info}")
-
-    conn.close()
+            usage = "/".join(str(c["used"]) for c in g["containers"])
+            print(f"  📁 [{g['id']}] {g['title']}: {g['app_count']} 个应用{pages_info} [占用 {usage or '-'}]")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
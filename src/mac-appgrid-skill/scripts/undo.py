@@ -0,0 +1,70 @@
+"""撤销最近的 AppGrid 修改（基于 <db>.journal 操作日志）"""
+import argparse
+import datetime
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from core import connect, WriteSession
+from journal import attach_journal, undo, history
+from profiling import add_profile_argument
+
+
+def describe(op: dict) -> str:
+    """操作的一行描述：#ID 命令 参数 (变更行数)"""
+    parts = [f"#{op['id']}", op["command"]]
+    args = op.get("args")
+    if isinstance(args, dict):
+        parts += [f"{k}={v}" for k, v in args.items() if v not in (None, False)]
+    elif args:
+        parts.append(json.dumps(args, ensure_ascii=False))
+    return " ".join(parts) + f" ({op['changes']} 行)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="撤销 AppGrid 修改")
+    parser.add_argument("--db", required=True, help=".agrid 数据库路径")
+    parser.add_argument("--steps", type=int, default=1, help="撤销的操作数")
+    parser.add_argument("--force", action="store_true", help="行已被其他程序修改时仍强制写回")
+    parser.add_argument("--list", action="store_true", help="只列出操作日志")
+    parser.add_argument("--format", choices=["text", "json"], default="text")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
+    conn = connect(args.db, "write")
+
+    if args.list:
+        ops = history(conn)
+        conn.close()
+        if args.format == "json":
+            print(json.dumps(ops, ensure_ascii=False, indent=2))
+            return
+        if not ops:
+            print("没有操作日志")
+            return
+        for op in ops:
+            when = datetime.datetime.fromtimestamp(op["created"]).strftime("%Y-%m-%d %H:%M:%S")
+            mark = "  [已撤销]" if op["undone"] else ""
+            print(f"{when}  {describe(op)}{mark}")
+        return
+
+    try:
+        if not attach_journal(conn, create=False):
+            raise ValueError("没有操作日志，无可撤销的操作")
+        ops = WriteSession(conn).run(undo, args.steps, args.force)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    conn.close()
+
+    if args.format == "json":
+        print(json.dumps(ops, ensure_ascii=False, indent=2))
+        return
+    print(f"✓ 已撤销 {len(ops)} 个操作")
+    for op in ops:
+        print(f"  ↶ {describe(op)}")
+
+
+if __name__ == "__main__":
+    main()